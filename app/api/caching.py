@@ -0,0 +1,58 @@
+import time
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+from fastapi import Depends, HTTPException, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.catalog import catalog_state
+from app.db.repo import RecipeRepo
+from app.db.session import get_read_session
+
+# Start of the current wall-clock second
+def current_second() -> datetime:
+    return datetime.fromtimestamp(int(time.time()), timezone.utc)
+
+# Validators describing the current catalog state. Last-Modified has one-second
+# resolution, so it is only sent once its second is over: until then another write could
+# land in the same second, and only the ETag version tells the two apart.
+def catalog_validators() -> dict[str, str]:
+    validators = {"ETag": catalog_state.etag, "Cache-Control": "no-cache"}
+    if catalog_state.last_modified < current_second():
+        validators["Last-Modified"] = format_datetime(catalog_state.last_modified, usegmt=True)
+    return validators
+
+# Whether the client's cached copy still matches the catalog state
+def is_not_modified(request: Request) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # If-None-Match takes precedence over If-Modified-Since
+        tags = {tag.strip() for tag in if_none_match.split(",")}
+        return "*" in tags or catalog_state.etag in tags or catalog_state.etag.removeprefix("W/") in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            return False
+        # A change made later in the current second would carry the same date
+        return catalog_state.last_modified <= since and catalog_state.last_modified < current_second()
+    return False
+
+# Dependency for catalog reads: refreshes the shared catalog marker (one primary-key
+# lookup) and answers 304 before any recipe query runs, otherwise sets the validators
+# on the response and returns them for handlers that build their own
+async def conditional_get(
+    request: Request,
+    response: Response,
+    session: AsyncSession = Depends(get_read_session),
+) -> dict[str, str]:
+    await RecipeRepo(session).sync_catalog()
+    validators = catalog_validators()
+    if is_not_modified(request):
+        raise HTTPException(status_code=304, headers=validators)
+    response.headers.update(validators)
+    return validators
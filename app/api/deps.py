@@ -0,0 +1,21 @@
+from fastapi import Depends
+from fastapi.requests import HTTPConnection
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.session import get_read_session, get_session
+from app.db.repo import RecipeRepo
+from app.services.recipes import RecipeService
+
+# Dependency to get RecipeService, backed by the writer/reader sessions and the app-scoped
+# AI client, write batcher and recommendation refresher; also serves websocket operations
+def get_service(
+    request: HTTPConnection,
+    session: AsyncSession = Depends(get_session),
+    read_session: AsyncSession = Depends(get_read_session),
+) -> RecipeService:
+    return RecipeService(
+        RecipeRepo(session, read_session),
+        ai=getattr(request.app.state, "ai_client", None),
+        writer=getattr(request.app.state, "write_batcher", None),
+        refresher=getattr(request.app.state, "recommendation_refresher", None),
+    )
@@ -0,0 +1,35 @@
+import csv
+import io
+import json
+from collections.abc import AsyncIterator, Sequence
+
+from sqlalchemy import Row
+
+EXPORT_FIELDS = ("id", "title", "description", "created_at")
+
+# Render a recipe row as a plain dict, formatted like RecipeOut
+def row_to_dict(row: Row) -> dict:
+    return {
+        "id": row.id,
+        "title": row.title,
+        "description": row.description,
+        "created_at": row.created_at.isoformat(),
+    }
+
+# Encode batches of rows as newline-delimited JSON, one chunk per batch
+async def ndjson_chunks(batches: AsyncIterator[Sequence[Row]]) -> AsyncIterator[str]:
+    async for batch in batches:
+        yield "".join(json.dumps(row_to_dict(row), ensure_ascii=False) + "\n" for row in batch)
+
+# Encode batches of rows as CSV with a header line, one chunk per batch
+async def csv_chunks(batches: AsyncIterator[Sequence[Row]]) -> AsyncIterator[str]:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(EXPORT_FIELDS)
+    yield buf.getvalue()
+
+    async for batch in batches:
+        buf.seek(0)
+        buf.truncate()
+        writer.writerows((r.id, r.title, r.description, r.created_at.isoformat()) for r in batch)
+        yield buf.getvalue()
@@ -0,0 +1,41 @@
+from collections.abc import Callable
+from functools import cache
+
+from fastapi import HTTPException, Query
+from pydantic import BaseModel, TypeAdapter, create_model
+
+from app.domain.schemas import RecipeOut, RecipeSearchHit
+
+RECIPE_FIELDS = tuple(RecipeOut.model_fields)
+SEARCH_HIT_FIELDS = tuple(RecipeSearchHit.model_fields)
+
+# Dependency factory for a `?fields=a,b` sparse fieldset over `allowed`; resolves to the
+# requested names in `allowed` order, or None when every field is wanted
+def fieldset(allowed: tuple[str, ...]) -> Callable[..., tuple[str, ...] | None]:
+    def dependency(
+        fields: str | None = Query(None, description=f"Comma-separated subset of: {', '.join(allowed)}"),
+    ) -> tuple[str, ...] | None:
+        if fields is None:
+            return None
+        wanted = {name.strip() for name in fields.split(",") if name.strip()}
+        unknown = sorted(wanted - set(allowed))
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+        if not wanted:
+            raise HTTPException(status_code=400, detail="fields must name at least one field")
+        return tuple(name for name in allowed if name in wanted)
+    return dependency
+
+# `model` cut down to `fields`, built once per distinct fieldset
+@cache
+def narrowed_model(model: type[BaseModel], fields: tuple[str, ...]) -> type[BaseModel]:
+    return create_model(
+        f"{model.__name__}[{','.join(fields)}]",
+        __config__=model.model_config,
+        **{name: (model.model_fields[name].annotation, ...) for name in fields},
+    )
+
+# List serializer for the narrowed model
+@cache
+def narrowed_list_adapter(model: type[BaseModel], fields: tuple[str, ...]) -> TypeAdapter:
+    return TypeAdapter(list[narrowed_model(model, fields)])
@@ -1,10 +1,23 @@
+import asyncio
+import inspect
+import time
+from collections import defaultdict
+from collections.abc import AsyncGenerator, Awaitable, Iterator
+
 import strawberry
-from strawberry.fastapi import GraphQLRouter
+from fastapi import Depends
+from strawberry.dataloader import DataLoader
+from strawberry.extensions import SchemaExtension
+from strawberry.fastapi import BaseContext, GraphQLRouter
+from strawberry.types.nodes import SelectedField, Selection
 
-from app.db.repo import RecipeRepo
+from app.api.deps import get_service
+from app.core.config import settings
+from app.core.profiling import RequestProfile, current_profile
+from app.db.models import Recipe
 from app.services.recipes import RecipeService
+from app.domain.pagination import encode_cursor
 from app.domain.schemas import RecipeCreate
-from app.db.session import SessionLocal
 
 # Define GraphQL types
 @strawberry.type
@@ -14,69 +27,279 @@ class RecipeGQL:
     description: str | None
     created_at: str = strawberry.field(name="createdAt")
 
+# Full-text search hit
+@strawberry.type
+class RecipeSearchHitGQL(RecipeGQL):
+    snippet: str
+    score: float
+
+# Input type for batch creates
+@strawberry.input
+class RecipeInput:
+    title: str
+    description: str | None = None
+
+# Per-item outcome of a batch delete
+@strawberry.type
+class DeleteResultGQL:
+    id: int
+    deleted: bool
+
+# Relay-style connection types for paginated recipes
+@strawberry.type
+class RecipeEdge:
+    cursor: str
+    node: RecipeGQL
+
+@strawberry.type
+class PageInfo:
+    has_next_page: bool = strawberry.field(name="hasNextPage")
+    end_cursor: str | None = strawberry.field(name="endCursor")
+
+@strawberry.type
+class RecipeConnection:
+    edges: list[RecipeEdge]
+    page_info: PageInfo = strawberry.field(name="pageInfo")
+
 # Define Recommendation type
 @strawberry.type
 class RecommendationGQL:
     recommended_id: int | None = strawberry.field(name="recommendedId")
     title: str
     reason: str
+    cached: bool = False
+    stale: bool = False
+
+# One event of a streamed recommendation; which fields are set depends on the event
+@strawberry.type
+class RecommendationEventGQL:
+    event: str
+    recommended_id: int | None = strawberry.field(name="recommendedId", default=None)
+    title: str | None = None
+    text: str | None = None
+    reason: str | None = None
+    cached: bool | None = None
+    stale: bool | None = None
+    shed: bool | None = None
+    degraded: bool | None = None
+    detail: str | None = None
+
+# GraphQL field names on RecipeGQL mapped to recipe columns
+RECIPE_FIELD_COLUMNS = {"id": "id", "title": "title", "description": "description", "createdAt": "created_at"}
+
+# Convert an ORM recipe (or a projected row) into its GraphQL type; unselected
+# columns are never resolved, so they may be absent
+def to_gql(r: Recipe) -> RecipeGQL:
+    return RecipeGQL(
+        id=r.id,
+        title=getattr(r, "title", None),
+        description=getattr(r, "description", None),
+        created_at=r.created_at.isoformat(),
+    )
+
+# Flatten a selection set into its field selections, expanding fragments
+def field_selections(selections: list[Selection]) -> list[SelectedField]:
+    fields = []
+    for sel in selections:
+        if isinstance(sel, SelectedField):
+            fields.append(sel)
+        else:
+            fields.extend(field_selections(sel.selections))
+    return fields
+
+# Follow a path of field names down the selection set
+def nested_selections(selections: list[Selection], *path: str) -> list[Selection]:
+    for name in path:
+        selections = [c for f in field_selections(selections) if f.name == name for c in f.selections]
+    return selections
+
+# Recipe columns needed to resolve the given RecipeGQL selections
+def selected_columns(selections: list[Selection]) -> tuple[str, ...]:
+    names = {f.name for f in field_selections(selections)}
+    return tuple(col for field, col in RECIPE_FIELD_COLUMNS.items() if field in names)
+
+# Clamp a client-supplied page size to the configured bounds
+def page_size(first: int | None) -> int:
+    if first is None:
+        return settings.page_size_default
+    return max(1, min(first, settings.page_size_max))
+
+# Per-operation context: one session/service and one id loader for the whole operation
+class GraphQLContext(BaseContext):
+    def __init__(self, service: RecipeService):
+        super().__init__()
+        self.service = service
+        # Sibling resolvers run concurrently, but a session allows one operation at a time
+        self.lock = asyncio.Lock()
+        service.session_lock = self.lock
+        self.recipe_loader = DataLoader(load_fn=self.load_recipes)
+
+    # Batch recipe(id) lookups, one query per distinct projection
+    async def load_recipes(self, keys: list[tuple[int, tuple[str, ...]]]) -> list:
+        ids_by_columns: dict[tuple[str, ...], list[int]] = defaultdict(list)
+        for recipe_id, columns in keys:
+            ids_by_columns[columns].append(recipe_id)
 
-# Dependency to get RecipeService
-async def with_service(fn):
-    async with SessionLocal() as session:
-        svc = RecipeService(RecipeRepo(session))
-        return await fn(svc)
+        found = {}
+        async with self.lock:
+            for columns, ids in ids_by_columns.items():
+                for r in await self.service.get_recipes(ids, columns=columns):
+                    found[(r.id, columns)] = r
+        return [found.get(key) for key in keys]
+
+# Build the context from the same dependencies as the REST API
+async def get_context(service: RecipeService = Depends(get_service)) -> GraphQLContext:
+    return GraphQLContext(service)
+
+# Run a resolver body against the operation's shared service
+async def with_service(info: strawberry.Info, fn):
+    async with info.context.lock:
+        return await fn(info.context.service)
 
 # Define Query and Mutation types
 @strawberry.type
 class Query:
     @strawberry.field
-    async def recipes(self) -> list[RecipeGQL]: 
-        async def run(svc: RecipeService): 
-            items = await svc.list_recipes()
+    async def recipes(
+        self, info: strawberry.Info, first: int | None = None, after: str | None = None
+    ) -> list[RecipeGQL]:
+        columns = selected_columns(info.selected_fields[0].selections)
+
+        async def run(svc: RecipeService):
+            page = await svc.list_recipes(limit=page_size(first), cursor=after, columns=columns)
+            return [to_gql(r) for r in page.items]
+        return await with_service(info, run)
+
+    @strawberry.field
+    async def recipe(self, info: strawberry.Info, id: int) -> RecipeGQL | None:
+        columns = selected_columns(info.selected_fields[0].selections)
+        r = await info.context.recipe_loader.load((id, columns))
+        return to_gql(r) if r is not None else None
+
+    @strawberry.field(name="recipesConnection")
+    async def recipes_connection(
+        self, info: strawberry.Info, first: int | None = None, after: str | None = None
+    ) -> RecipeConnection:
+        columns = selected_columns(nested_selections(info.selected_fields[0].selections, "edges", "node"))
+
+        async def run(svc: RecipeService):
+            page = await svc.list_recipes(limit=page_size(first), cursor=after, columns=columns)
+            edges = [RecipeEdge(cursor=encode_cursor(r.created_at, r.id), node=to_gql(r)) for r in page.items]
+            return RecipeConnection(
+                edges=edges,
+                page_info=PageInfo(
+                    has_next_page=page.has_next,
+                    end_cursor=edges[-1].cursor if edges else None,
+                ),
+            )
+        return await with_service(info, run)
+
+    @strawberry.field(name="searchRecipes")
+    async def search_recipes(
+        self, info: strawberry.Info, query: str, first: int | None = None, offset: int = 0
+    ) -> list[RecipeSearchHitGQL]:
+        async def run(svc: RecipeService):
+            page = await svc.search_recipes(query, limit=page_size(first), offset=max(0, offset))
             return [
-                RecipeGQL(
+                RecipeSearchHitGQL(
                     id=r.id,
                     title=r.title,
                     description=r.description,
                     created_at=r.created_at.isoformat(),
+                    snippet=r.snippet,
+                    score=-r.rank,
                 )
-                for r in items
+                for r in page.items
             ]
-        return await with_service(run)
+        return await with_service(info, run)
 
+    # The service takes the operation lock itself around its database reads, so sibling
+    # resolvers are not held up for the length of the AI call
     @strawberry.field(name="recommendRecipe")
-    async def recommend_recipe(self) -> RecommendationGQL:
-        async def run(svc: RecipeService):
-            rec = await svc.recommend()
-            return RecommendationGQL(
-                recommended_id=rec.recommended_id,
-                title=rec.title,
-                reason=rec.reason,
-            )
-        return await with_service(run)
+    async def recommend_recipe(self, info: strawberry.Info) -> RecommendationGQL:
+        rec = await info.context.service.recommend()
+        return RecommendationGQL(
+            recommended_id=rec.recommended_id,
+            title=rec.title,
+            reason=rec.reason,
+            cached=rec.cached,
+            stale=rec.stale,
+        )
 
 
 @strawberry.type
 class Mutation:
     @strawberry.mutation(name="createRecipe")
-    async def create_recipe(self, title: str, description: str | None = None) -> RecipeGQL:
+    async def create_recipe(
+        self, info: strawberry.Info, title: str, description: str | None = None
+    ) -> RecipeGQL:
         async def run(svc: RecipeService):
             r = await svc.create_recipe(RecipeCreate(title=title, description=description))
-            return RecipeGQL(
-                id=r.id,
-                title=r.title,
-                description=r.description,
-                created_at=r.created_at.isoformat(),
-            )
-        return await with_service(run)
+            return to_gql(r)
+        return await with_service(info, run)
 
     @strawberry.mutation(name="deleteRecipe")
-    async def delete_recipe(self, recipe_id: int) -> bool:
+    async def delete_recipe(self, info: strawberry.Info, recipe_id: int) -> bool:
         async def run(svc: RecipeService):
             return await svc.delete_recipe(recipe_id)
-        return await with_service(run)
+        return await with_service(info, run)
+
+    @strawberry.mutation(name="createRecipes")
+    async def create_recipes(self, info: strawberry.Info, recipes: list[RecipeInput]) -> list[RecipeGQL]:
+        async def run(svc: RecipeService):
+            creates = [RecipeCreate(title=r.title, description=r.description) for r in recipes]
+            result = await svc.batch(creates=creates)
+            return [to_gql(r) for r in result.created]
+        return await with_service(info, run)
+
+    @strawberry.mutation(name="deleteRecipes")
+    async def delete_recipes(self, info: strawberry.Info, recipe_ids: list[int]) -> list[DeleteResultGQL]:
+        async def run(svc: RecipeService):
+            result = await svc.batch(delete_ids=recipe_ids)
+            return [DeleteResultGQL(id=i, deleted=i in result.deleted_ids) for i in recipe_ids]
+        return await with_service(info, run)
+
+@strawberry.type
+class Subscription:
+    # Same events as GET /recipes/recommendation/stream
+    @strawberry.subscription(name="recommendationStream")
+    async def recommendation_stream(self, info: strawberry.Info) -> AsyncGenerator[RecommendationEventGQL, None]:
+        async for event in info.context.service.stream_recommendation():
+            yield RecommendationEventGQL(event=event.event, **event.data)
+
+# Per-field resolver timings and the operation name for profiled requests; installed only
+# with PROFILING_ENABLED, as it wraps every resolver
+class ResolverTimingExtension(SchemaExtension):
+    def on_execute(self) -> Iterator[None]:
+        yield
+        profile = current_profile.get()
+        if profile is not None:
+            profile.operation = self.execution_context.operation_name or self.execution_context.operation_type.value
+
+    def resolve(self, _next, root, info: strawberry.Info, *args, **kwargs):
+        profile = current_profile.get()
+        if profile is None:
+            return _next(root, info, *args, **kwargs)
+        field = f"{info.parent_type.name}.{info.field_name}"
+        start = time.perf_counter()
+        result = _next(root, info, *args, **kwargs)
+        if inspect.isawaitable(result):
+            return self._timed(result, profile, field, start)
+        profile.add_resolver(field, time.perf_counter() - start)
+        return result
+
+    @staticmethod
+    async def _timed(result: Awaitable, profile: RequestProfile, field: str, start: float):
+        try:
+            return await result
+        finally:
+            profile.add_resolver(field, time.perf_counter() - start)
 
 # Create the GraphQL schema and router
-schema = strawberry.Schema(query=Query, mutation=Mutation)
-graphql_app = GraphQLRouter(schema)
\ No newline at end of file
+schema = strawberry.Schema(
+    query=Query,
+    mutation=Mutation,
+    subscription=Subscription,
+    extensions=[ResolverTimingExtension] if settings.profiling_enabled else [],
+)
+graphql_app = GraphQLRouter(schema, context_getter=get_context)
\ No newline at end of file
@@ -0,0 +1,126 @@
+import codecs
+import csv
+from collections import deque
+from collections.abc import AsyncIterator
+
+import orjson
+from pydantic import ValidationError
+
+from app.domain.schemas import RecipeCreate
+
+# Raised when an upload cannot be read at all (as opposed to a bad line)
+class ImportFormatError(ValueError):
+    pass
+
+# Split a byte stream into (line number, JSON value or error message), one line at a time
+async def ndjson_records(chunks: AsyncIterator[bytes]) -> AsyncIterator[tuple[int, object]]:
+    pending = b""
+    line_no = 0
+    async for chunk in chunks:
+        lines = (pending + chunk).split(b"\n")
+        pending = lines.pop()
+        for line in lines:
+            line_no += 1
+            if line.strip():
+                yield line_no, _json(line)
+    if pending.strip():
+        yield line_no + 1, _json(pending)
+
+def _json(line: bytes) -> object:
+    try:
+        return orjson.loads(line)
+    except orjson.JSONDecodeError:
+        return "Invalid JSON"
+
+# Line iterator for csv.reader over text that arrives in chunks. A record that runs past
+# the lines received so far is noticed by `ran_out` and its lines are handed back, to be
+# read again once more of the stream has arrived.
+class _ArrivingLines:
+    def __init__(self):
+        self.lines: deque[str] = deque()
+        self.taken: list[str] = []
+        self.ran_out = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        if not self.lines:
+            self.ran_out = True
+            raise StopIteration
+        line = self.lines.popleft()
+        self.taken.append(line)
+        return line
+
+    def give_back(self) -> None:
+        self.lines.extendleft(reversed(self.taken))
+
+# Split a byte stream into (line number, row dict or error message) by the header line.
+# One csv.reader reads the decoded stream line by line, so quoted fields may span lines
+# and chunks; csv's field size limit bounds how much an unterminated quote re-reads.
+async def csv_records(chunks: AsyncIterator[bytes]) -> AsyncIterator[tuple[int, object]]:
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    source = _ArrivingLines()
+    reader = csv.reader(source)
+    header: list[str] | None = None
+    pending = ""
+    line_no = 0
+
+    def parse(final: bool):
+        nonlocal header, line_no
+        while source.lines:
+            source.taken.clear()
+            source.ran_out = False
+            try:
+                fields = next(reader)
+            except csv.Error as exc:
+                raise ImportFormatError(f"CSV line {line_no + 1}: {exc}") from exc
+            if source.ran_out and not final:
+                source.give_back()
+                return
+            record_line = line_no + 1
+            line_no += len(source.taken)
+            if not fields:
+                continue
+            if header is None:
+                header = [name.strip() for name in fields]
+                if "title" not in header:
+                    raise ImportFormatError("CSV header must include a title column")
+                continue
+            if len(fields) != len(header):
+                yield record_line, f"Expected {len(header)} fields, got {len(fields)}"
+                continue
+            yield record_line, dict(zip(header, fields))
+
+    try:
+        async for chunk in chunks:
+            *lines, pending = (pending + decoder.decode(chunk)).split("\n")
+            source.lines.extend(line + "\n" for line in lines)
+            for record in parse(final=False):
+                yield record
+        pending += decoder.decode(b"", final=True)
+    except UnicodeDecodeError as exc:
+        raise ImportFormatError("CSV upload is not valid UTF-8") from exc
+    if pending:
+        source.lines.append(pending)
+    for record in parse(final=True):
+        yield record
+
+# Validate records against RecipeCreate; yields (line number, recipe or error message).
+# An empty CSV description means no description, as in the export.
+async def validated_recipes(records: AsyncIterator[tuple[int, object]]) -> AsyncIterator[tuple[int, RecipeCreate | str]]:
+    async for line_no, record in records:
+        if isinstance(record, str):
+            yield line_no, record
+            continue
+        if not isinstance(record, dict):
+            yield line_no, "Expected a JSON object"
+            continue
+        if record.get("description") == "":
+            record["description"] = None
+        try:
+            yield line_no, RecipeCreate.model_validate(record)
+        except ValidationError as exc:
+            yield line_no, "; ".join(
+                f"{'.'.join(str(part) for part in err['loc']) or 'row'}: {err['msg']}" for err in exc.errors()
+            )
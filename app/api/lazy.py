@@ -0,0 +1,37 @@
+import importlib
+
+from fastapi import FastAPI
+from starlette.routing import BaseRoute, Route, WebSocketRoute
+from starlette.types import Receive, Scope, Send
+
+# Stands in for a router whose module is expensive to import: the first request under
+# `prefix` imports "module:attribute", swaps the real routes in and re-dispatches
+class LazyRouter:
+    def __init__(self, app: FastAPI, target: str, prefix: str):
+        self.app = app
+        self.target = target
+        self.prefix = prefix
+        self.placeholders: list[BaseRoute] = [
+            Route(prefix, self, include_in_schema=False),
+            WebSocketRoute(prefix, self),
+        ]
+        app.router.routes.extend(self.placeholders)
+
+    @property
+    def loaded(self) -> bool:
+        return not self.placeholders
+
+    # Import the real router and replace the placeholders with it
+    def load(self) -> None:
+        if self.loaded:
+            return
+        module_name, attribute = self.target.split(":")
+        router = getattr(importlib.import_module(module_name), attribute)
+        for route in self.placeholders:
+            self.app.router.routes.remove(route)
+        self.placeholders = []
+        self.app.include_router(router, prefix=self.prefix)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        self.load()
+        await self.app.router(scope, receive, send)
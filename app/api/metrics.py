@@ -0,0 +1,38 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.core.metrics import registry
+from app.services.ai import ai_admission
+from app.services.cache import recommendation_cache
+from app.services.recipes import recommendation_flight
+
+# Define the metrics router
+router = APIRouter(tags=["metrics"])
+
+# Recommendation cache and single-flight counters, read at scrape time
+registry.counter_func(
+    "recommendation_cache_hits_total", "Recommendation cache hits.", lambda: recommendation_cache.hits
+)
+registry.counter_func(
+    "recommendation_cache_misses_total", "Recommendation cache misses.", lambda: recommendation_cache.misses
+)
+registry.gauge("recommendation_cache_entries", "Recommendation cache entries.", lambda: len(recommendation_cache))
+registry.counter_func(
+    "recommendation_singleflight_executions_total", "Recommendation computations actually run.",
+    lambda: recommendation_flight.executions,
+)
+registry.counter_func(
+    "recommendation_singleflight_coalesced_total", "Recommendation callers served by another caller's computation.",
+    lambda: recommendation_flight.coalesced,
+)
+registry.gauge(
+    "recommendation_singleflight_in_flight", "Recommendation computations in flight.",
+    lambda: recommendation_flight.in_flight,
+)
+registry.gauge("ai_in_flight", "Anthropic calls in flight.", lambda: ai_admission.in_flight)
+registry.gauge("ai_queue_depth", "Anthropic calls waiting for a slot.", lambda: ai_admission.queued)
+
+# Prometheus text exposition endpoint
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
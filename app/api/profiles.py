@@ -0,0 +1,38 @@
+import secrets
+
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import FileResponse
+
+from app.core.config import settings
+from app.core.profiling import profile_store
+from app.domain.schemas import ProfileSummary
+
+# Admin access: the X-Profile-Token header must carry PROFILING_TOKEN; without a token
+# the router is not mounted, and nothing is let through if it is
+def require_profiling_token(x_profile_token: str | None = Header(None)) -> None:
+    token = settings.profiling_token
+    if token is None or not (x_profile_token and secrets.compare_digest(x_profile_token, token)):
+        raise HTTPException(status_code=403, detail="Invalid profiling token")
+
+# Define the profiles admin router
+router = APIRouter(prefix="/admin/profiles", tags=["admin"], dependencies=[Depends(require_profiling_token)])
+
+@router.get("", response_model=list[ProfileSummary])
+async def list_profiles():
+    return profile_store.summaries()
+
+# The wall-clock trace, per-resolver timings and top functions of one profile
+@router.get("/{profile_id}")
+async def get_profile(profile_id: str):
+    path = profile_store.path(profile_id, ".json")
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="application/json")
+
+# The raw cProfile dump, for pstats, snakeviz and similar tools
+@router.get("/{profile_id}/pstats")
+async def download_pstats(profile_id: str):
+    path = profile_store.path(profile_id, ".prof")
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="application/octet-stream", filename=f"{profile_id}.prof")
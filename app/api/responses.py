@@ -0,0 +1,42 @@
+from collections.abc import Sequence
+
+import orjson
+from fastapi.responses import Response
+from sqlalchemy import Row
+
+# SQLite stores timestamps as "YYYY-MM-DD HH:MM:SS[.ffffff]"; pydantic renders them as
+# ISO 8601 with a "T" separator and no fractional part when microseconds are zero
+def format_stored_timestamp(value: str) -> str:
+    value = value.replace(" ", "T", 1)
+    if value.endswith(".000000"):
+        value = value[:-7]
+    return value
+
+# Encode recipe rows straight to JSON, byte-compatible with list[RecipeOut], or with its
+# narrowed model when only some `fields` are wanted
+def recipe_rows_json(rows: Sequence[Row], fields: Sequence[str] | None = None) -> bytes:
+    if fields is not None:
+        return orjson.dumps([
+            {
+                name: format_stored_timestamp(r.created_at) if name == "created_at" else getattr(r, name)
+                for name in fields
+            }
+            for r in rows
+        ])
+    return orjson.dumps([
+        {
+            "id": r.id,
+            "title": r.title,
+            "description": r.description,
+            "created_at": format_stored_timestamp(r.created_at),
+        }
+        for r in rows
+    ])
+
+# One Server-Sent Events frame with a JSON payload
+def sse_event(event: str, data: dict) -> bytes:
+    return b"event: " + event.encode() + b"\ndata: " + orjson.dumps(data) + b"\n\n"
+
+# JSON response whose body is already encoded
+class RawJSONResponse(Response):
+    media_type = "application/json"
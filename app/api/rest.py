@@ -1,26 +1,141 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Literal
 
-from app.db.session import get_session
-from app.db.repo import RecipeRepo
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+
+from app.api.caching import conditional_get
+from app.api.deps import get_service
+from app.api.export import csv_chunks, ndjson_chunks
+from app.api.fields import RECIPE_FIELDS, SEARCH_HIT_FIELDS, fieldset, narrowed_list_adapter
+from app.api.imports import ImportFormatError, csv_records, ndjson_records, validated_recipes
+from app.api.responses import RawJSONResponse, recipe_rows_json, sse_event
+from app.core.config import settings
 from app.services.recipes import RecipeService
-from app.domain.schemas import RecipeCreate, RecipeOut, RecommendationOut
+from app.domain.pagination import InvalidCursor
+from app.domain.schemas import (
+    DeleteResult,
+    ImportLineError,
+    ImportResultOut,
+    RecipeBatch,
+    RecipeBatchOut,
+    RecipeCreate,
+    RecipeOut,
+    RecipeSearchHit,
+    RecommendationOut,
+)
 
 # Define the API router
 router = APIRouter(prefix="/recipes", tags=["recipes"])
 
-# Dependency to get RecipeService
-def get_service(session: AsyncSession = Depends(get_session)) -> RecipeService:
-    return RecipeService(RecipeRepo(session))
-
 # Define API endpoints
 @router.post("", response_model=RecipeOut, status_code=201)
 async def create_recipe(payload: RecipeCreate, svc: RecipeService = Depends(get_service)):
     return await svc.create_recipe(payload)
 
+@router.post("/batch", response_model=RecipeBatchOut)
+async def batch_recipes(payload: RecipeBatch, svc: RecipeService = Depends(get_service)):
+    result = await svc.batch(creates=payload.create, delete_ids=payload.delete)
+    return RecipeBatchOut(
+        created=[RecipeOut.model_validate(row) for row in result.created],
+        deleted=[DeleteResult(id=i, deleted=i in result.deleted_ids) for i in payload.delete],
+    )
+
 @router.get("", response_model=list[RecipeOut])
-async def list_recipes(svc: RecipeService = Depends(get_service)):
-    return await svc.list_recipes()
+async def list_recipes(
+    request: Request,
+    validators: dict[str, str] = Depends(conditional_get),
+    limit: int = Query(settings.page_size_default, ge=1, le=settings.page_size_max),
+    cursor: str | None = None,
+    fields: tuple[str, ...] | None = Depends(fieldset(RECIPE_FIELDS)),
+    svc: RecipeService = Depends(get_service),
+):
+    try:
+        page = await svc.list_recipes(limit=limit, cursor=cursor, columns=fields, created_at_text=True)
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    # Trusted DB rows are encoded directly, skipping per-row RecipeOut validation
+    response = RawJSONResponse(recipe_rows_json(page.items, fields), headers=validators)
+
+    # Advertise the next page via headers so the body stays a plain list
+    if page.next_cursor:
+        next_url = request.url.include_query_params(cursor=page.next_cursor, limit=limit)
+        response.headers["X-Next-Cursor"] = page.next_cursor
+        response.headers["Link"] = f'<{next_url}>; rel="next"'
+    return response
+
+@router.get("/search", response_model=list[RecipeSearchHit], dependencies=[Depends(conditional_get)])
+async def search_recipes(
+    request: Request,
+    response: Response,
+    q: str = Query(min_length=1, max_length=200),
+    limit: int = Query(settings.page_size_default, ge=1, le=settings.page_size_max),
+    offset: int = Query(0, ge=0),
+    fields: tuple[str, ...] | None = Depends(fieldset(SEARCH_HIT_FIELDS)),
+    svc: RecipeService = Depends(get_service),
+):
+    page = await svc.search_recipes(q, limit=limit, offset=offset, columns=fields)
+    if page.next_cursor:
+        next_url = request.url.include_query_params(offset=page.next_cursor, limit=limit)
+        response.headers["X-Next-Offset"] = page.next_cursor
+        response.headers["Link"] = f'<{next_url}>; rel="next"'
+    # bm25 is lower-is-better; expose a higher-is-better score
+    if fields is not None:
+        adapter = narrowed_list_adapter(RecipeSearchHit, fields)
+        hits = adapter.validate_python([
+            {name: -row.rank if name == "score" else getattr(row, name) for name in fields}
+            for row in page.items
+        ])
+        return RawJSONResponse(adapter.dump_json(hits), headers=response.headers)
+    return [
+        RecipeSearchHit(
+            id=row.id,
+            title=row.title,
+            description=row.description,
+            created_at=row.created_at,
+            snippet=row.snippet,
+            score=-row.rank,
+        )
+        for row in page.items
+    ]
+
+@router.get("/export")
+async def export_recipes(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    batch_size: int = Query(1000, ge=1, le=10000),
+    svc: RecipeService = Depends(get_service),
+):
+    # Rows are written as they come off the cursor, so memory stays flat
+    batches = svc.stream_recipes(batch_size=batch_size)
+    if format == "csv":
+        body, media_type = csv_chunks(batches), "text/csv"
+    else:
+        body, media_type = ndjson_chunks(batches), "application/x-ndjson"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="recipes.{format}"'},
+    )
+
+@router.post("/import", response_model=ImportResultOut)
+async def import_recipes(
+    request: Request,
+    format: Literal["ndjson", "csv"] = "ndjson",
+    svc: RecipeService = Depends(get_service),
+):
+    # The body is parsed as it arrives and committed in chunks, so memory stays flat
+    records = csv_records(request.stream()) if format == "csv" else ndjson_records(request.stream())
+    try:
+        report = await svc.import_recipes(validated_recipes(records))
+    except ImportFormatError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return ImportResultOut(
+        imported=report.imported,
+        rejected=report.rejected,
+        errors=[ImportLineError(line=line, error=error) for line, error in report.errors],
+        seconds=round(report.seconds, 6),
+        rows_per_second=round(report.rows_per_second, 1),
+    )
 
 @router.delete("/{recipe_id}", status_code=204)
 async def delete_recipe(recipe_id: int, svc: RecipeService = Depends(get_service)):
@@ -29,7 +144,28 @@ async def delete_recipe(recipe_id: int, svc: RecipeService = Depends(get_service
         raise HTTPException(status_code=404, detail="Recipe not found")
     return None
 
-@router.get("/recommendation", response_model=RecommendationOut)
-async def recommend_recipe(svc: RecipeService = Depends(get_service)):
+@router.get("/recommendation", response_model=RecommendationOut, dependencies=[Depends(conditional_get)])
+async def recommend_recipe(response: Response, svc: RecipeService = Depends(get_service)):
     rec = await svc.recommend()
-    return RecommendationOut(recommended_id=rec.recommended_id, title=rec.title, reason=rec.reason)
+    response.headers["X-Cache"] = "STALE" if rec.stale else "HIT" if rec.cached else "MISS"
+    if rec.stale:
+        # The validators describe the current catalog, not this older answer; without
+        # them a client cannot revalidate into keeping it
+        del response.headers["ETag"]
+        del response.headers["Last-Modified"]
+    return RecommendationOut(
+        recommended_id=rec.recommended_id, title=rec.title, reason=rec.reason, cached=rec.cached, stale=rec.stale
+    )
+
+# The recommendation as Server-Sent Events: the pick as soon as the model names it,
+# then the reason piece by piece, then the complete result
+@router.get("/recommendation/stream")
+async def stream_recommendation(svc: RecipeService = Depends(get_service)):
+    async def body():
+        async for event in svc.stream_recommendation():
+            yield sse_event(event.event, event.data)
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
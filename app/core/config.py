@@ -5,10 +5,100 @@ class Settings(BaseSettings):
     model_config = SettingsConfigDict(env_file=".env", extra="ignore")
 
     database_url: str = "sqlite+aiosqlite:///./recipes.db"
+    # Defaults to database_url; reads go through a separate read-only pool
+    database_read_url: str | None = None
+    database_read_pool_size: int = 8
+
+    # SQLite engine profile, applied on every new connection
+    sqlite_journal_mode: str = "wal"
+    sqlite_synchronous: str = "normal"
+    sqlite_mmap_size: int = 256 * 1024 * 1024
+    sqlite_cache_size: int = -64 * 1024  # negative means KiB
+    sqlite_busy_timeout_ms: int = 5000
+
+    # Group-commit single-recipe creates/deletes: flush every N ms or N operations
+    write_batching: bool = False
+    write_batch_max_ops: int = 256
+    write_batch_max_delay_ms: float = 2.0
+
+    # Serve list, lookup and recommendation-candidate reads from an in-process copy of
+    # the catalog, loaded at startup and kept current by this process's writes
+    catalog_snapshot: bool = False
+
+    # Bulk import: rows committed per transaction, and how many line errors are reported
+    import_chunk_size: int = 5000
+    import_max_errors: int = 100
+
+    # Expose /metrics and record request, SQL and AI-call instrumentation
+    metrics_enabled: bool = True
+
+    # Per-request profiling: requests sending an X-Profile header whose value is
+    # profiling_token, plus a sampled share of the rest, are run under cProfile with a
+    # wall-clock trace of SQL, AI calls and GraphQL resolvers. The last profiling_max_files
+    # profiles are kept under profiling_dir and served at /admin/profiles (X-Profile-Token).
+    # Without a token the header is ignored and /admin/profiles is not mounted.
+    profiling_enabled: bool = False
+    profiling_sample_rate: float = 0.0
+    profiling_dir: str = "./profiles"
+    profiling_max_files: int = 50
+    profiling_token: str | None = None
+
+    # Pagination settings
+    page_size_default: int = 50
+    page_size_max: int = 500
+
+    # Recommendation cache settings
+    recommendation_cache_ttl: float = 300.0
+    recommendation_cache_size: int = 128
+
+    # Background recommendation refresh: recompute after catalog changes settle for
+    # `debounce` seconds (at most `max_delay` after the first), polling for other workers' writes.
+    # A refresh the AI could not answer is retried with jittered backoff up to `retry_max` seconds
+    recommendation_refresh_enabled: bool = True
+    recommendation_refresh_debounce: float = 1.0
+    recommendation_refresh_max_delay: float = 10.0
+    recommendation_refresh_poll_interval: float = 5.0
+    recommendation_refresh_retry_base: float = 1.0
+    recommendation_refresh_retry_max: float = 60.0
+
+    # Local ranking engine settings; when disabled the newest recipes are the candidates
+    ranking_enabled: bool = True
+    ranking_dim: int = 256
+    ranking_diversity: float = 0.3
+    ranking_description_chars: int = 2000
+
+    # Recommendation candidate settings
+    ai_candidate_count: int = 25
+    ai_description_chars: int = 500
+    # Estimated input tokens for the candidate table; descriptions are shortened to fit
+    ai_prompt_token_budget: int = 1500
 
     # Anthropic  API settings
     anthropic_api_key: str | None = None
     anthropic_model: str = "claude-3-5-sonnet-latest"
+    anthropic_base_url: str = "https://api.anthropic.com"
+
+    # Admission control for Anthropic calls: at most `ai_max_concurrency` in flight and
+    # `ai_max_queue` waiting. Each request gets a latency budget (the X-Request-Deadline
+    # header in ms, capped by request_budget_ms); a call that cannot finish within it, or
+    # would start with less than ai_min_budget_ms left, falls back to the local pick
+    ai_max_concurrency: int = 16
+    ai_max_queue: int = 64
+    ai_min_budget_ms: float = 250.0
+    request_budget_ms: float | None = 10000.0
+
+    # AI HTTP client settings (connection pool, retries, circuit breaker)
+    ai_timeout: float = 15.0
+    ai_connect_timeout: float = 5.0
+    ai_max_connections: int = 20
+    ai_max_keepalive_connections: int = 10
+    ai_keepalive_expiry: float = 30.0
+    ai_http2: bool = False
+    ai_max_retries: int = 2
+    ai_backoff_base: float = 0.25
+    ai_backoff_max: float = 4.0
+    ai_breaker_failure_threshold: int = 5
+    ai_breaker_reset_timeout: float = 30.0
 
 # Instantiate settings
 settings = Settings()
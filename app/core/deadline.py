@@ -0,0 +1,54 @@
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.core.config import settings
+
+DEADLINE_HEADER = b"x-request-deadline"
+
+# Monotonic time by which the current request wants its answer, if it has a budget
+request_deadline: ContextVar[float | None] = ContextVar("request_deadline", default=None)
+
+# Seconds left in the current request's budget, or None when it has none
+def remaining_budget() -> float | None:
+    deadline = request_deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+# Run the block with a latency budget of `seconds`
+@contextmanager
+def deadline_scope(seconds: float | None) -> Iterator[None]:
+    token = request_deadline.set(None if seconds is None else time.monotonic() + seconds)
+    try:
+        yield
+    finally:
+        request_deadline.reset(token)
+
+# Latency budget in seconds for a request: the X-Request-Deadline header (milliseconds),
+# never more than the configured REQUEST_BUDGET_MS
+def request_budget(scope: Scope) -> float | None:
+    budget_ms = settings.request_budget_ms
+    for name, value in scope.get("headers", ()):
+        if name == DEADLINE_HEADER:
+            try:
+                requested = float(value)
+            except ValueError:
+                break
+            if requested >= 0:
+                budget_ms = requested if budget_ms is None else min(requested, budget_ms)
+            break
+    return None if budget_ms is None else budget_ms / 1000
+
+# ASGI middleware giving every HTTP request its latency budget
+class DeadlineMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        with deadline_scope(request_budget(scope)):
+            await self.app(scope, receive, send)
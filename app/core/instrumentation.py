@@ -0,0 +1,106 @@
+import time
+from contextvars import ContextVar
+from functools import cache
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.metrics import (
+    db_pool_checkout_wait,
+    db_statement_duration,
+    http_request_db_duration,
+    http_request_db_statements,
+    http_request_duration,
+)
+
+# SQL work attributed to the current HTTP request
+class RequestStats:
+    __slots__ = ("statements", "db_seconds")
+
+    def __init__(self):
+        self.statements = 0
+        self.db_seconds = 0.0
+
+request_stats: ContextVar[RequestStats | None] = ContextVar("request_stats", default=None)
+
+# Route template (not the raw path) keeps label cardinality bounded
+def route_template(scope: Scope) -> str:
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+# ASGI middleware recording per-route latency and per-request SQL counts
+class MetricsMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = request_stats.set(stats)
+        status = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            route = route_template(scope)
+            http_request_duration.observe(elapsed, method=scope["method"], route=route, status=status)
+            http_request_db_statements.observe(stats.statements, route=route)
+            http_request_db_duration.observe(stats.db_seconds, route=route)
+            request_stats.reset(token)
+
+# First keyword of a statement (SELECT, INSERT, ...)
+def statement_kind(statement: str) -> str:
+    head = statement.lstrip().split(None, 1)
+    return head[0].upper() if head else "OTHER"
+
+# Time every statement on an engine and attribute it to the current request
+def instrument_engine(engine: AsyncEngine, name: str) -> None:
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_start", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["metrics_start"].pop()
+        db_statement_duration.observe(elapsed, engine=name, statement=statement_kind(statement))
+        stats = request_stats.get()
+        if stats is not None:
+            stats.statements += 1
+            stats.db_seconds += elapsed
+
+    @event.listens_for(sync_engine, "handle_error")
+    def handle_error(context):
+        starts = context.connection.info.get("metrics_start") if context.connection is not None else None
+        if starts:
+            starts.pop()
+
+# Queue pool that records how long checkouts wait for a free connection
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    engine_name = "default"
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            db_pool_checkout_wait.observe(time.perf_counter() - start, engine=self.engine_name)
+
+# Pool class labelled for one engine; a subclass survives pool recreation on dispose()
+@cache
+def timed_pool_class(engine_name: str) -> type[TimedQueuePool]:
+    return type(f"TimedQueuePool_{engine_name}", (TimedQueuePool,), {"engine_name": engine_name})
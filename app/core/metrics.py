@@ -0,0 +1,172 @@
+import bisect
+import math
+from collections.abc import Callable, Iterable
+
+# Default latency buckets, in seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelKey = tuple[tuple[str, str], ...]
+
+def _label_key(labels: dict[str, object]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def _format_labels(key: LabelKey, extra: tuple[tuple[str, str], ...] = ()) -> str:
+    pairs = key + extra
+    if not pairs:
+        return ""
+    escaped = (v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+# Monotonically increasing counter
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self._values: dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = _label_key(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(_label_key(labels), 0.0)
+
+    def samples(self) -> Iterable[str]:
+        for key, value in self._values.items():
+            yield f"{self.name}{_format_labels(key)} {_format_value(value)}"
+
+# Value read from a callback at scrape time
+class Gauge:
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, fn: Callable[[], float | dict[LabelKey, float]]):
+        self.name = name
+        self.help = help
+        self.fn = fn
+
+    def samples(self) -> Iterable[str]:
+        value = self.fn()
+        values = value if isinstance(value, dict) else {(): value}
+        for key, v in values.items():
+            yield f"{self.name}{_format_labels(key)} {_format_value(v)}"
+
+# Counter kept by the instrumented object itself and read from a callback at scrape time
+class CounterFunc(Gauge):
+    kind = "counter"
+
+# Cumulative histogram with fixed buckets
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        # Per label set: [bucket counts..., +Inf count], sum
+        self._values: dict[LabelKey, tuple[list[int], list[float]]] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = _label_key(labels)
+        entry = self._values.get(key)
+        if entry is None:
+            entry = self._values[key] = ([0] * (len(self.buckets) + 1), [0.0])
+        counts, total = entry
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        total[0] += value
+
+    def count(self, **labels) -> int:
+        entry = self._values.get(_label_key(labels))
+        return sum(entry[0]) if entry else 0
+
+    def samples(self) -> Iterable[str]:
+        for key, (counts, total) in self._values.items():
+            cumulative = 0
+            for bound, n in zip(self.buckets + (math.inf,), counts):
+                cumulative += n
+                le = (("le", _format_value(bound)),)
+                yield f"{self.name}_bucket{_format_labels(key, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(key)} {_format_value(total[0])}"
+            yield f"{self.name}_count{_format_labels(key)} {cumulative}"
+
+# Holds every metric and renders the Prometheus text exposition format
+class Registry:
+    def __init__(self):
+        self._metrics: dict[str, Counter | CounterFunc | Gauge | Histogram] = {}
+
+    def register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str) -> Counter:
+        return self.register(Counter(name, help))
+
+    def counter_func(self, name: str, help: str, fn: Callable[[], float | dict[LabelKey, float]]) -> CounterFunc:
+        return self.register(CounterFunc(name, help, fn))
+
+    def histogram(self, name: str, help: str, buckets: tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, buckets))
+
+    def gauge(self, name: str, help: str, fn: Callable[[], float | dict[LabelKey, float]]) -> Gauge:
+        return self.register(Gauge(name, help, fn))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+# Process-wide registry and the metrics recorded by the app
+registry = Registry()
+
+http_request_duration = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template, method and status."
+)
+http_request_db_statements = registry.histogram(
+    "http_request_db_statements", "SQL statements executed per HTTP request.",
+    buckets=(0, 1, 2, 3, 5, 10, 25, 50, 100),
+)
+http_request_db_duration = registry.histogram(
+    "http_request_db_duration_seconds", "Time spent executing SQL per HTTP request."
+)
+db_statement_duration = registry.histogram(
+    "db_statement_duration_seconds", "SQL statement latency by engine and statement type."
+)
+db_pool_checkout_wait = registry.histogram(
+    "db_pool_checkout_wait_seconds", "Time spent waiting for a pooled DB connection."
+)
+ai_call_duration = registry.histogram(
+    "ai_call_duration_seconds", "Anthropic call latency by outcome.",
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 15.0, 30.0),
+)
+ai_stream_time_to_pick = registry.histogram(
+    "ai_stream_time_to_pick_seconds", "Time until a streamed recommendation's pick is known.",
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 15.0),
+)
+ai_prompt_tokens = registry.histogram(
+    "ai_prompt_estimated_tokens", "Estimated input tokens per Anthropic request (system prompt and candidates).",
+    buckets=(100, 250, 500, 1000, 1500, 2000, 3000, 5000, 10000),
+)
+ai_input_tokens = registry.counter(
+    "ai_input_tokens_total", "Input tokens reported by Anthropic by kind (input, cache_read, cache_write)."
+)
+ai_calls = registry.counter(
+    "ai_calls_total", "AI recommendation calls by outcome (success, parse_fallback, http_error, bad_response, breaker_open, shed)."
+)
+ai_shed = registry.counter(
+    "ai_shed_total", "AI calls answered by the fallback instead of queueing, by reason (queue_full, deadline)."
+)
+request_profiles = registry.counter(
+    "request_profiles_total", "Profiled requests by outcome (saved, save_failed, busy)."
+)
+recommendation_refreshes = registry.counter(
+    "recommendation_refreshes_total", "Background recommendation refreshes by outcome (success, shed, degraded, error)."
+)
@@ -0,0 +1,245 @@
+import asyncio
+import cProfile
+import io
+import logging
+import pstats
+import random
+import re
+import secrets
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from pathlib import Path
+
+import orjson
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.metrics import request_profiles
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = b"x-profile"
+PROFILE_ID_RE = re.compile(r"^\d{8}T\d{12}Z-[0-9a-f]{6}$")
+
+# Wall-clock spans kept per profile; SQL-heavy requests beyond this are only counted
+MAX_SPANS = 2000
+# Functions listed in a profile's text summary by cumulative time: overall, then this
+# application's own (dependencies, services, repository, clients)
+TOP_FUNCTIONS = 40
+APP_FUNCTIONS = re.escape(str(Path(__file__).resolve().parents[1]))
+# Keys of a profile listed by the admin endpoint
+SUMMARY_FIELDS = ("id", "started_at", "method", "path", "query", "operation", "status", "ms")
+
+# Wall-clock trace of one profiled request: SQL statements, AI calls and GraphQL resolvers
+class RequestProfile:
+    def __init__(self, method: str, path: str, query: str = ""):
+        self.started_at = datetime.now(timezone.utc)
+        self.id = f"{self.started_at:%Y%m%dT%H%M%S%f}Z-{secrets.token_hex(3)}"
+        self.method = method
+        self.path = path
+        self.query = query
+        self.operation: str | None = None
+        self.status: int | None = None
+        self.seconds = 0.0
+        self.origin = time.perf_counter()
+        self.spans: list[tuple[str, str, float, float]] = []
+        self.dropped_spans = 0
+        self.totals: dict[str, list[float]] = {}
+        self.resolvers: dict[str, list[float]] = {}
+
+    # Record a span of `kind` that started at perf_counter() time `start`
+    def add(self, kind: str, name: str, start: float, seconds: float) -> None:
+        total = self.totals.setdefault(kind, [0, 0.0])
+        total[0] += 1
+        total[1] += seconds
+        if len(self.spans) < MAX_SPANS:
+            self.spans.append((kind, name, start - self.origin, seconds))
+        else:
+            self.dropped_spans += 1
+
+    # Resolvers run once per object, so they are aggregated per field: count, total, max
+    def add_resolver(self, field: str, seconds: float) -> None:
+        timing = self.resolvers.get(field)
+        if timing is None:
+            self.resolvers[field] = [1, seconds, seconds]
+        else:
+            timing[0] += 1
+            timing[1] += seconds
+            timing[2] = max(timing[2], seconds)
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "started_at": self.started_at.isoformat(),
+            "method": self.method,
+            "path": self.path,
+            "query": self.query,
+            "operation": self.operation,
+            "status": self.status,
+            "ms": round(self.seconds * 1000, 3),
+        }
+
+    def to_dict(self, functions: str) -> dict:
+        return {
+            **self.summary(),
+            "totals": {kind: {"count": n, "ms": round(s * 1000, 3)} for kind, (n, s) in self.totals.items()},
+            "spans": [
+                {"kind": kind, "name": name, "start_ms": round(start * 1000, 3), "ms": round(s * 1000, 3)}
+                for kind, name, start, s in self.spans
+            ],
+            "dropped_spans": self.dropped_spans,
+            "resolvers": [
+                {"field": field, "count": n, "total_ms": round(total * 1000, 3), "max_ms": round(worst * 1000, 3)}
+                for field, (n, total, worst) in sorted(self.resolvers.items(), key=lambda item: -item[1][1])
+            ],
+            "functions": functions,
+        }
+
+current_profile: ContextVar[RequestProfile | None] = ContextVar("current_profile", default=None)
+
+# Time the block as a span of the current request's profile, if it is being profiled
+@contextmanager
+def traced(kind: str, name: str) -> Iterator[None]:
+    profile = current_profile.get()
+    if profile is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.add(kind, name, start, time.perf_counter() - start)
+
+# SQL spans for every engine, tests' included; costs one context lookup per statement
+# when nothing is being profiled
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if current_profile.get() is not None:
+        conn.info.setdefault("profile_start", []).append(time.perf_counter())
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = current_profile.get()
+    starts = conn.info.get("profile_start")
+    if profile is not None and starts:
+        start = starts.pop()
+        profile.add("sql", " ".join(statement.split())[:300], start, time.perf_counter() - start)
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(context):
+    starts = context.connection.info.get("profile_start") if context.connection is not None else None
+    if starts:
+        starts.pop()
+
+# Bounded on-disk ring buffer of profiles: <id>.json (trace and top functions) and
+# <id>.prof (pstats dump); the oldest are removed beyond `max_profiles`
+class ProfileStore:
+    def __init__(self, directory: str, max_profiles: int):
+        self.directory = Path(directory)
+        self.max_profiles = max_profiles
+
+    def save(self, profile: RequestProfile, profiler: cProfile.Profile) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        out = io.StringIO()
+        stats = pstats.Stats(profiler, stream=out)
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(TOP_FUNCTIONS)
+        stats.print_stats(APP_FUNCTIONS, TOP_FUNCTIONS)
+        stats.dump_stats(self.directory / f"{profile.id}.prof")
+        # The JSON file is what listing looks for, so it is written last and atomically
+        tmp = self.directory / f"{profile.id}.json.tmp"
+        tmp.write_bytes(orjson.dumps(profile.to_dict(out.getvalue())))
+        tmp.replace(self.directory / f"{profile.id}.json")
+        self.prune()
+
+    def prune(self) -> None:
+        for path in self._json_files()[: -self.max_profiles or None]:
+            path.unlink(missing_ok=True)
+            path.with_suffix(".prof").unlink(missing_ok=True)
+
+    # Profile ids sort by start time, so names order the buffer
+    def _json_files(self) -> list[Path]:
+        if not self.directory.is_dir():
+            return []
+        return sorted(p for p in self.directory.glob("*.json") if PROFILE_ID_RE.match(p.stem))
+
+    # Summaries of the stored profiles, newest first
+    def summaries(self) -> list[dict]:
+        summaries = []
+        for path in reversed(self._json_files()):
+            try:
+                data = orjson.loads(path.read_bytes())
+            except (OSError, orjson.JSONDecodeError):
+                continue
+            summaries.append({key: data.get(key) for key in SUMMARY_FIELDS})
+        return summaries
+
+    # Path of a stored profile's file with `suffix`, or None for unknown ids
+    def path(self, profile_id: str, suffix: str) -> Path | None:
+        if not PROFILE_ID_RE.match(profile_id):
+            return None
+        path = self.directory / f"{profile_id}{suffix}"
+        return path if path.is_file() else None
+
+profile_store = ProfileStore(settings.profiling_dir, settings.profiling_max_files)
+
+# Whether a request asked to be profiled (X-Profile carrying PROFILING_TOKEN; without a
+# token the header is ignored) or was picked by sampling
+def wants_profile(scope: Scope) -> bool:
+    for name, value in scope.get("headers", ()):
+        if name == PROFILE_HEADER:
+            token = settings.profiling_token
+            return token is not None and secrets.compare_digest(value, token.encode())
+    return settings.profiling_sample_rate > 0 and random.random() < settings.profiling_sample_rate
+
+# ASGI middleware profiling selected HTTP requests with cProfile plus a wall-clock trace.
+# cProfile sees the whole event-loop thread, so one request is profiled at a time and
+# work interleaved from concurrent requests may still show up in it.
+class ProfilingMiddleware:
+    # cProfile hooks the thread, not the instance: one profile at a time per process
+    busy = False
+
+    def __init__(self, app: ASGIApp, store: ProfileStore | None = None):
+        self.app = app
+        self.store = store or profile_store
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not wants_profile(scope):
+            await self.app(scope, receive, send)
+            return
+        if ProfilingMiddleware.busy:
+            request_profiles.inc(outcome="busy")
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile(scope["method"], scope["path"], scope.get("query_string", b"").decode("latin-1"))
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                profile.status = message["status"]
+                message["headers"] = [*message.get("headers", []), (b"x-profile-id", profile.id.encode())]
+            await send(message)
+
+        ProfilingMiddleware.busy = True
+        token = current_profile.set(profile)
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profiler.disable()
+            profile.seconds = time.perf_counter() - profile.origin
+            current_profile.reset(token)
+            ProfilingMiddleware.busy = False
+            # Written off the event loop, after the response has gone out
+            try:
+                await asyncio.to_thread(self.store.save, profile, profiler)
+            except OSError:
+                request_profiles.inc(outcome="save_failed")
+                logger.exception("Saving profile %s failed", profile.id)
+            else:
+                request_profiles.inc(outcome="saved")
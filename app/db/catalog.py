@@ -0,0 +1,57 @@
+from collections.abc import Callable
+from datetime import datetime, timezone
+
+# In-process mirror of the catalog_meta row. Writes through RecipeRepo update it from
+# their own transaction; reads refresh it from the database so changes made by other
+# workers are seen too. `generation` moves only when a change was made elsewhere,
+# telling process-local derived state (the ranking index) to rebuild.
+class CatalogState:
+    def __init__(self):
+        self._listeners: list[Callable[[], None]] = []
+        self.reset()
+
+    # Call `fn` after every observed change, local or from another worker
+    def subscribe(self, fn: Callable[[], None]) -> None:
+        self._listeners.append(fn)
+
+    def unsubscribe(self, fn: Callable[[], None]) -> None:
+        self._listeners.remove(fn)
+
+    def reset(self) -> None:
+        self.epoch = ""
+        self.version = 0
+        self.last_modified = datetime.fromtimestamp(0, timezone.utc)
+        self.generation = 0
+
+    @property
+    def etag(self) -> str:
+        return f'W/"{self.epoch}-{self.version}"'
+
+    # Record the row as read from the database; returns whether it changed
+    def observe(self, epoch: str, version: int, modified_at: int) -> bool:
+        if (epoch, version) == (self.epoch, self.version):
+            return False
+        self.generation += 1
+        self._set(epoch, version, modified_at)
+        self._notify()
+        return True
+
+    # Record the row written by this process; a gap in versions means another
+    # writer got in between
+    def record_write(self, epoch: str, version: int, modified_at: int) -> None:
+        if (epoch, version - 1) != (self.epoch, self.version):
+            self.generation += 1
+        self._set(epoch, version, modified_at)
+        self._notify()
+
+    def _set(self, epoch: str, version: int, modified_at: int) -> None:
+        self.epoch = epoch
+        self.version = version
+        self.last_modified = datetime.fromtimestamp(modified_at, timezone.utc)
+
+    def _notify(self) -> None:
+        for fn in list(self._listeners):
+            fn()
+
+# Process-wide catalog state
+catalog_state = CatalogState()
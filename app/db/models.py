@@ -1,15 +1,37 @@
-from datetime import datetime
+from datetime import datetime, timezone
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
-from sqlalchemy import String, Text, DateTime, func
+from sqlalchemy import Integer, String, Text, DateTime, Index, func
 
 class Base(DeclarativeBase):
     pass
 
+# Timestamps are generated in Python so every row is stored in the same format,
+# which keeps keyset comparisons on created_at exact
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
 # Recipe model
 class Recipe(Base):
     __tablename__ = "recipes"
+    __table_args__ = (
+        # Backs keyset pagination ordered by (created_at, id)
+        Index("ix_recipes_created_at_id", "created_at", "id"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     title: Mapped[str] = mapped_column(String(200), nullable=False)
     description: Mapped[str | None] = mapped_column(Text, nullable=True)
-    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=utcnow, server_default=func.now(), nullable=False
+    )
+
+# Single-row change marker for the recipe collection, bumped inside every write
+# transaction so all workers share one version
+class CatalogMeta(Base):
+    __tablename__ = "catalog_meta"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    epoch: Mapped[str] = mapped_column(String(32), nullable=False)
+    version: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    # Unix seconds of the last change; never decreases (see RecipeRepo._bump_catalog)
+    modified_at: Mapped[int] = mapped_column(Integer, nullable=False)
@@ -1,31 +1,309 @@
-from sqlalchemy import select, delete
+import re
+import time
+from collections.abc import AsyncIterator, Sequence
+from dataclasses import dataclass, field
+from datetime import datetime
+from functools import cache
+from sqlalchemy import Float, Row, String, TextClause, column, func, select, delete, insert, literal, text, tuple_, type_coerce, update
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.db.models import Recipe
+from app.db.catalog import catalog_state
+from app.db.models import CatalogMeta, Recipe, utcnow
+from app.db.schema import FTS_TABLE
+from app.db.snapshot import catalog_snapshot
 
-# Recipe repository
+# Keep multi-row statements well under SQLite's bound-parameter limit
+BATCH_CHUNK_SIZE = 500
+
+SEARCH_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+# Select-list entries of the full-text search query, by result column
+SEARCH_COLUMNS = {
+    "id": ("r.id AS id", Recipe.id),
+    "title": ("r.title AS title", Recipe.title),
+    "description": ("r.description AS description", Recipe.description),
+    "created_at": ("r.created_at AS created_at", Recipe.created_at),
+    "snippet": (f"snippet({FTS_TABLE}, -1, '<mark>', '</mark>', '…', 12) AS snippet", column("snippet", String)),
+    # bm25 column weights: a title hit counts more than a description hit
+    "rank": (f"bm25({FTS_TABLE}, 2.0, 1.0) AS rank", column("rank", Float)),
+}
+
+# Full-text search query returning the given columns (id and rank always, for ordering);
+# snippets are only built when asked for
+@cache
+def search_statement(columns: tuple[str, ...] = tuple(SEARCH_COLUMNS)) -> TextClause:
+    names = [name for name in SEARCH_COLUMNS if name in columns or name in ("id", "rank")]
+    return text(f"""
+        SELECT {", ".join(SEARCH_COLUMNS[name][0] for name in names)}
+        FROM {FTS_TABLE}
+        JOIN recipes r ON r.id = {FTS_TABLE}.rowid
+        WHERE {FTS_TABLE} MATCH :match
+        ORDER BY rank, r.id
+        LIMIT :limit OFFSET :offset
+    """).columns(*(SEARCH_COLUMNS[name][1] for name in names))
+
+# Turn free text into an FTS5 expression: every word must match, as a prefix
+def fts_match_expression(q: str) -> str | None:
+    tokens = SEARCH_TOKEN_RE.findall(q)
+    if not tokens:
+        return None
+    return " ".join(f'"{t}"*' for t in tokens)
+
+# Columns a caller may project; id and created_at are always kept for keyset paging
+RECIPE_COLUMNS = ("id", "title", "description", "created_at")
+
+# Resolve requested column names to Recipe columns, in table order; with
+# `created_at_text` the timestamp comes back as its stored text, skipping datetime parsing
+def recipe_columns(names: Sequence[str], created_at_text: bool = False) -> list:
+    wanted = set(names) | {"id", "created_at"}
+    columns = [getattr(Recipe, name) for name in RECIPE_COLUMNS if name in wanted]
+    if created_at_text:
+        columns = [
+            type_coerce(c, String).label("created_at") if c is Recipe.created_at else c
+            for c in columns
+        ]
+    return columns
+
+# Outcome of a batch write
+@dataclass
+class BatchResult:
+    created: list[Row] = field(default_factory=list)
+    deleted_ids: set[int] = field(default_factory=set)
+
+# Recipe repository; reads go through `read_session` when one is given
 class RecipeRepo:
-    def __init__(self, session: AsyncSession):
+    def __init__(self, session: AsyncSession, read_session: AsyncSession | None = None):
         self.session = session
+        self.reader = read_session or session
+
+    # Bump the shared catalog marker inside the current write transaction. modified_at is
+    # the write time (never moved backwards by clock skew between workers); writes within
+    # one second are told apart by the version alone.
+    async def _bump_catalog(self) -> tuple[str, int, int]:
+        res = await self.session.execute(
+            update(CatalogMeta)
+            .where(CatalogMeta.id == 1)
+            .values(
+                version=CatalogMeta.version + 1,
+                modified_at=func.max(CatalogMeta.modified_at, int(time.time())),
+            )
+            .returning(CatalogMeta.epoch, CatalogMeta.version, CatalogMeta.modified_at)
+        )
+        return tuple(res.one())
+
+    # Refresh the in-process catalog mirror from the database; returns whether it changed.
+    # A request sees one catalog state, so the row is read once per read session unless
+    # `fresh` asks to look again.
+    async def sync_catalog(self, fresh: bool = False) -> bool:
+        if not fresh and self.reader.info.get("catalog_synced"):
+            return False
+        res = await self.reader.execute(
+            select(CatalogMeta.epoch, CatalogMeta.version, CatalogMeta.modified_at).where(CatalogMeta.id == 1)
+        )
+        row = res.one()
+        self.reader.info["catalog_synced"] = True
+        return catalog_state.observe(*row)
+
+    # Record a committed write in the catalog mirror and the read snapshot, with no
+    # await in between, so readers never see one without the other
+    @staticmethod
+    def _record_write(
+        marker: tuple[str, int, int],
+        created: Sequence[tuple[int, str, str | None, datetime]] = (),
+        deleted: Sequence[int] = (),
+    ) -> None:
+        catalog_state.record_write(*marker)
+        catalog_snapshot.apply(marker[0], marker[1], created=created, deleted=deleted)
 
     # Create a new recipe
     async def create(self, title: str, description: str | None) -> Recipe:
         recipe = Recipe(title=title, description=description)
         self.session.add(recipe)
+        await self.session.flush()
+        marker = await self._bump_catalog()
         await self.session.commit()
+        self._record_write(marker, created=[(recipe.id, recipe.title, recipe.description, recipe.created_at)])
         await self.session.refresh(recipe)
         return recipe
 
     # List all recipes
     async def list_all(self) -> list[Recipe]:
-        res = await self.session.execute(
+        res = await self.reader.execute(
             select(Recipe).order_by(Recipe.created_at.desc())
         )
         return list(res.scalars().all())
 
+    # Fetch recipes by ID, preserving the order of `ids`; `columns` returns projected rows
+    async def get_many(self, ids: Sequence[int], columns: Sequence[str] | None = None) -> list[Recipe | Row]:
+        if not ids:
+            return []
+        if columns is None:
+            res = await self.reader.execute(select(Recipe).where(Recipe.id.in_(ids)))
+            found = res.scalars().all()
+        else:
+            res = await self.reader.execute(select(*recipe_columns(columns)).where(Recipe.id.in_(ids)))
+            found = res.all()
+        by_id = {r.id: r for r in found}
+        return [by_id[i] for i in ids if i in by_id]
+
+    # Lightweight (id, title, truncated description) rows for recommendation prompts:
+    # the given ids in order, or the newest `limit` recipes when no ids are given
+    async def recommendation_candidates(
+        self, ids: Sequence[int] | None = None, limit: int = 25, description_chars: int = 500
+    ) -> list[Row]:
+        stmt = select(
+            Recipe.id,
+            Recipe.title,
+            func.substr(Recipe.description, 1, description_chars).label("description"),
+        )
+        if ids is None:
+            stmt = stmt.order_by(Recipe.created_at.desc(), Recipe.id.desc()).limit(limit)
+            res = await self.reader.execute(stmt)
+            return list(res.all())
+
+        if not ids:
+            return []
+        res = await self.reader.execute(stmt.where(Recipe.id.in_(ids[:limit])))
+        by_id = {r.id: r for r in res.all()}
+        return [by_id[i] for i in ids[:limit] if i in by_id]
+
+    # Number of recipes and the sum of their ids: a cheap check that a copy of the id set
+    # (the ranking index) still matches the table
+    async def fingerprint(self) -> tuple[int, int]:
+        res = await self.reader.execute(select(func.count(), func.coalesce(func.sum(Recipe.id), 0)))
+        count, id_sum = res.one()
+        return count, id_sum
+
+    # Ids of every recipe
+    async def all_ids(self) -> list[int]:
+        res = await self.reader.execute(select(Recipe.id))
+        return list(res.scalars().all())
+
+    # List up to `limit` recipes, newest first, strictly after the (created_at, id) keyset position;
+    # `columns` returns projected rows instead of ORM objects
+    async def list_page(
+        self,
+        limit: int,
+        after: tuple[datetime, int] | None = None,
+        columns: Sequence[str] | None = None,
+        created_at_text: bool = False,
+    ) -> list[Recipe | Row]:
+        if columns is None and not created_at_text:
+            stmt = select(Recipe)
+        else:
+            stmt = select(*recipe_columns(columns or RECIPE_COLUMNS, created_at_text=created_at_text))
+        stmt = stmt.order_by(Recipe.created_at.desc(), Recipe.id.desc()).limit(limit)
+        if after is not None:
+            created_at, recipe_id = after
+            stmt = stmt.where(
+                tuple_(Recipe.created_at, Recipe.id)
+                < tuple_(literal(created_at, Recipe.created_at.type), literal(recipe_id))
+            )
+        res = await self.reader.execute(stmt)
+        return list(res.scalars().all() if columns is None and not created_at_text else res.all())
+
+    # Full-text search ranked by bm25, best match first; `columns` limits what is read
+    async def search(self, q: str, limit: int, offset: int = 0, columns: Sequence[str] | None = None) -> list[Row]:
+        match = fts_match_expression(q)
+        if match is None:
+            return []
+        stmt = search_statement() if columns is None else search_statement(tuple(columns))
+        res = await self.reader.execute(stmt, {"match": match, "limit": limit, "offset": offset})
+        return list(res.all())
+
+    # Stream every recipe (or those with ids above `after_id`) as plain rows in batches,
+    # using a server-side cursor; `description_chars` truncates descriptions in SQL and
+    # `created_at_text` keeps timestamps as stored text
+    async def stream_all(
+        self,
+        batch_size: int = 1000,
+        description_chars: int | None = None,
+        created_at_text: bool = False,
+        after_id: int | None = None,
+    ) -> AsyncIterator[Sequence[Row]]:
+        description = Recipe.description
+        if description_chars is not None:
+            description = func.substr(Recipe.description, 1, description_chars).label("description")
+        created_at = type_coerce(Recipe.created_at, String).label("created_at") if created_at_text else Recipe.created_at
+        stmt = (
+            select(Recipe.id, Recipe.title, description, created_at)
+            .order_by(Recipe.created_at.desc(), Recipe.id.desc())
+            .execution_options(yield_per=batch_size)
+        )
+        if after_id is not None:
+            stmt = stmt.where(Recipe.id > after_id)
+        result = await self.reader.stream(stmt)
+        try:
+            async for batch in result.partitions():
+                yield batch
+        finally:
+            await result.close()
+
     # Delete a recipe by ID
     async def delete(self, recipe_id: int) -> bool:
         res = await self.session.execute(
             delete(Recipe).where(Recipe.id == recipe_id)
         )
+        deleted = (res.rowcount or 0) > 0
+        marker = await self._bump_catalog() if deleted else None
         await self.session.commit()
-        return (res.rowcount or 0) > 0
+        if marker is not None:
+            self._record_write(marker, deleted=[recipe_id])
+        return deleted
+
+    # Insert many recipes in one transaction; returns how many were written
+    async def insert_many(self, rows: Sequence[tuple[str, str | None]]) -> int:
+        if not rows:
+            return 0
+        try:
+            # Core insert of plain parameters, skipping ORM bookkeeping; one timestamp per
+            # transaction, so only ids need to come back
+            created_at = utcnow()
+            res = await self.session.execute(
+                insert(Recipe.__table__).returning(Recipe.id),
+                [{"title": title, "description": description, "created_at": created_at} for title, description in rows],
+            )
+            # RETURNING order is unspecified; ids follow parameter order
+            ids = sorted(res.scalars().all())
+            created = [(recipe_id, title, description, created_at) for recipe_id, (title, description) in zip(ids, rows)]
+            marker = await self._bump_catalog()
+            await self.session.commit()
+        except Exception:
+            await self.session.rollback()
+            raise
+        self._record_write(marker, created=created)
+        return len(created)
+
+    # Create and delete many recipes in a single transaction
+    async def batch(
+        self,
+        creates: Sequence[tuple[str, str | None]] = (),
+        delete_ids: Sequence[int] = (),
+    ) -> BatchResult:
+        result = BatchResult()
+        try:
+            for start in range(0, len(creates), BATCH_CHUNK_SIZE):
+                chunk = creates[start:start + BATCH_CHUNK_SIZE]
+                res = await self.session.execute(
+                    insert(Recipe)
+                    .values([{"title": title, "description": description} for title, description in chunk])
+                    .returning(Recipe.id, Recipe.title, Recipe.description, Recipe.created_at)
+                )
+                # RETURNING order is unspecified; ids follow VALUES order
+                result.created.extend(sorted(res.all(), key=lambda row: row.id))
+
+            unique_ids = list(dict.fromkeys(delete_ids))
+            for start in range(0, len(unique_ids), BATCH_CHUNK_SIZE):
+                chunk = unique_ids[start:start + BATCH_CHUNK_SIZE]
+                res = await self.session.execute(
+                    delete(Recipe).where(Recipe.id.in_(chunk)).returning(Recipe.id)
+                )
+                result.deleted_ids.update(res.scalars().all())
+
+            marker = await self._bump_catalog() if result.created or result.deleted_ids else None
+            await self.session.commit()
+            if marker is not None:
+                self._record_write(marker, created=result.created, deleted=sorted(result.deleted_ids))
+        except Exception:
+            await self.session.rollback()
+            raise
+        return result
@@ -0,0 +1,123 @@
+import time
+import uuid
+from collections.abc import Callable
+
+from sqlalchemy import Column, Connection, Integer, MetaData, Table, insert, inspect, select, text, update
+
+from app.db.models import CatalogMeta, Recipe
+
+# FTS5 index mirroring recipes.title/description (external content, no duplicated text)
+FTS_TABLE = "recipes_fts"
+
+FTS_DDL = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        title, description,
+        content='recipes', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS recipes_fts_ai AFTER INSERT ON recipes BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, description) VALUES (new.id, new.title, new.description);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS recipes_fts_ad AFTER DELETE ON recipes BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+    END
+    """,
+    # Only text changes touch the index; the created_at rewrite below must not, since
+    # it can fire before the insert trigger has indexed the row
+    "DROP TRIGGER IF EXISTS recipes_fts_au",
+    f"""
+    CREATE TRIGGER recipes_fts_au AFTER UPDATE OF title, description ON recipes BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO {FTS_TABLE}(rowid, title, description) VALUES (new.id, new.title, new.description);
+    END
+    """,
+]
+
+# Keyset paging compares created_at as stored text, so every row must use the ORM's
+# "YYYY-MM-DD HH:MM:SS.ffffff" form; CURRENT_TIMESTAMP (the server default, and any
+# row written before Python-side defaults) has no fractional part
+CREATED_AT_NORMALIZE = """
+    UPDATE recipes SET created_at = created_at || '.000000'
+    WHERE length(created_at) = 19
+"""
+
+CREATED_AT_TRIGGER = """
+    CREATE TRIGGER IF NOT EXISTS recipes_created_at_ai AFTER INSERT ON recipes
+    WHEN length(new.created_at) = 19 BEGIN
+        UPDATE recipes SET created_at = new.created_at || '.000000' WHERE id = new.id;
+    END
+"""
+
+# Single-row record of the last migration applied to this database
+schema_version = Table("schema_version", MetaData(), Column("version", Integer, nullable=False))
+
+# Create the recipes table and the keyset index
+def create_recipes(conn: Connection) -> None:
+    Recipe.__table__.create(conn, checkfirst=True)
+    # Table creation is skipped on existing databases, and with it the indexes
+    for index in Recipe.__table__.indexes:
+        index.create(conn, checkfirst=True)
+
+# Create and seed the catalog change marker
+def create_catalog_meta(conn: Connection) -> None:
+    CatalogMeta.__table__.create(conn, checkfirst=True)
+    init_catalog_meta(conn)
+
+# Ordered migrations, each applied once per database. Every step is idempotent, so a
+# database created before versioning (no schema_version row) replays them safely.
+# Append new steps; never reorder or edit shipped ones.
+MIGRATIONS: list[tuple[int, Callable[[Connection], None]]] = [
+    (1, create_recipes),
+    (2, lambda conn: init_created_at(conn) if conn.dialect.name == "sqlite" else None),
+    (3, lambda conn: init_fts(conn) if conn.dialect.name == "sqlite" else None),
+    (4, create_catalog_meta),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+# Version of the last applied migration, creating the version table on first run
+def current_schema_version(conn: Connection) -> int:
+    if not inspect(conn).has_table(schema_version.name):
+        schema_version.create(conn)
+        conn.execute(insert(schema_version).values(version=0))
+        return 0
+    return conn.execute(select(schema_version.c.version)).scalar_one()
+
+# Bring the database up to SCHEMA_VERSION; a database already there costs two cheap
+# queries, so this runs on every startup. Returns the migrations applied.
+def init_schema(conn: Connection) -> list[int]:
+    current = current_schema_version(conn)
+    applied = []
+    for version, migrate in MIGRATIONS:
+        if version > current:
+            migrate(conn)
+            conn.execute(update(schema_version).values(version=version))
+            applied.append(version)
+    return applied
+
+# Seed the catalog change marker; a fresh epoch keeps validators from an older
+# database from matching a recreated one
+def init_catalog_meta(conn: Connection) -> None:
+    if conn.execute(select(CatalogMeta.id).where(CatalogMeta.id == 1)).first() is None:
+        conn.execute(insert(CatalogMeta).values(id=1, epoch=uuid.uuid4().hex[:8], version=0, modified_at=int(time.time())))
+
+# Rewrite legacy timestamps to the canonical form and keep raw inserts canonical
+def init_created_at(conn: Connection) -> None:
+    conn.execute(text(CREATED_AT_NORMALIZE))
+    conn.execute(text(CREATED_AT_TRIGGER))
+
+# Create the FTS5 table and its sync triggers, backfilling it on first creation
+def init_fts(conn: Connection) -> None:
+    existed = inspect(conn).has_table(FTS_TABLE)
+    for ddl in FTS_DDL:
+        conn.execute(text(ddl))
+    if not existed:
+        conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
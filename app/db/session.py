@@ -1,12 +1,71 @@
 from collections.abc import AsyncGenerator
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from app.core.config import settings
+from app.core.instrumentation import instrument_engine, timed_pool_class
+
+# Whether a SQLAlchemy URL points at an in-memory SQLite database
+def is_memory_sqlite(url: str) -> bool:
+    parsed = make_url(url)
+    return parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:")
+
+# Apply the configured SQLite pragmas to every new DBAPI connection
+def apply_sqlite_pragmas(dbapi_conn, read_only: bool) -> None:
+    cursor = dbapi_conn.cursor()
+    try:
+        cursor.execute(f"PRAGMA busy_timeout = {int(settings.sqlite_busy_timeout_ms)}")
+        cursor.execute(f"PRAGMA cache_size = {int(settings.sqlite_cache_size)}")
+        cursor.execute(f"PRAGMA mmap_size = {int(settings.sqlite_mmap_size)}")
+        cursor.execute(f"PRAGMA synchronous = {settings.sqlite_synchronous}")
+        if read_only:
+            cursor.execute("PRAGMA query_only = ON")
+        else:
+            # journal_mode is persistent; only writers need to set it
+            cursor.execute(f"PRAGMA journal_mode = {settings.sqlite_journal_mode}")
+    finally:
+        cursor.close()
+
+# Build an async engine with the SQLite profile applied; `name` labels its metrics
+def build_engine(
+    url: str, *, read_only: bool = False, pool_size: int | None = None, name: str = "default"
+) -> AsyncEngine:
+    kwargs = {}
+    if pool_size is not None and not is_memory_sqlite(url):
+        kwargs.update(pool_size=pool_size, max_overflow=0)
+        if settings.metrics_enabled:
+            kwargs.update(poolclass=timed_pool_class(name))
+    engine = create_async_engine(url, echo=False, **kwargs)
+    if engine.dialect.name == "sqlite":
+        @event.listens_for(engine.sync_engine, "connect")
+        def on_connect(dbapi_conn, _record):
+            apply_sqlite_pragmas(dbapi_conn, read_only=read_only)
+    if settings.metrics_enabled:
+        instrument_engine(engine, name)
+    return engine
+
+# Database setup: a single-writer engine for mutations and a read-only pool for queries.
+# In-memory databases are per connection, so they share the writer engine.
+engine: AsyncEngine = build_engine(settings.database_url, pool_size=1, name="writer")
+if is_memory_sqlite(settings.database_url):
+    read_engine: AsyncEngine = engine
+else:
+    read_engine = build_engine(
+        settings.database_read_url or settings.database_url,
+        read_only=True,
+        pool_size=settings.database_read_pool_size,
+        name="reader",
+    )
 
-# Database setup
-engine: AsyncEngine = create_async_engine(settings.database_url, echo=False)
 SessionLocal = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+ReadSessionLocal = async_sessionmaker(read_engine, expire_on_commit=False, class_=AsyncSession)
 
 # Dependency to get DB session
 async def get_session() -> AsyncGenerator[AsyncSession, None]:
     async with SessionLocal() as session:
         yield session
+
+# Dependency to get a read-only DB session
+async def get_read_session() -> AsyncGenerator[AsyncSession, None]:
+    async with ReadSessionLocal() as session:
+        yield session
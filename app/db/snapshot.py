@@ -0,0 +1,136 @@
+from bisect import bisect_left
+from collections.abc import Iterable, Sequence
+from datetime import datetime
+
+# Format SQLite stores DateTime columns in; keys compare in the same order as the index
+def stored_timestamp(value: datetime) -> str:
+    return value.strftime("%Y-%m-%d %H:%M:%S.%f")
+
+# One recipe read from the snapshot, shaped like a projected row; `created_at` is the
+# stored text or a datetime, as the caller asked
+class SnapshotRecipe:
+    __slots__ = ("id", "title", "description", "created_at")
+
+    def __init__(self, id: int, title: str, description: str | None, created_at: str | datetime):
+        self.id = id
+        self.title = title
+        self.description = description
+        self.created_at = created_at
+
+# In-process, column-oriented copy of the recipes table for read traffic. Parallel lists
+# are kept sorted by the (created_at, id) keyset, so a page is a bisect and a slice.
+# The snapshot reflects exactly one catalog version: RecipeRepo applies its own writes
+# together with the version they produced, and anything else (a write from another
+# worker, or one applied out of order) unloads it until the next reload.
+class CatalogSnapshot:
+    def __init__(self):
+        self.reset()
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    # Drop everything and mark the snapshot as not loaded
+    def reset(self) -> None:
+        self.loaded = False
+        self.epoch = ""
+        self.version = 0
+        self._keys: list[tuple[str, int]] = []
+        self._titles: list[str] = []
+        self._descriptions: list[str | None] = []
+        self._key_of: dict[int, tuple[str, int]] = {}
+
+    # Replace the contents with (id, title, description, created_at text) rows in any order
+    def load(self, rows: Iterable[tuple[int, str, str | None, str]], epoch: str, version: int) -> None:
+        ordered = sorted(((created_at, recipe_id), title, description) for recipe_id, title, description, created_at in rows)
+        self._keys = [key for key, _, _ in ordered]
+        self._titles = [title for _, title, _ in ordered]
+        self._descriptions = [description for _, _, description in ordered]
+        self._key_of = {key[1]: key for key in self._keys}
+        self.epoch, self.version = epoch, version
+        self.loaded = True
+
+    # Whether the snapshot holds the given catalog version
+    def current(self, epoch: str, version: int) -> bool:
+        return self.loaded and (self.epoch, self.version) == (epoch, version)
+
+    # Apply a committed local write. Only the write directly following the snapshot's
+    # version can be applied; otherwise something is missing and the snapshot unloads.
+    def apply(
+        self,
+        epoch: str,
+        version: int,
+        created: Iterable[tuple[int, str, str | None, datetime]] = (),
+        deleted: Iterable[int] = (),
+    ) -> None:
+        if not self.loaded:
+            return
+        if (epoch, version - 1) != (self.epoch, self.version):
+            self.reset()
+            return
+        for recipe_id in deleted:
+            self._remove(recipe_id)
+        for recipe_id, title, description, created_at in created:
+            self._add(recipe_id, title, description, stored_timestamp(created_at))
+        self.version = version
+
+    def _add(self, recipe_id: int, title: str, description: str | None, created_at: str) -> None:
+        self._remove(recipe_id)
+        key = (created_at, recipe_id)
+        # New recipes are almost always the newest, so this is usually an append
+        if not self._keys or key > self._keys[-1]:
+            self._keys.append(key)
+            self._titles.append(title)
+            self._descriptions.append(description)
+        else:
+            pos = bisect_left(self._keys, key)
+            self._keys.insert(pos, key)
+            self._titles.insert(pos, title)
+            self._descriptions.insert(pos, description)
+        self._key_of[recipe_id] = key
+
+    def _remove(self, recipe_id: int) -> None:
+        key = self._key_of.pop(recipe_id, None)
+        if key is None:
+            return
+        pos = bisect_left(self._keys, key)
+        del self._keys[pos], self._titles[pos], self._descriptions[pos]
+
+    def _row(self, pos: int, created_at_text: bool, description_chars: int | None = None) -> SnapshotRecipe:
+        created_at, recipe_id = self._keys[pos]
+        description = self._descriptions[pos]
+        if description_chars is not None and description is not None:
+            description = description[:description_chars]
+        return SnapshotRecipe(
+            recipe_id,
+            self._titles[pos],
+            description,
+            created_at if created_at_text else datetime.fromisoformat(created_at),
+        )
+
+    # Up to `limit` recipes, newest first, strictly after the (created_at, id) position
+    def page(
+        self,
+        limit: int,
+        after: tuple[datetime, int] | None = None,
+        created_at_text: bool = False,
+        description_chars: int | None = None,
+    ) -> list[SnapshotRecipe]:
+        end = len(self._keys)
+        if after is not None:
+            created_at, recipe_id = after
+            end = bisect_left(self._keys, (stored_timestamp(created_at), recipe_id))
+        return [self._row(pos, created_at_text, description_chars) for pos in range(end - 1, max(end - limit, 0) - 1, -1)]
+
+    # Recipes by ID, in the order of `ids`, skipping unknown ones
+    def get_many(
+        self, ids: Sequence[int], created_at_text: bool = False, description_chars: int | None = None
+    ) -> list[SnapshotRecipe]:
+        rows = []
+        for recipe_id in ids:
+            key = self._key_of.get(recipe_id)
+            if key is not None:
+                rows.append(self._row(bisect_left(self._keys, key), created_at_text, description_chars))
+        return rows
+
+# Process-wide snapshot, used when settings.catalog_snapshot is on
+catalog_snapshot = CatalogSnapshot()
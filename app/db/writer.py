@@ -0,0 +1,147 @@
+import asyncio
+import time
+from dataclasses import dataclass, field
+
+from sqlalchemy import Row
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.core.config import settings
+from app.db.repo import RecipeRepo
+
+# A queued write and the future its caller is waiting on
+@dataclass
+class WriteOp:
+    kind: str  # "create" or "delete"
+    args: tuple
+    future: asyncio.Future = field(default_factory=lambda: asyncio.get_running_loop().create_future())
+
+# Raised to callers whose write could not be accepted or completed
+class WriterClosed(RuntimeError):
+    pass
+
+# Marks the end of the queue on shutdown
+_STOP = object()
+
+# Group-commit queue: concurrent creates/deletes are flushed together as one transaction
+# every `max_delay` seconds or `max_ops` operations, whichever comes first
+class WriteBatcher:
+    def __init__(
+        self,
+        session_maker: async_sessionmaker[AsyncSession],
+        max_ops: int | None = None,
+        max_delay: float | None = None,
+    ):
+        self.session_maker = session_maker
+        self.max_ops = max_ops or settings.write_batch_max_ops
+        self.max_delay = settings.write_batch_max_delay_ms / 1000 if max_delay is None else max_delay
+        self.flushes = 0
+        self.ops_written = 0
+        self._queue: asyncio.Queue | None = None
+        self._task: asyncio.Task | None = None
+        self._closing = False
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done() and not self._closing
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._closing = False
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._run(), name="write-batcher")
+
+    # Stop accepting work and let the loop flush everything already queued
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._closing = True
+        self._queue.put_nowait(_STOP)
+        try:
+            await self._task
+        finally:
+            self._task = None
+
+    # Queue a create and wait for its inserted row
+    async def create(self, title: str, description: str | None) -> Row:
+        return await self._submit(WriteOp("create", (title, description)))
+
+    # Queue a delete and wait for whether it removed a row
+    async def delete(self, recipe_id: int) -> bool:
+        return await self._submit(WriteOp("delete", (recipe_id,)))
+
+    async def _submit(self, op: WriteOp):
+        if not self.running:
+            raise WriterClosed("write batcher is not running")
+        self._queue.put_nowait(op)
+        return await op.future
+
+    async def _run(self) -> None:
+        ops: list[WriteOp] = []
+        try:
+            stopping = False
+            while not stopping:
+                item = await self._queue.get()
+                if item is _STOP:
+                    break
+                ops = [item]
+                deadline = time.monotonic() + self.max_delay
+                while len(ops) < self.max_ops:
+                    remaining = deadline - time.monotonic()
+                    try:
+                        item = self._queue.get_nowait() if remaining <= 0 else await asyncio.wait_for(self._queue.get(), remaining)
+                    except (asyncio.QueueEmpty, asyncio.TimeoutError):
+                        break
+                    if item is _STOP:
+                        stopping = True
+                        break
+                    ops.append(item)
+                await self._flush(ops)
+                ops = []
+        finally:
+            # Anything taken off the queue or still queued that was not written fails loudly
+            while not self._queue.empty():
+                item = self._queue.get_nowait()
+                if item is not _STOP:
+                    ops.append(item)
+            for op in ops:
+                if not op.future.done():
+                    op.future.set_exception(WriterClosed("write batcher stopped before the write completed"))
+
+    # Write a group in one transaction; if it fails, retry each op alone so one bad
+    # write cannot fail its neighbours
+    async def _flush(self, ops: list[WriteOp]) -> None:
+        ops = [op for op in ops if not op.future.done()]
+        if not ops:
+            return
+        try:
+            await self._write(ops)
+        except Exception as exc:
+            if len(ops) == 1:
+                ops[0].future.set_exception(exc)
+                return
+            for op in ops:
+                await self._flush([op])
+
+    async def _write(self, ops: list[WriteOp]) -> None:
+        creates = [op for op in ops if op.kind == "create"]
+        deletes = [op for op in ops if op.kind == "delete"]
+        async with self.session_maker() as session:
+            result = await RecipeRepo(session).batch(
+                creates=[op.args for op in creates],
+                delete_ids=[op.args[0] for op in deletes],
+            )
+        self.flushes += 1
+        self.ops_written += len(ops)
+
+        for op, row in zip(creates, result.created):
+            if not op.future.done():
+                op.future.set_result(row)
+
+        # Only the first delete of an id in a group reports that it removed the row
+        claimed: set[int] = set()
+        for op in deletes:
+            recipe_id = op.args[0]
+            deleted = recipe_id in result.deleted_ids and recipe_id not in claimed
+            claimed.add(recipe_id)
+            if not op.future.done():
+                op.future.set_result(deleted)
@@ -0,0 +1,35 @@
+import base64
+import json
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Generic, TypeVar
+
+T = TypeVar("T")
+
+# Raised when a client sends a cursor we did not issue
+class InvalidCursor(ValueError):
+    pass
+
+# A page of results plus the cursor for the next one
+@dataclass
+class Page(Generic[T]):
+    items: list[T] = field(default_factory=list)
+    next_cursor: str | None = None
+
+    @property
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+# Encode a (created_at, id) keyset position as an opaque cursor
+def encode_cursor(created_at: datetime, recipe_id: int) -> str:
+    raw = json.dumps([created_at.isoformat(), recipe_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+# Decode a cursor back into its (created_at, id) keyset position
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, recipe_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(created_at), int(recipe_id)
+    except (ValueError, TypeError) as exc:
+        raise InvalidCursor("Invalid cursor") from exc
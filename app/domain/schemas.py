@@ -15,8 +15,56 @@ class RecipeOut(BaseModel):
 
     model_config = {"from_attributes": True}
 
+# Schema for a full-text search hit
+class RecipeSearchHit(RecipeOut):
+    snippet: str
+    score: float
+
+# Schema for a batch of writes applied in one transaction
+class RecipeBatch(BaseModel):
+    create: list[RecipeCreate] = Field(default_factory=list, max_length=5000)
+    delete: list[int] = Field(default_factory=list, max_length=5000)
+
+# Per-item outcome of a batch delete
+class DeleteResult(BaseModel):
+    id: int
+    deleted: bool
+
+# Schema for outputting the result of a batch
+class RecipeBatchOut(BaseModel):
+    created: list[RecipeOut]
+    deleted: list[DeleteResult]
+
+# A rejected line of a bulk import
+class ImportLineError(BaseModel):
+    line: int
+    error: str
+
+# Schema for the outcome of a bulk import
+class ImportResultOut(BaseModel):
+    imported: int
+    rejected: int
+    # The first settings.import_max_errors rejected lines
+    errors: list[ImportLineError]
+    seconds: float
+    rows_per_second: float
+
+# Schema for a stored request profile, as listed by the admin endpoint
+class ProfileSummary(BaseModel):
+    id: str
+    started_at: datetime
+    method: str
+    path: str
+    query: str
+    operation: str | None
+    status: int | None
+    ms: float
+
 # Schema for AI recommendation output
 class RecommendationOut(BaseModel):
     recommended_id: int | None
     title: str
     reason: str
+    cached: bool = False
+    # Computed for an earlier catalog version; a background refresh is pending
+    stale: bool = False
@@ -1,23 +1,81 @@
+import logging
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 
 from app.api.rest import router as recipes_router
-from app.api.graphql import graphql_app
-from app.db.session import engine
-from app.db.models import Base
+from app.api.lazy import LazyRouter
+from app.api.metrics import router as metrics_router
+from app.api.profiles import router as profiles_router
+from app.core.config import settings
+from app.core.deadline import DeadlineMiddleware
+from app.core.instrumentation import MetricsMiddleware
+from app.core.profiling import ProfilingMiddleware
+from app.db.repo import RecipeRepo
+from app.db.session import ReadSessionLocal, SessionLocal, engine
+from app.db.schema import init_schema
+from app.db.writer import WriteBatcher
+from app.services.ai import LazyAIClient
+from app.services.recipes import RecipeService
+from app.services.refresher import RecommendationRefresher
+
+logger = logging.getLogger(__name__)
 
 # Define application lifespan 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Create database tables on startup
+    # Create database tables, indexes and full-text search on startup
     async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
-    
-    yield
+        await conn.run_sync(init_schema)
+
+    # One AI client (and connection pool) shared by every request, built on first use
+    app.state.ai_client = LazyAIClient()
+
+    # Optional in-process copy of the catalog for reads, loaded before traffic arrives
+    if settings.catalog_snapshot:
+        async with SessionLocal() as session, ReadSessionLocal() as read_session:
+            await RecipeService(RecipeRepo(session, read_session), ai=app.state.ai_client).load_snapshot()
+
+    # Optional group commit for single-recipe writes
+    app.state.write_batcher = WriteBatcher(SessionLocal) if settings.write_batching else None
+    if app.state.write_batcher is not None:
+        app.state.write_batcher.start()
+
+    # Recompute the recommendation in the background after catalog changes
+    app.state.recommendation_refresher = None
+    if settings.recommendation_refresh_enabled:
+        app.state.recommendation_refresher = RecommendationRefresher(
+            SessionLocal, ReadSessionLocal, ai=app.state.ai_client
+        )
+        app.state.recommendation_refresher.start()
+    try:
+        yield
+    finally:
+        if app.state.recommendation_refresher is not None:
+            await app.state.recommendation_refresher.stop()
+        if app.state.write_batcher is not None:
+            await app.state.write_batcher.stop()
+        await app.state.ai_client.aclose()
 
 
 app = FastAPI(title="Recipe API", lifespan=lifespan)
 
-# Include REST and GraphQL routers
+# Include REST and GraphQL routers; Strawberry is imported on the first /graphql request
 app.include_router(recipes_router)
-app.include_router(graphql_app, prefix="/graphql")
+graphql_router = LazyRouter(app, "app.api.graphql:graphql_app", prefix="/graphql")
+
+# Every request carries its latency budget (X-Request-Deadline) for the AI call
+app.add_middleware(DeadlineMiddleware)
+
+# Instrumentation: per-route latency middleware and the /metrics endpoint
+if settings.metrics_enabled:
+    app.add_middleware(MetricsMiddleware)
+    app.include_router(metrics_router)
+
+# Opt-in per-request profiling, outermost so the profile covers the whole request. On-demand
+# profiling and the admin endpoints need PROFILING_TOKEN; without one only sampling runs
+if settings.profiling_enabled:
+    app.add_middleware(ProfilingMiddleware)
+    if settings.profiling_token:
+        app.include_router(profiles_router)
+    else:
+        logger.warning("PROFILING_TOKEN is not set: X-Profile is ignored and /admin/profiles is not served")
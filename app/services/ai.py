@@ -1,9 +1,9 @@
-from dataclasses import dataclass
+from collections.abc import AsyncIterator, Sequence
+from dataclasses import asdict, dataclass
 from typing import Protocol
-from app.db.models import Recipe
+
 from app.core.config import settings
-import json
-import httpx
+from app.services.concurrency import AdmissionLimiter
 
 # AI recommendation result
 @dataclass
@@ -11,81 +11,102 @@ class AIRecommendation:
     recommended_id: int | None
     title: str
     reason: str
+    cached: bool = False
+    # Precomputed for an earlier catalog version while a refresh is pending
+    stale: bool = False
+    # The AI call was shed under load and the fallback answered; never cached
+    shed: bool = False
+    # The upstream failed or is known to be down and the fallback answered; never cached
+    degraded: bool = False
+
+# One event of a streamed recommendation: "recommendation" (the pick, as soon as it is
+# known), "reason" (a piece of the explanation), then "done" (the full result) or
+# "error" if the upstream failed part way
+@dataclass
+class RecommendationEvent:
+    event: str
+    data: dict
+
+# A complete recommendation as the same event sequence a stream produces
+def recommendation_events(rec: AIRecommendation) -> list[RecommendationEvent]:
+    return [
+        RecommendationEvent(
+            "recommendation",
+            {"recommended_id": rec.recommended_id, "title": rec.title, "cached": rec.cached, "stale": rec.stale},
+        ),
+        RecommendationEvent("reason", {"text": rec.reason}),
+        RecommendationEvent("done", asdict(rec)),
+    ]
+
+# Process-wide cap on concurrent upstream AI calls
+ai_admission = AdmissionLimiter(settings.ai_max_concurrency, settings.ai_max_queue)
+
+# Anything with the recipe fields a prompt needs: ORM recipes or projected rows
+class RecipeLike(Protocol):
+    id: int
+    title: str
+    description: str | None
 
 # AI client interface
 class AIClient(Protocol):
-    async def recommend(self, recipes: list[Recipe]) -> AIRecommendation: ...
+    async def recommend(self, recipes: Sequence[RecipeLike]) -> AIRecommendation: ...
 
 # Fallback AI client if no real AI is configured
 class FallbackAIClient:
-    async def recommend(self, recipes: list[Recipe]) -> AIRecommendation:
+    async def recommend(self, recipes: Sequence[RecipeLike]) -> AIRecommendation:
         if not recipes:
             return AIRecommendation(None, "No recipes yet", "Create a few recipes first, then I can recommend one.")
+        # Candidates arrive ranked by the local index, so the first is the best offline pick
         pick = recipes[0]
-        return AIRecommendation(pick.id, pick.title, "Fallback: returning the most recent recipe.")
+        return AIRecommendation(pick.id, pick.title, "Fallback: returning the top-ranked recipe from the local index.")
 
-# Anthropic AI client implementation
-class AnthropicAIClient:
+    async def aclose(self) -> None:
+        pass
 
-    # Constructor with API key and optional model
-    def __init__(self, api_key: str, model: str | None = None):
-        self.api_key = api_key
-        self.model = model or settings.anthropic_model
+# App-scoped AI client that builds the real one on first use, so httpx and the
+# Anthropic client are not imported while the app starts
+class LazyAIClient:
+    def __init__(self, factory=None):
+        self._factory = factory or build_ai_client
+        self._client: AIClient | None = None
 
-    # Recommend a recipe using Anthropic API
-    async def recommend(self, recipes: list[Recipe]) -> AIRecommendation:
-        if not recipes:
-            return AIRecommendation(None, "No recipes yet", "Add some recipes and I will recommend one based on them.")
-
-        # Prepare context with up to 25 recipes
-        context = [{"id": r.id, "title": r.title, "description": r.description} for r in recipes[:25]]
-
-        # Build the prompt
-        system = (
-            "You are a helpful cooking assistant. "
-            "Pick ONE best recipe to recommend from the provided list. "
-            "Return strict JSON with keys: recommended_id (int), title (str), reason (str)."
-        )
-        # Serialize context as JSON
-        user = f"Recipes:\n{json.dumps(context)}"
-
-        # Build the request payload
-        payload = {
-            "model": self.model,
-            "max_tokens": 200,
-            "system": system,
-            "messages": [{"role": "user", "content": user}],
-        }
-
-        # Make the API request
-        headers = {
-            "x-api-key": self.api_key,
-            "anthropic-version": "2023-06-01",
-            "content-type": "application/json",
-        }
-
-        # Send request to Anthropic API
-        async with httpx.AsyncClient(timeout=15) as client:
-            r = await client.post("https://api.anthropic.com/v1/messages", json=payload, headers=headers)
-            r.raise_for_status()
-            data = r.json()
-
-        # Parse the response, extract text content
-        text = "".join(part.get("text", "") for part in data.get("content", [])).strip()
-        try:
-            obj = json.loads(text)
-            return AIRecommendation(
-                recommended_id=int(obj["recommended_id"]),
-                title=str(obj["title"]),
-                reason=str(obj["reason"]),
-            )
-        except Exception:
-            # On failure, fallback to most recent recipe
-            pick = recipes[0]
-            return AIRecommendation(pick.id, pick.title, "AI parsing failed, fallback to most recent recipe.")
-
-# Factory to build appropriate AI client
+    @property
+    def client(self) -> AIClient:
+        if self._client is None:
+            self._client = self._factory()
+        return self._client
+
+    async def recommend(self, recipes: Sequence[RecipeLike]) -> AIRecommendation:
+        return await self.client.recommend(recipes)
+
+    # Everything else (model name, ...) comes from the real client
+    def __getattr__(self, name: str):
+        return getattr(self.client, name)
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+# The client actually answering, looking through a LazyAIClient
+def resolve_ai_client(ai: AIClient) -> AIClient:
+    return ai.client if isinstance(ai, LazyAIClient) else ai
+
+# Stream a recommendation from any AI client: token by token when the client supports
+# it, otherwise its complete answer as one burst of events
+async def stream_recommendation(ai: AIClient, recipes: Sequence[RecipeLike]) -> AsyncIterator[RecommendationEvent]:
+    ai = resolve_ai_client(ai)
+    stream = getattr(ai, "stream_recommend", None)
+    if stream is not None:
+        async for event in stream(recipes):
+            yield event
+        return
+    for event in recommendation_events(await ai.recommend(recipes)):
+        yield event
+
+# Factory to build appropriate AI client; the Anthropic module (and httpx) load only when configured
 def build_ai_client() -> AIClient:
     if settings.anthropic_api_key:
+        from app.services.anthropic_client import AnthropicAIClient
         return AnthropicAIClient(settings.anthropic_api_key)
     return FallbackAIClient()
@@ -0,0 +1,423 @@
+import asyncio
+import json
+import time
+from collections.abc import AsyncIterator, Sequence
+from contextlib import AbstractAsyncContextManager, asynccontextmanager
+from dataclasses import asdict, replace
+
+import httpx
+
+from app.core.config import settings
+from app.core.deadline import remaining_budget
+from app.core.metrics import ai_call_duration, ai_calls, ai_input_tokens, ai_prompt_tokens, ai_shed, ai_stream_time_to_pick
+from app.core.profiling import traced
+from app.services.ai import (
+    AIClient,
+    AIRecommendation,
+    FallbackAIClient,
+    RecipeLike,
+    RecommendationEvent,
+    ai_admission,
+    recommendation_events,
+)
+from app.services.concurrency import AdmissionLimiter, Shed
+from app.services.prompt import build_catalog, estimate_tokens
+from app.services.resilience import CircuitBreaker, backoff_delay
+
+# Upstream statuses worth retrying
+RETRYABLE_STATUS = {429, 500, 502, 503, 504, 529}
+
+# A 2xx reply whose body is not a Messages API JSON object
+class UpstreamResponseError(Exception):
+    pass
+
+SYSTEM_PROMPT = (
+    "You are a helpful cooking assistant. "
+    "Pick ONE best recipe to recommend from the provided list. "
+    "Return strict JSON with keys: recommended_id (int), title (str), reason (str)."
+)
+
+# Streaming wants the pick first so it can be forwarded before the explanation is written
+STREAM_SYSTEM_PROMPT = (
+    "You are a helpful cooking assistant. "
+    "Pick ONE best recipe to recommend from the provided list. "
+    "Reply with the recommended recipe id alone on the first line, "
+    "then one or two sentences on why."
+)
+
+# Parse a text/event-stream body into (event, data) pairs
+async def iter_sse(response: httpx.Response) -> AsyncIterator[tuple[str | None, str]]:
+    event, data = None, []
+    async for line in response.aiter_lines():
+        if not line:
+            if data:
+                yield event, "\n".join(data)
+            event, data = None, []
+            continue
+        if line.startswith(":"):
+            continue
+        field, _, value = line.partition(":")
+        value = value.removeprefix(" ")
+        if field == "event":
+            event = value
+        elif field == "data":
+            data.append(value)
+    if data:
+        yield event, "\n".join(data)
+
+# Bound the block by the current request's remaining latency budget
+@asynccontextmanager
+async def within_budget() -> AsyncIterator[None]:
+    budget = asyncio.timeout(remaining_budget())
+    try:
+        async with budget:
+            yield
+    except TimeoutError:
+        if not budget.expired():
+            raise
+        raise Shed("deadline") from None
+
+# Build the pooled, long-lived HTTP client used to reach Anthropic
+def build_http_client(transport: httpx.AsyncBaseTransport | None = None) -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        base_url=settings.anthropic_base_url,
+        timeout=httpx.Timeout(settings.ai_timeout, connect=settings.ai_connect_timeout),
+        limits=httpx.Limits(
+            max_connections=settings.ai_max_connections,
+            max_keepalive_connections=settings.ai_max_keepalive_connections,
+            keepalive_expiry=settings.ai_keepalive_expiry,
+        ),
+        # Requires the optional `h2` package (pip install recipe-api[http2])
+        http2=settings.ai_http2,
+        transport=transport,
+    )
+
+# Anthropic AI client implementation
+class AnthropicAIClient:
+
+    # Constructor with API key, optional model and injectable HTTP client
+    def __init__(
+        self,
+        api_key: str,
+        model: str | None = None,
+        *,
+        http_client: httpx.AsyncClient | None = None,
+        breaker: CircuitBreaker | None = None,
+        fallback: AIClient | None = None,
+        max_retries: int | None = None,
+        limiter: AdmissionLimiter | None = None,
+    ):
+        self.api_key = api_key
+        self.model = model or settings.anthropic_model
+        self.http = http_client or build_http_client()
+        self.breaker = breaker or CircuitBreaker(
+            failure_threshold=settings.ai_breaker_failure_threshold,
+            reset_timeout=settings.ai_breaker_reset_timeout,
+        )
+        self.fallback = fallback or FallbackAIClient()
+        self.max_retries = settings.ai_max_retries if max_retries is None else max_retries
+        self.limiter = limiter or ai_admission
+
+    # Release pooled connections
+    async def aclose(self) -> None:
+        await self.http.aclose()
+
+    # POST to the Messages API, retrying 429/5xx and transport errors with jittered backoff
+    async def _post_messages(self, payload: dict, headers: dict) -> dict:
+        attempt = 0
+        while True:
+            try:
+                with traced("ai", "POST /v1/messages"):
+                    r = await self.http.post("/v1/messages", json=payload, headers=headers)
+                if r.status_code not in RETRYABLE_STATUS or attempt >= self.max_retries:
+                    r.raise_for_status()
+                    return self._decode(r)
+                delay = self._retry_after(r)
+            except httpx.TransportError:
+                if attempt >= self.max_retries:
+                    raise
+                delay = None
+
+            if delay is None:
+                delay = backoff_delay(attempt, settings.ai_backoff_base, settings.ai_backoff_max)
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    # Decode a Messages API reply, rejecting bodies that are not a JSON object
+    def _decode(self, r: httpx.Response) -> dict:
+        try:
+            data = r.json()
+        except ValueError as exc:
+            raise UpstreamResponseError("Messages API returned a non-JSON body") from exc
+        if not isinstance(data, dict) or not isinstance(data.get("content", []), list):
+            raise UpstreamResponseError("Messages API returned an unexpected body")
+        return data
+
+    # Honour a numeric Retry-After header, capped by the backoff ceiling
+    def _retry_after(self, r: httpx.Response) -> float | None:
+        try:
+            return min(float(r.headers["retry-after"]), settings.ai_backoff_max)
+        except (KeyError, ValueError):
+            return None
+
+    # Messages API request for the locally ranked candidates. The system prompt and the
+    # candidate table are marked as cache breakpoints: the first never changes and the
+    # second only with the catalog, so repeat calls are served from Anthropic's prompt cache.
+    def _payload(self, recipes: Sequence[RecipeLike], system: str, stream: bool = False) -> dict:
+        catalog = build_catalog(
+            recipes[: settings.ai_candidate_count],
+            token_budget=settings.ai_prompt_token_budget,
+            description_chars=settings.ai_description_chars,
+        )
+        ai_prompt_tokens.observe(estimate_tokens(system) + catalog.estimated_tokens)
+        payload = {
+            "model": self.model,
+            "max_tokens": 200,
+            "system": [{"type": "text", "text": system, "cache_control": {"type": "ephemeral"}}],
+            "messages": [{
+                "role": "user",
+                "content": [{"type": "text", "text": f"Recipes:\n{catalog.text}", "cache_control": {"type": "ephemeral"}}],
+            }],
+        }
+        if stream:
+            payload["stream"] = True
+        return payload
+
+    # Count the input tokens the upstream reports, split by prompt-cache use
+    @staticmethod
+    def _record_usage(usage: object) -> None:
+        if not isinstance(usage, dict):
+            return
+        for kind, key in (("input", "input_tokens"), ("cache_read", "cache_read_input_tokens"), ("cache_write", "cache_creation_input_tokens")):
+            if isinstance(usage.get(key), int):
+                ai_input_tokens.inc(usage[key], kind=kind)
+
+    def _headers(self) -> dict:
+        return {
+            "x-api-key": self.api_key,
+            "anthropic-version": "2023-06-01",
+            "content-type": "application/json",
+        }
+
+    # Count a failed call and feed the breaker
+    def _record_error(self, exc: Exception, start: float) -> None:
+        outcome = "bad_response" if isinstance(exc, UpstreamResponseError) else "http_error"
+        ai_calls.inc(outcome=outcome)
+        ai_call_duration.observe(time.perf_counter() - start, outcome=outcome)
+        # Only count outages against the breaker; a 4xx means the upstream is up
+        if isinstance(exc, httpx.HTTPStatusError) and exc.response.status_code not in RETRYABLE_STATUS:
+            self.breaker.record_success()
+        else:
+            self.breaker.record_failure()
+
+    # A slot for one upstream call, waited for within the request's budget; refused
+    # outright when too little of the budget is left to be worth trying
+    def _admit(self) -> AbstractAsyncContextManager[None]:
+        budget = remaining_budget()
+        if budget is not None and budget * 1000 < settings.ai_min_budget_ms:
+            raise Shed("deadline")
+        return self.limiter.admit(budget)
+
+    # Answer a shed call from the fallback; shed answers are never cached
+    async def _shed(self, exc: Shed, recipes: Sequence[RecipeLike]) -> AIRecommendation:
+        ai_shed.inc(reason=exc.reason)
+        ai_calls.inc(outcome="shed")
+        return replace(await self.fallback.recommend(recipes), shed=True)
+
+    # Answer from the fallback while the upstream is failing; degraded answers are never
+    # cached, so the next call tries the upstream again
+    async def _degraded(self, recipes: Sequence[RecipeLike]) -> AIRecommendation:
+        return replace(await self.fallback.recommend(recipes), degraded=True)
+
+    # Recommend a recipe using Anthropic API
+    async def recommend(self, recipes: Sequence[RecipeLike]) -> AIRecommendation:
+        if not recipes:
+            return AIRecommendation(None, "No recipes yet", "Add some recipes and I will recommend one based on them.")
+
+        # Fail over immediately while the upstream is known to be unhealthy
+        if not self.breaker.allow():
+            ai_calls.inc(outcome="breaker_open")
+            return await self._degraded(recipes)
+
+        payload = self._payload(recipes, SYSTEM_PROMPT)
+
+        # Send request to Anthropic API over the shared connection pool, within the admission
+        # limit and the request's budget; the half-open trial slot is given back on every
+        # exit, including cancellation. Running out of budget says nothing about the upstream.
+        start = time.perf_counter()
+        try:
+            async with self._admit(), within_budget():
+                data = await self._post_messages(payload, self._headers())
+        except Shed as exc:
+            return await self._shed(exc, recipes)
+        except (httpx.HTTPError, UpstreamResponseError) as exc:
+            self._record_error(exc, start)
+            return await self._degraded(recipes)
+        else:
+            self.breaker.record_success()
+        finally:
+            self.breaker.release()
+        elapsed = time.perf_counter() - start
+
+        # Parse the response, extract text content
+        try:
+            self._record_usage(data.get("usage"))
+            text = "".join(part.get("text", "") for part in data.get("content", [])).strip()
+            obj = json.loads(text)
+            rec = AIRecommendation(
+                recommended_id=int(obj["recommended_id"]),
+                title=str(obj["title"]),
+                reason=str(obj["reason"]),
+            )
+            ai_calls.inc(outcome="success")
+            ai_call_duration.observe(elapsed, outcome="success")
+            return rec
+        except Exception:
+            ai_calls.inc(outcome="parse_fallback")
+            ai_call_duration.observe(elapsed, outcome="parse_fallback")
+            # On failure, fallback to the top-ranked candidate
+            pick = recipes[0]
+            return AIRecommendation(pick.id, pick.title, "AI parsing failed, fallback to top-ranked recipe.")
+
+    # Open a streamed Messages API response, retrying like _post_messages until the
+    # response starts; nothing is retried once events are flowing
+    async def _open_stream(self, payload: dict, headers: dict) -> httpx.Response:
+        attempt = 0
+        while True:
+            try:
+                request = self.http.build_request("POST", "/v1/messages", json=payload, headers=headers)
+                with traced("ai", "POST /v1/messages (stream open)"):
+                    r = await self.http.send(request, stream=True)
+            except httpx.TransportError:
+                if attempt >= self.max_retries:
+                    raise
+                delay = None
+            else:
+                if r.status_code not in RETRYABLE_STATUS or attempt >= self.max_retries:
+                    if r.is_error:
+                        await r.aread()
+                        await r.aclose()
+                        r.raise_for_status()
+                    if not r.headers.get("content-type", "").startswith("text/event-stream"):
+                        await r.aclose()
+                        raise UpstreamResponseError("Messages API did not return an event stream")
+                    return r
+                delay = self._retry_after(r)
+                await r.aclose()
+
+            if delay is None:
+                delay = backoff_delay(attempt, settings.ai_backoff_base, settings.ai_backoff_max)
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    # Text deltas of a streamed reply, in order
+    async def _text_deltas(self, r: httpx.Response) -> AsyncIterator[str]:
+        async for event, data in iter_sse(r):
+            try:
+                obj = json.loads(data)
+            except ValueError as exc:
+                raise UpstreamResponseError("Messages API sent a non-JSON event") from exc
+            kind = obj.get("type", event) if isinstance(obj, dict) else event
+            if kind == "message_start":
+                self._record_usage(obj.get("message", {}).get("usage"))
+            elif kind == "content_block_delta" and obj.get("delta", {}).get("type") == "text_delta":
+                yield obj["delta"].get("text", "")
+            elif kind == "error":
+                raise UpstreamResponseError(f"Messages API stream error: {obj.get('error')}")
+            elif kind == "message_stop":
+                return
+
+    # The recipe named by the first line of a streamed reply, if it is one of the candidates
+    @staticmethod
+    def _parse_pick(line: str, recipes: Sequence[RecipeLike]) -> RecipeLike | None:
+        digits = "".join(ch for ch in line if ch.isdigit())
+        if not digits:
+            return None
+        return next((r for r in recipes if r.id == int(digits)), None)
+
+    # Stream a recommendation: the pick is sent as soon as the first line arrives (its
+    # title comes from the candidates, not the model), then the reason as it is generated
+    async def stream_recommend(self, recipes: Sequence[RecipeLike]) -> AsyncIterator[RecommendationEvent]:
+        if not recipes:
+            for event in recommendation_events(await self.recommend(recipes)):
+                yield event
+            return
+
+        # Fail over immediately while the upstream is known to be unhealthy
+        if not self.breaker.allow():
+            ai_calls.inc(outcome="breaker_open")
+            for event in recommendation_events(await self._degraded(recipes)):
+                yield event
+            return
+
+        start = time.perf_counter()
+        pick: RecipeLike | None = None
+        outcome = "success"
+        pending = ""
+        reason: list[str] = []
+        # The slot is held for the whole stream; the budget covers waiting for it and
+        # getting the response started
+        try:
+            try:
+                async with self._admit():
+                    async with within_budget():
+                        r = await self._open_stream(
+                            self._payload(recipes, STREAM_SYSTEM_PROMPT, stream=True), self._headers()
+                        )
+                    try:
+                        async for text in self._text_deltas(r):
+                            if pick is None:
+                                pending += text
+                                if "\n" not in pending:
+                                    continue
+                                first_line, text = pending.split("\n", 1)
+                                pick = self._parse_pick(first_line, recipes)
+                                if pick is None:
+                                    outcome, pick = "parse_fallback", recipes[0]
+                                ai_stream_time_to_pick.observe(time.perf_counter() - start)
+                                yield RecommendationEvent(
+                                    "recommendation",
+                                    {"recommended_id": pick.id, "title": pick.title, "cached": False, "stale": False},
+                                )
+                                text = text.lstrip("\n")
+                            if text:
+                                reason.append(text)
+                                yield RecommendationEvent("reason", {"text": text})
+                    finally:
+                        await r.aclose()
+            except Shed as exc:
+                for event in recommendation_events(await self._shed(exc, recipes)):
+                    yield event
+                return
+            except (httpx.HTTPError, UpstreamResponseError) as exc:
+                self._record_error(exc, start)
+                if pick is None:
+                    for event in recommendation_events(await self._degraded(recipes)):
+                        yield event
+                else:
+                    yield RecommendationEvent("error", {"detail": "The AI stream was interrupted."})
+                return
+            else:
+                self.breaker.record_success()
+        finally:
+            self.breaker.release()
+
+        # The whole reply was a single line: either just the id, or something unparseable
+        if pick is None:
+            pick = self._parse_pick(pending, recipes)
+            if pick is None:
+                outcome, pick = "parse_fallback", recipes[0]
+                pending = "AI parsing failed, fallback to top-ranked recipe."
+            else:
+                pending = ""
+            yield RecommendationEvent(
+                "recommendation", {"recommended_id": pick.id, "title": pick.title, "cached": False, "stale": False}
+            )
+            if pending:
+                reason.append(pending)
+                yield RecommendationEvent("reason", {"text": pending})
+
+        ai_calls.inc(outcome=outcome)
+        ai_call_duration.observe(time.perf_counter() - start, outcome=outcome)
+        rec = AIRecommendation(pick.id, pick.title, "".join(reason).strip())
+        yield RecommendationEvent("done", asdict(rec))
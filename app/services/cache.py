@@ -0,0 +1,50 @@
+import time
+from collections import OrderedDict
+from collections.abc import Hashable
+from typing import Any
+
+from app.core.config import settings
+
+# Bounded LRU cache whose entries expire after a TTL
+class TTLCache:
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    # Return the cached value, or None if missing or expired
+    def get(self, key: Hashable) -> Any | None:
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    # Store a value, evicting the least recently used entry when full
+    def set(self, key: Hashable, value: Any) -> None:
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    # Drops the entries; hits and misses are lifetime totals and keep counting
+    def clear(self) -> None:
+        self._data.clear()
+
+# Process-wide recommendation cache
+recommendation_cache = TTLCache(
+    maxsize=settings.recommendation_cache_size,
+    ttl=settings.recommendation_cache_ttl,
+)
@@ -0,0 +1,115 @@
+import asyncio
+from collections.abc import AsyncIterator, Awaitable, Callable, Hashable
+from contextlib import asynccontextmanager
+from typing import TypeVar
+
+T = TypeVar("T")
+
+# Raised when a call is refused rather than queued: the wait queue is full, or the
+# caller's latency budget would run out first
+class Shed(Exception):
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+# Coalesces concurrent calls for the same key into one in-flight computation
+class SingleFlight:
+    def __init__(self):
+        self.executions = 0
+        self.coalesced = 0
+        self._inflight: dict[Hashable, asyncio.Future] = {}
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._inflight)
+
+    # Run fn for key, or wait for the identical call already running. A follower waits at
+    # most `timeout` seconds (its own budget, not the leader's) and then raises
+    # Shed("deadline"); a result failing `shareable` goes to the leader only, and the
+    # followers take over as if the leader had been cancelled.
+    async def do(
+        self,
+        key: Hashable,
+        fn: Callable[[], Awaitable[T]],
+        *,
+        timeout: float | None = None,
+        shareable: Callable[[T], bool] | None = None,
+    ) -> T:
+        deadline = None if timeout is None else asyncio.get_running_loop().time() + timeout
+        while (fut := self._inflight.get(key)) is not None:
+            waiting = asyncio.timeout_at(deadline)
+            try:
+                async with waiting:
+                    result = await asyncio.shield(fut)
+            except asyncio.CancelledError:
+                # The leader was cancelled or kept its result, not us: take over unless we
+                # were cancelled too
+                if not fut.cancelled():
+                    raise
+                continue
+            except TimeoutError:
+                if waiting.expired():
+                    raise Shed("deadline") from None
+                self.coalesced += 1
+                raise
+            except BaseException:
+                self.coalesced += 1
+                raise
+            # Counted once served, so the total only ever grows
+            self.coalesced += 1
+            return result
+
+        fut = asyncio.get_running_loop().create_future()
+        # Nobody may be waiting on the result; don't warn about unretrieved errors
+        fut.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._inflight[key] = fut
+        self.executions += 1
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            fut.cancel()
+            raise
+        except BaseException as exc:
+            fut.set_exception(exc)
+            raise
+        else:
+            if shareable is None or shareable(result):
+                fut.set_result(result)
+            else:
+                fut.cancel()
+            return result
+        finally:
+            del self._inflight[key]
+
+# Caps concurrent calls, with a bounded queue of callers waiting for a slot
+class AdmissionLimiter:
+    def __init__(self, max_concurrent: int, max_queue: int):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.in_flight = 0
+        self.queued = 0
+        self._slots = asyncio.Semaphore(max_concurrent)
+
+    # Hold a slot for the body; wait at most `timeout` seconds (None: no limit) for one
+    @asynccontextmanager
+    async def admit(self, timeout: float | None = None) -> AsyncIterator[None]:
+        if self._slots.locked():
+            if self.queued >= self.max_queue:
+                raise Shed("queue_full")
+            if timeout is not None and timeout <= 0:
+                raise Shed("deadline")
+            self.queued += 1
+            try:
+                await asyncio.wait_for(self._slots.acquire(), timeout)
+            except asyncio.TimeoutError:
+                raise Shed("deadline") from None
+            finally:
+                self.queued -= 1
+        else:
+            await self._slots.acquire()
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._slots.release()
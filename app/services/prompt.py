@@ -0,0 +1,74 @@
+import math
+import re
+from collections.abc import Sequence
+from dataclasses import dataclass
+
+from app.services.ai import RecipeLike
+
+# Rough size of a token in English text; good enough to budget a prompt without a tokenizer
+CHARS_PER_TOKEN = 4
+
+WHITESPACE_RE = re.compile(r"\s+")
+
+CATALOG_HEADER = "id\ttitle\tdescription"
+
+# Estimated token count of a piece of prompt text
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+# Collapse whitespace (tabs and newlines included) so a value fits in one TSV cell
+def one_line(text: str | None) -> str:
+    return WHITESPACE_RE.sub(" ", text).strip() if text else ""
+
+# Cut text to at most `limit` characters, at a word boundary where there is one
+def truncate(text: str, limit: int) -> str:
+    if len(text) <= limit:
+        return text
+    if limit <= 1:
+        return ""
+    cut = text[: limit - 1]
+    space = cut.rfind(" ")
+    if space > limit // 2:
+        cut = cut[:space]
+    return cut.rstrip() + "…"
+
+# Give every description an equal share of `budget` characters; what short descriptions
+# leave unused is shared out among the longer ones
+def description_limits(lengths: Sequence[int], budget: int) -> list[int]:
+    limits = [0] * len(lengths)
+    remaining = sorted(range(len(lengths)), key=lambda i: lengths[i])
+    while remaining:
+        share = max(budget, 0) // len(remaining)
+        i = remaining.pop(0)
+        limits[i] = min(lengths[i], share)
+        budget -= limits[i]
+    return limits
+
+# The candidate table sent to the model and what it is estimated to cost
+@dataclass
+class CatalogPrompt:
+    text: str
+    recipe_ids: list[int]
+    estimated_tokens: int
+
+# Encode ranked candidates as a tab-separated table that fits `token_budget`. Titles are
+# kept whole; lower-ranked recipes are dropped if even the titles do not fit, and the
+# remaining budget is spread over the descriptions, each capped at `description_chars`.
+def build_catalog(recipes: Sequence[RecipeLike], token_budget: int, description_chars: int) -> CatalogPrompt:
+    rows = [(r.id, one_line(r.title), one_line(r.description)[:description_chars]) for r in recipes]
+    budget = token_budget * CHARS_PER_TOKEN - len(CATALOG_HEADER)
+
+    # id, title and two tabs plus the newline per row, always at least one recipe
+    fixed = [len(str(recipe_id)) + len(title) + 3 for recipe_id, title, _ in rows]
+    while len(rows) > 1 and sum(fixed) > budget:
+        rows.pop()
+        fixed.pop()
+
+    limits = description_limits([len(d) for _, _, d in rows], budget - sum(fixed))
+    lines = [CATALOG_HEADER]
+    lines.extend(
+        f"{recipe_id}\t{title}\t{truncate(description, limit)}"
+        for (recipe_id, title, description), limit in zip(rows, limits)
+    )
+    text = "\n".join(lines)
+    return CatalogPrompt(text, [recipe_id for recipe_id, _, _ in rows], estimate_tokens(text))
@@ -0,0 +1,226 @@
+from __future__ import annotations
+
+import re
+import zlib
+from collections.abc import Iterable
+from typing import TYPE_CHECKING
+
+from app.core.config import settings
+
+# numpy is imported on first use so it stays off the startup path
+if TYPE_CHECKING:
+    import numpy as np
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+# Title words say more about a recipe than description words
+TITLE_WEIGHT = 2.0
+
+# Tokenize free text into lowercase words, keeping accented letters inside the word
+def tokenize(text: str | None) -> list[str]:
+    return TOKEN_RE.findall(text.lower()) if text else []
+
+# Hash a recipe into a sublinear term-frequency vector of fixed width
+def featurize(title: str, description: str | None, dim: int) -> np.ndarray:
+    import numpy as np
+
+    title_tokens = tokenize(title)
+    tokens = title_tokens + tokenize(description)
+    vec = np.zeros(dim, dtype=np.float32)
+    if not tokens:
+        return vec
+
+    # crc32 is stable across processes, unlike the builtin hash()
+    buckets = np.fromiter((zlib.crc32(t.encode()) % dim for t in tokens), dtype=np.int64, count=len(tokens))
+    weights = np.ones(len(tokens), dtype=np.float32)
+    weights[: len(title_tokens)] = TITLE_WEIGHT
+    counts = np.bincount(buckets, weights=weights, minlength=dim).astype(np.float32)
+    nz = counts > 0
+    vec[nz] = 1.0 + np.log(counts[nz])
+    return vec
+
+# Share of the catalog that may change before idf weights and row norms are recomputed;
+# in between, rows are added and removed under the current weights
+REWEIGHT_FRACTION = 0.1
+REWEIGHT_MIN_CHANGES = 64
+
+# In-process TF-IDF index over hashed recipe features. Adds and removes cost one row:
+# row norms and the centroid are kept up to date under a snapshot of the idf weights,
+# which is refreshed only after REWEIGHT_FRACTION of the catalog has changed.
+class RecipeIndex:
+    def __init__(self, dim: int | None = None):
+        self.dim = dim or settings.ranking_dim
+        self.reset()
+
+    def __len__(self) -> int:
+        return self._size
+
+    # Drop everything and mark the index as not loaded
+    def reset(self) -> None:
+        self.loaded = False
+        # Set while writes should be applied: loaded, or being built
+        self.tracking = False
+        # Caller-defined marker of the data the index was loaded from
+        self.source: object = None
+        # Highest id ever added since the last reset
+        self.max_id = 0
+        self._size = 0
+        # Allocated by the first add()
+        self._tf: np.ndarray | None = None
+        self._ids: np.ndarray | None = None
+        self._df: np.ndarray | None = None
+        self._norms: np.ndarray | None = None
+        self._row_of: dict[int, int] = {}
+        # idf snapshot, the sum of tf/norm rows under it, and changes made since
+        self._idf: np.ndarray | None = None
+        self._weighted: np.ndarray | None = None
+        self._drift = 0
+        self._relevance: np.ndarray | None = None
+
+    # Replace the index contents with the given (id, title, description) rows
+    def load(self, rows: Iterable[tuple[int, str, str | None]]) -> None:
+        self.reset()
+        self.extend(rows)
+        self.loaded = True
+
+    # Add many (id, title, description) rows
+    def extend(self, rows: Iterable[tuple[int, str, str | None]]) -> None:
+        for recipe_id, title, description in rows:
+            self.add(recipe_id, title, description)
+
+    def __contains__(self, recipe_id: int) -> bool:
+        return recipe_id in self._row_of
+
+    # Number of recipes and the sum of their ids, to compare with the database
+    def fingerprint(self) -> tuple[int, int]:
+        return self._size, int(self._ids[: self._size].sum()) if self._size else 0
+
+    # Ids of every indexed recipe
+    def ids(self) -> list[int]:
+        return list(self._row_of)
+
+    # Add or replace one recipe
+    def add(self, recipe_id: int, title: str, description: str | None) -> None:
+        import numpy as np
+
+        if recipe_id in self._row_of:
+            self.remove(recipe_id)
+        if self._ids is None or self._size == len(self._ids):
+            self._grow()
+
+        vec = featurize(title, description, self.dim)
+        row = self._size
+        self._tf[row] = vec
+        self._ids[row] = recipe_id
+        self._df += vec > 0
+        self._row_of[recipe_id] = row
+        self._size += 1
+        self.max_id = max(self.max_id, recipe_id)
+        if self._idf is not None:
+            norm = float(np.linalg.norm(vec * self._idf)) or 1.0
+            self._norms[row] = norm
+            self._weighted += vec / norm
+            self._drift += 1
+        self._relevance = None
+
+    # Remove one recipe by moving the last row into its slot
+    def remove(self, recipe_id: int) -> None:
+        row = self._row_of.pop(recipe_id, None)
+        if row is None:
+            return
+        self._df -= self._tf[row] > 0
+        if self._idf is not None:
+            self._weighted -= self._tf[row] / self._norms[row]
+            self._drift += 1
+        last = self._size - 1
+        if row != last:
+            self._tf[row] = self._tf[last]
+            self._ids[row] = self._ids[last]
+            self._norms[row] = self._norms[last]
+            self._row_of[int(self._ids[row])] = row
+        self._size = last
+        self._relevance = None
+
+    # Double capacity, amortizing the copy over many inserts
+    def _grow(self) -> None:
+        import numpy as np
+
+        if self._ids is None:
+            self._tf = np.zeros((0, self.dim), dtype=np.float32)
+            self._ids = np.zeros(0, dtype=np.int64)
+            self._norms = np.zeros(0, dtype=np.float32)
+            self._df = np.zeros(self.dim, dtype=np.float64)
+        capacity = max(64, 2 * len(self._ids))
+        tf = np.zeros((capacity, self.dim), dtype=np.float32)
+        tf[: self._size] = self._tf[: self._size]
+        ids = np.zeros(capacity, dtype=np.int64)
+        ids[: self._size] = self._ids[: self._size]
+        norms = np.ones(capacity, dtype=np.float32)
+        norms[: self._size] = self._norms[: self._size]
+        self._tf, self._ids, self._norms = tf, ids, norms
+
+    # Recompute idf from the current document frequencies, and every row norm under it
+    def _reweight(self) -> None:
+        import numpy as np
+
+        n = self._size
+        self._idf = (np.log((1.0 + n) / (1.0 + self._df)) + 1.0).astype(np.float32)
+        tf = self._tf[:n]
+        norms = np.linalg.norm(tf * self._idf, axis=1)
+        norms[norms == 0] = 1.0
+        self._norms[:n] = norms
+        self._weighted = (tf / norms[:, None]).sum(axis=0, dtype=np.float64)
+        self._drift = 0
+        self._relevance = None
+
+    # Each row's cosine similarity to the catalog centroid: one matrix-vector product,
+    # recomputed only after the index changes
+    def _score(self) -> np.ndarray:
+        import numpy as np
+
+        n = self._size
+        if self._idf is None or self._drift > max(REWEIGHT_MIN_CHANGES, REWEIGHT_FRACTION * n):
+            self._reweight()
+        if self._relevance is None:
+            centroid = (self._idf * self._weighted).astype(np.float32)
+            norm = np.linalg.norm(centroid)
+            if norm > 0:
+                self._relevance = (self._tf[:n] @ (self._idf * centroid / norm)) / self._norms[:n]
+            else:
+                self._relevance = np.zeros(n, dtype=np.float32)
+        return self._relevance
+
+    # Pick up to k ids that best represent the catalog while staying diverse (MMR)
+    def top_k(self, k: int, diversity: float | None = None) -> list[int]:
+        import numpy as np
+
+        n = self._size
+        if n == 0 or k <= 0:
+            return []
+        diversity = settings.ranking_diversity if diversity is None else diversity
+
+        # Relevance is similarity to the catalog centroid
+        relevance = self._score()
+
+        # Shortlist the most relevant rows, newest id first on ties
+        pool_size = min(n, k * 4)
+        pool = np.argpartition(-relevance, pool_size - 1)[:pool_size] if pool_size < n else np.arange(n)
+        pool = pool[np.lexsort((-self._ids[pool], -relevance[pool]))]
+
+        # Greedy maximal marginal relevance over the shortlist, on L2-normalized TF-IDF rows
+        vectors = self._tf[pool] * self._idf / self._norms[pool][:, None]
+        rel = relevance[pool]
+        max_sim = np.zeros(len(pool), dtype=np.float32)
+        chosen = np.zeros(len(pool), dtype=bool)
+        picks: list[int] = []
+        for _ in range(min(k, len(pool))):
+            scores = (1.0 - diversity) * rel - diversity * max_sim
+            scores[chosen] = -np.inf
+            best = int(np.argmax(scores))
+            chosen[best] = True
+            picks.append(best)
+            np.maximum(max_sim, vectors @ vectors[best], out=max_sim)
+        return [int(self._ids[pool[i]]) for i in picks]
+
+# Process-wide index, loaded lazily and kept current by RecipeService writes
+recipe_index = RecipeIndex()
@@ -1,29 +1,408 @@
-from app.db.repo import RecipeRepo
+import asyncio
+import logging
+import time
+from collections.abc import AsyncIterator, Sequence
+from contextlib import AbstractAsyncContextManager, nullcontext
+from dataclasses import dataclass, field, replace
+from datetime import datetime
+from typing import TYPE_CHECKING
+from app.core.config import settings
+from app.core.deadline import remaining_budget
+from app.core.metrics import ai_shed
+from app.db import session as db_session
+from app.db.models import Recipe
+from app.db.repo import BatchResult, RecipeRepo
+from app.db.writer import WriteBatcher
+from app.domain.pagination import Page, decode_cursor, encode_cursor
 from app.domain.schemas import RecipeCreate
-from app.services.ai import AIClient, build_ai_client, AIRecommendation
+from app.services.ai import (
+    AIClient,
+    AIRecommendation,
+    FallbackAIClient,
+    RecipeLike,
+    RecommendationEvent,
+    build_ai_client,
+    recommendation_events,
+    resolve_ai_client,
+    stream_recommendation,
+)
+from app.db.catalog import catalog_state
+from app.db.snapshot import CatalogSnapshot, catalog_snapshot
+from app.services.cache import recommendation_cache
+from app.services.concurrency import Shed, SingleFlight
+from app.services.ranking import recipe_index
+
+if TYPE_CHECKING:
+    from app.services.refresher import RecommendationRefresher
+
+logger = logging.getLogger(__name__)
+
+# Concurrent recommendation requests for the same catalog state share one computation
+recommendation_flight = SingleFlight()
+snapshot_flight = SingleFlight()
+
+# Attempts at copying the catalog into the snapshot while writes keep racing the copy;
+# reads fall back to the database until one settles
+SNAPSHOT_LOAD_ATTEMPTS = 3
+
+# Catch-up passes one index sync makes while other workers keep writing; whatever is left
+# is picked up by the sync the next request schedules
+INDEX_SYNC_PASSES = 3
+
+# Builds the ranking index and keeps it up with other workers' writes, in one background
+# task on its own read session, so requests never wait on it. This process's own writes
+# go straight into the index.
+class IndexMaintainer:
+    def __init__(self):
+        self.task: asyncio.Task | None = None
+
+    # Start a sync unless one is already running on this event loop
+    def schedule(self) -> None:
+        task = self.task
+        if task is not None and not task.done() and task.get_loop() is asyncio.get_running_loop():
+            return
+        self.task = asyncio.create_task(self._run(), name="recipe-index-sync")
+
+    # Wait for the running sync, if any
+    async def wait(self) -> None:
+        if self.task is not None:
+            await asyncio.shield(self.task)
+
+    def cancel(self) -> None:
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+    async def _run(self) -> None:
+        try:
+            for _ in range(INDEX_SYNC_PASSES):
+                async with db_session.ReadSessionLocal() as session:
+                    repo = RecipeRepo(session)
+                    await repo.sync_catalog(fresh=True)
+                    generation = catalog_state.generation
+                    if not recipe_index.tracking:
+                        await self._build(repo)
+                    if recipe_index.tracking:
+                        await self._catch_up(repo)
+                # An import may have reset the index part way; the next pass rebuilds it
+                if recipe_index.tracking:
+                    recipe_index.loaded = True
+                    if catalog_state.generation == generation:
+                        recipe_index.source = generation
+                        return
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Ranking index sync failed")
+
+    # Index the whole catalog one streamed batch at a time, so it is never held in memory
+    @staticmethod
+    async def _build(repo: RecipeRepo) -> None:
+        recipe_index.reset()
+        recipe_index.tracking = True
+        async for batch in repo.stream_all(description_chars=settings.ranking_description_chars):
+            if not recipe_index.tracking:
+                return
+            recipe_index.extend((r.id, r.title, r.description) for r in batch)
+
+    # Apply changes made elsewhere: rows past the highest indexed id, then, only if the
+    # index still disagrees with the table, deleted rows and rows that slipped in below it
+    @staticmethod
+    async def _catch_up(repo: RecipeRepo) -> None:
+        description_chars = settings.ranking_description_chars
+        async for batch in repo.stream_all(description_chars=description_chars, after_id=recipe_index.max_id):
+            if not recipe_index.tracking:
+                return
+            recipe_index.extend((r.id, r.title, r.description) for r in batch)
+        if await repo.fingerprint() == recipe_index.fingerprint():
+            return
+
+        ids = await repo.all_ids()
+        if not recipe_index.tracking:
+            return
+        present = set(ids)
+        # Rows created here after the id scan are newer than anything it saw
+        ceiling = max(ids, default=0)
+        for recipe_id in recipe_index.ids():
+            if recipe_id <= ceiling and recipe_id not in present:
+                recipe_index.remove(recipe_id)
+        missing = [recipe_id for recipe_id in ids if recipe_id not in recipe_index]
+        for start in range(0, len(missing), 500):
+            chunk = missing[start:start + 500]
+            rows = await repo.recommendation_candidates(ids=chunk, limit=len(chunk), description_chars=description_chars)
+            if not recipe_index.tracking:
+                return
+            recipe_index.extend((r.id, r.title, r.description) for r in rows)
+
+index_maintainer = IndexMaintainer()
+
+# Outcome of a bulk import: rejected lines beyond `max_errors` are counted, not listed
+@dataclass
+class ImportReport:
+    imported: int = 0
+    rejected: int = 0
+    errors: list[tuple[int, str]] = field(default_factory=list)
+    seconds: float = 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.imported / self.seconds if self.seconds > 0 else 0.0
 
 # Recipe service class
 class RecipeService:
 
-    # Initialize with repository and AI client
-    def __init__(self, repo: RecipeRepo, ai: AIClient | None = None):
+    # Initialize with repository, AI client and optional group-commit writer
+    def __init__(
+        self,
+        repo: RecipeRepo,
+        ai: AIClient | None = None,
+        writer: WriteBatcher | None = None,
+        refresher: "RecommendationRefresher | None" = None,
+    ):
         self.repo = repo
         self.ai = ai or build_ai_client()
+        self.writer = writer if writer is not None and writer.running else None
+        self.refresher = refresher if refresher is not None and refresher.running else None
+        # Guards the repo's sessions when callers share this service across concurrent
+        # tasks (GraphQL sibling resolvers); held for database work only, never the AI call
+        self.session_lock: AbstractAsyncContextManager = nullcontext()
 
     # Create a new recipe
     async def create_recipe(self, data: RecipeCreate):
-        return await self.repo.create(title=data.title, description=data.description)
+        if self.writer is not None:
+            recipe = await self.writer.create(data.title, data.description)
+        else:
+            recipe = await self.repo.create(title=data.title, description=data.description)
+        if recipe_index.tracking:
+            recipe_index.add(recipe.id, recipe.title, recipe.description)
+        return recipe
+
+    # List one page of recipes, newest first, optionally projected to `columns`;
+    # `created_at_text` keeps timestamps as stored text for the fast JSON path
+    async def list_recipes(
+        self,
+        limit: int,
+        cursor: str | None = None,
+        columns: Sequence[str] | None = None,
+        created_at_text: bool = False,
+    ) -> Page[Recipe]:
+        after = decode_cursor(cursor) if cursor else None
 
-    # List all recipes
-    async def list_recipes(self):
-        return await self.repo.list_all()
+        # Fetch one extra row to learn whether another page exists
+        snapshot = await self._snapshot()
+        if snapshot is not None:
+            rows = snapshot.page(limit + 1, after=after, created_at_text=created_at_text)
+        else:
+            rows = await self.repo.list_page(limit + 1, after=after, columns=columns, created_at_text=created_at_text)
+        items = rows[:limit]
+        next_cursor = None
+        if len(rows) > limit:
+            last = items[-1]
+            created_at = last.created_at
+            if isinstance(created_at, str):
+                created_at = datetime.fromisoformat(created_at)
+            next_cursor = encode_cursor(created_at, last.id)
+        return Page(items=items, next_cursor=next_cursor)
+
+    # Fetch recipes by ID, optionally projected to `columns`
+    async def get_recipes(self, ids: Sequence[int], columns: Sequence[str] | None = None):
+        snapshot = await self._snapshot()
+        if snapshot is not None:
+            return snapshot.get_many(ids)
+        return await self.repo.get_many(ids, columns=columns)
+
+    # Full-text search, one page at a time, optionally projected to `columns`; the next
+    # cursor is the next page's offset
+    async def search_recipes(self, q: str, limit: int, offset: int = 0, columns: Sequence[str] | None = None) -> Page:
+        rows = await self.repo.search(q, limit + 1, offset=offset, columns=columns)
+        next_cursor = str(offset + limit) if len(rows) > limit else None
+        return Page(items=rows[:limit], next_cursor=next_cursor)
+
+    # Stream the whole catalog in batches for export
+    def stream_recipes(self, batch_size: int = 1000):
+        return self.repo.stream_all(batch_size=batch_size)
 
     # Delete a recipe by ID
     async def delete_recipe(self, recipe_id: int) -> bool:
-        return await self.repo.delete(recipe_id)
+        if self.writer is not None:
+            deleted = await self.writer.delete(recipe_id)
+        else:
+            deleted = await self.repo.delete(recipe_id)
+        if deleted:
+            recipe_index.remove(recipe_id)
+        return deleted
+
+    # Create and delete many recipes in one transaction
+    async def batch(self, creates: Sequence[RecipeCreate] = (), delete_ids: Sequence[int] = ()) -> BatchResult:
+        result = await self.repo.batch(
+            creates=[(c.title, c.description) for c in creates],
+            delete_ids=delete_ids,
+        )
+        if recipe_index.tracking:
+            for row in result.created:
+                recipe_index.add(row.id, row.title, row.description)
+        for recipe_id in result.deleted_ids:
+            recipe_index.remove(recipe_id)
+        return result
+
+    # Import validated rows in chunks of `chunk_size`, one transaction per chunk, so neither
+    # memory nor any single transaction grows with the upload. The next chunk is parsed
+    # while the previous one is written. Rows committed before a failure stay imported.
+    async def import_recipes(
+        self,
+        rows: AsyncIterator[tuple[int, RecipeCreate | str]],
+        chunk_size: int | None = None,
+        max_errors: int | None = None,
+    ) -> ImportReport:
+        chunk_size = chunk_size or settings.import_chunk_size
+        max_errors = settings.import_max_errors if max_errors is None else max_errors
+        report = ImportReport()
+        start = time.perf_counter()
+        chunk: list[tuple[str, str | None]] = []
+        writing: asyncio.Task | None = None
+
+        async def flush(rows: list[tuple[str, str | None]]) -> None:
+            nonlocal writing
+            if writing is not None:
+                report.imported += await writing
+            writing = asyncio.create_task(self.repo.insert_many(rows)) if rows else None
+
+        try:
+            async for line_no, row in rows:
+                if isinstance(row, str):
+                    report.rejected += 1
+                    if len(report.errors) < max_errors:
+                        report.errors.append((line_no, row))
+                    continue
+                chunk.append((row.title, row.description))
+                if len(chunk) >= chunk_size:
+                    await flush(chunk)
+                    chunk = []
+            await flush(chunk)
+            await flush([])
+        finally:
+            # The session allows one operation at a time: never leave a write running
+            if writing is not None:
+                await asyncio.gather(writing, return_exceptions=True)
+        report.seconds = time.perf_counter() - start
+
+        # Featurizing row by row would hold up the import; the index catches up in the background
+        if report.imported:
+            recipe_index.source = None
+        return report
+
+    # Key recommendations by catalog state and by which AI client produced them
+    def recommendation_key(self) -> tuple:
+        ai = resolve_ai_client(self.ai)
+        ai_type = type(ai)
+        return (catalog_state.epoch, catalog_state.version, ai_type.__module__, ai_type.__qualname__, getattr(ai, "model", None))
+
+    # Recommend a recipe using AI, reusing the last answer while the catalog is unchanged;
+    # with a background refresher, answer from its latest result (flagged stale) rather
+    # than wait on the AI call
+    async def recommend(self) -> AIRecommendation:
+        async with self.session_lock:
+            await self.repo.sync_catalog()
+        key = self.recommendation_key()
+        cached = recommendation_cache.get(key)
+        if cached is not None:
+            return replace(cached, cached=True)
+        if self.refresher is not None and (precomputed := self.refresher.current()) is not None:
+            return precomputed
+        # Coalesced callers wait within their own budget, and a shed answer is not handed
+        # to callers that may still have time for the real one
+        try:
+            return await recommendation_flight.do(
+                key,
+                lambda: self._compute_recommendation(key),
+                timeout=remaining_budget(),
+                shareable=lambda rec: not rec.shed,
+            )
+        except Shed as exc:
+            ai_shed.inc(reason=exc.reason)
+            return replace(await FallbackAIClient().recommend(await self._candidates()), shed=True)
+
+    # Rank candidates locally, ask the AI client to pick one and cache the answer
+    async def _compute_recommendation(self, key: tuple) -> AIRecommendation:
+        rec = await self.ai.recommend(await self._candidates())
+        if not (rec.shed or rec.degraded):
+            recommendation_cache.set(key, rec)
+        return rec
+
+    # Stream a recommendation as events: the pick first, then the reason as the model
+    # writes it. Cached and precomputed answers are replayed as the same event sequence
+    async def stream_recommendation(self) -> AsyncIterator[RecommendationEvent]:
+        async with self.session_lock:
+            await self.repo.sync_catalog()
+        key = self.recommendation_key()
+        rec = recommendation_cache.get(key)
+        if rec is not None:
+            rec = replace(rec, cached=True)
+        elif self.refresher is not None:
+            rec = self.refresher.current()
+        if rec is not None:
+            for event in recommendation_events(rec):
+                yield event
+            return
+
+        async for event in stream_recommendation(self.ai, await self._candidates()):
+            if event.event == "done" and not (event.data.get("shed") or event.data.get("degraded")):
+                recommendation_cache.set(key, AIRecommendation(**event.data))
+            yield event
+
+    # The locally ranked candidates the AI picks from
+    async def _candidates(self) -> Sequence[RecipeLike]:
+        async with self.session_lock:
+            ids = None
+            if settings.ranking_enabled:
+                # Not built yet, or another worker changed the catalog since it was synced;
+                # until the first build finishes the newest recipes stand in
+                if not recipe_index.loaded or recipe_index.source != catalog_state.generation:
+                    index_maintainer.schedule()
+                if recipe_index.loaded:
+                    ids = recipe_index.top_k(settings.ai_candidate_count)
+
+            snapshot = await self._snapshot()
+            if snapshot is not None:
+                if ids is None:
+                    return snapshot.page(settings.ai_candidate_count, description_chars=settings.ai_description_chars)
+                return snapshot.get_many(ids[: settings.ai_candidate_count], description_chars=settings.ai_description_chars)
+
+            # Only a bounded, projected slice of the catalog is ever loaded per request
+            return await self.repo.recommendation_candidates(
+                ids=ids,
+                limit=settings.ai_candidate_count,
+                description_chars=settings.ai_description_chars,
+            )
+
+    # The read snapshot at the current catalog version, (re)loading it when another worker
+    # changed the catalog; None when the snapshot is disabled or could not be loaded, and
+    # the read goes to the database. Callers hold session_lock.
+    async def _snapshot(self) -> CatalogSnapshot | None:
+        if not settings.catalog_snapshot:
+            return None
+        await self.repo.sync_catalog()
+        if not catalog_snapshot.current(catalog_state.epoch, catalog_state.version):
+            await snapshot_flight.do("load", self._load_snapshot)
+            if not catalog_snapshot.current(catalog_state.epoch, catalog_state.version):
+                return None
+        return catalog_snapshot
 
-    # Recommend a recipe using AI
-    async def recommend(self):
-        recipes = await self.repo.list_all()
-        return await self.ai.recommend(recipes)
+    # Load the snapshot ahead of the first read (at startup)
+    async def load_snapshot(self) -> None:
+        async with self.session_lock:
+            await snapshot_flight.do("load", self._load_snapshot)
 
+    # Copy the catalog into the snapshot; retry a few times if a write raced the load
+    async def _load_snapshot(self) -> None:
+        for _ in range(SNAPSHOT_LOAD_ATTEMPTS):
+            await self.repo.sync_catalog(fresh=True)
+            epoch, version = catalog_state.epoch, catalog_state.version
+            rows = []
+            async for batch in self.repo.stream_all(created_at_text=True):
+                rows.extend(batch)
+            await self.repo.sync_catalog(fresh=True)
+            if (catalog_state.epoch, catalog_state.version) == (epoch, version):
+                catalog_snapshot.load(rows, epoch, version)
+                return
+        logger.warning("Catalog snapshot did not settle after %d attempts; reading from the database", SNAPSHOT_LOAD_ATTEMPTS)
@@ -0,0 +1,162 @@
+import asyncio
+import logging
+import time
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.core.config import settings
+from app.core.metrics import recommendation_refreshes
+from app.db.catalog import catalog_state
+from app.db.repo import RecipeRepo
+from app.services.ai import AIClient, AIRecommendation
+from app.services.recipes import RecipeService
+from app.services.resilience import backoff_delay
+
+logger = logging.getLogger(__name__)
+
+# Keeps a precomputed recommendation for the current catalog: catalog changes are
+# debounced and the recommendation is recomputed in the background, so requests never
+# wait on the AI call once a first result exists
+class RecommendationRefresher:
+    def __init__(
+        self,
+        session_maker: async_sessionmaker[AsyncSession],
+        read_session_maker: async_sessionmaker[AsyncSession] | None = None,
+        ai: AIClient | None = None,
+        debounce: float | None = None,
+        max_delay: float | None = None,
+        poll_interval: float | None = None,
+        retry_base: float | None = None,
+        retry_max: float | None = None,
+    ):
+        self.session_maker = session_maker
+        self.read_session_maker = read_session_maker or session_maker
+        self.ai = ai
+        self.debounce = settings.recommendation_refresh_debounce if debounce is None else debounce
+        self.max_delay = settings.recommendation_refresh_max_delay if max_delay is None else max_delay
+        self.poll_interval = settings.recommendation_refresh_poll_interval if poll_interval is None else poll_interval
+        self.retry_base = settings.recommendation_refresh_retry_base if retry_base is None else retry_base
+        self.retry_max = settings.recommendation_refresh_retry_max if retry_max is None else retry_max
+        self.latest: AIRecommendation | None = None
+        # Catalog (epoch, version) the latest result was computed for
+        self.latest_version: tuple[str, int] | None = None
+        self.refreshing = False
+        # Consecutive refreshes that produced no usable answer, and the pending retry
+        self.failures = 0
+        self._retry: asyncio.TimerHandle | None = None
+        self._changed = asyncio.Event()
+        self._tasks: list[asyncio.Task] = []
+
+    @property
+    def running(self) -> bool:
+        return any(not task.done() for task in self._tasks)
+
+    # Whether the latest result predates the current catalog
+    @property
+    def stale(self) -> bool:
+        return self.latest_version != (catalog_state.epoch, catalog_state.version)
+
+    def start(self) -> None:
+        if self.running:
+            return
+        catalog_state.subscribe(self.notify)
+        self._changed.set()  # compute the first result right away
+        self._tasks = [asyncio.create_task(self._run(), name="recommendation-refresher")]
+        if self.poll_interval > 0:
+            self._tasks.append(asyncio.create_task(self._poll(), name="recommendation-refresher-poll"))
+
+    async def stop(self) -> None:
+        catalog_state.unsubscribe(self.notify)
+        self._cancel_retry()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    # Schedule a refresh; called on every catalog change
+    def notify(self) -> None:
+        self._changed.set()
+
+    # The latest precomputed result, flagged stale if the catalog has moved on
+    def current(self) -> AIRecommendation | None:
+        if self.latest is None:
+            return None
+        stale = self.stale
+        if stale:
+            self.notify()
+        return AIRecommendation(
+            self.latest.recommended_id, self.latest.title, self.latest.reason, cached=True, stale=stale
+        )
+
+    async def _run(self) -> None:
+        while True:
+            await self._changed.wait()
+            await self._settle()
+            await self.refresh()
+
+    # Wait until changes stop arriving for `debounce` seconds, or `max_delay` has passed
+    async def _settle(self) -> None:
+        deadline = time.monotonic() + self.max_delay
+        while True:
+            self._changed.clear()
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            try:
+                await asyncio.wait_for(self._changed.wait(), min(self.debounce, remaining))
+            except asyncio.TimeoutError:
+                return
+
+    # Recompute the recommendation for the current catalog
+    async def refresh(self) -> None:
+        self.refreshing = True
+        try:
+            async with self.session_maker() as session, self.read_session_maker() as read_session:
+                repo = RecipeRepo(session, read_session)
+                # Label the result with the version seen before computing: a write landing
+                # mid-refresh then shows as stale and triggers another refresh
+                await repo.sync_catalog()
+                version = (catalog_state.epoch, catalog_state.version)
+                rec = await RecipeService(repo, ai=self.ai).recommend()
+            if rec.shed or rec.degraded:
+                # The AI was saturated or failing: keep the previous answer and try again later
+                recommendation_refreshes.inc(outcome="shed" if rec.shed else "degraded")
+                self._schedule_retry()
+                return
+            self.latest = rec
+            self.latest_version = version
+            self.failures = 0
+            self._cancel_retry()
+            recommendation_refreshes.inc(outcome="success")
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            recommendation_refreshes.inc(outcome="error")
+            logger.exception("Recommendation refresh failed")
+            self._schedule_retry()
+        finally:
+            self.refreshing = False
+
+    # Refresh again after a jittered delay that doubles with each consecutive failure
+    def _schedule_retry(self) -> None:
+        self._cancel_retry()
+        delay = backoff_delay(self.failures, self.retry_base, self.retry_max)
+        self.failures += 1
+        self._retry = asyncio.get_running_loop().call_later(delay, self.notify)
+
+    def _cancel_retry(self) -> None:
+        if self._retry is not None:
+            self._retry.cancel()
+            self._retry = None
+
+    # Pick up writes made by other workers, which never reach this process's listeners
+    async def _poll(self) -> None:
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                async with self.read_session_maker() as session:
+                    await RecipeRepo(session).sync_catalog()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Catalog poll failed")
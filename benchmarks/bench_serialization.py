@@ -0,0 +1,64 @@
+"""Rows/sec for GET /recipes serialization: ORM + RecipeOut vs. the direct JSON path.
+
+    python -m benchmarks.bench_serialization --rows 5000 --repeat 5
+"""
+import argparse
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+
+from pydantic import TypeAdapter
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.api.responses import recipe_rows_json
+from app.db.repo import RecipeRepo
+from app.db.schema import init_schema
+from app.domain.schemas import RecipeOut
+
+ADAPTER = TypeAdapter(list[RecipeOut])
+
+# Previous path: hydrate ORM objects, validate each through RecipeOut, encode
+async def orm_pydantic(repo: RecipeRepo, rows: int) -> bytes:
+    items = await repo.list_page(rows)
+    return ADAPTER.dump_json(ADAPTER.validate_python(items))
+
+# Fast path: plain row tuples with text timestamps, encoded by orjson
+async def rows_orjson(repo: RecipeRepo, rows: int) -> bytes:
+    items = await repo.list_page(rows, created_at_text=True)
+    return recipe_rows_json(items)
+
+async def run(rows: int, repeat: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{Path(tmp) / 'bench.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(init_schema)
+        session_maker = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+
+        async with session_maker() as session:
+            description = "Slow-cooked with onions, garlic and a splash of wine. " * 4
+            await RecipeRepo(session).batch(creates=[(f"Recipe {i}", description) for i in range(rows)])
+
+        results = {}
+        for name, fn in (("orm+pydantic", orm_pydantic), ("rows+orjson", rows_orjson)):
+            best = float("inf")
+            for _ in range(repeat):
+                async with session_maker() as session:
+                    start = time.perf_counter()
+                    body = await fn(RecipeRepo(session), rows)
+                    best = min(best, time.perf_counter() - start)
+            results[name] = body
+            print(f"{name:>14}: {rows / best:>12,.0f} rows/sec  ({best * 1000:.1f} ms, {len(body):,} bytes)")
+
+        assert results["orm+pydantic"] == results["rows+orjson"], "outputs differ"
+        await engine.dispose()
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(run(args.rows, args.repeat))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+"""Load and latency benchmark for the REST and GraphQL endpoints, run in-process over ASGI.
+
+    python -m benchmarks.load --rows 1000 --concurrency 16 --requests 200
+    python -m benchmarks.load --rows 100000 --save-baseline benchmarks/baseline.json
+    python -m benchmarks.load --rows 100000 --baseline benchmarks/baseline.json
+
+The database is a throwaway SQLite file seeded from `--seed` (recorded in the baseline),
+and the Anthropic API is replaced by a local stub with configurable latency, so runs are
+repeatable and cost nothing.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import re
+import sys
+import tempfile
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+import httpx
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.db.repo import RecipeRepo
+from app.db.schema import init_schema
+from app.db import session as db_session
+from app.db.session import build_engine, get_read_session, get_session
+from app.main import app
+from app.services.anthropic_client import AnthropicAIClient, build_http_client
+from app.services.recipes import index_maintainer
+
+WORDS = (
+    "tomato basil garlic onion chicken beef tofu rice noodle pasta lemon ginger soy chili "
+    "curry coconut mushroom spinach cheese butter roasted grilled braised stew soup salad"
+).split()
+
+SEED_CHUNK = 5000
+
+# Benchmark context shared by operations
+@dataclass
+class Context:
+    client: httpx.AsyncClient
+    cursor: str | None = None
+
+Operation = Callable[[Context], Awaitable[httpx.Response]]
+
+# Per-operation results
+@dataclass
+class Result:
+    requests: int
+    errors: int
+    throughput: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+
+def gql(query: str, variables: dict | None = None) -> dict:
+    return {"query": query, "variables": variables or {}}
+
+def random_title() -> str:
+    return " ".join(random.sample(WORDS, 3)).title()
+
+async def create_and_delete(ctx: Context) -> httpx.Response:
+    r = await ctx.client.post("/recipes", json={"title": random_title()})
+    return await ctx.client.delete(f"/recipes/{r.json()['id']}")
+
+async def gql_create_and_delete(ctx: Context) -> httpx.Response:
+    create = gql("mutation($t: String!) { createRecipe(title: $t) { id } }", {"t": random_title()})
+    r = await ctx.client.post("/graphql", json=create)
+    recipe_id = r.json()["data"]["createRecipe"]["id"]
+    delete = gql("mutation($id: Int!) { deleteRecipe(recipeId: $id) }", {"id": recipe_id})
+    return await ctx.client.post("/graphql", json=delete)
+
+async def batch(ctx: Context) -> httpx.Response:
+    r = await ctx.client.post("/recipes/batch", json={"create": [{"title": random_title()} for _ in range(20)]})
+    ids = [c["id"] for c in r.json()["created"]]
+    return await ctx.client.post("/recipes/batch", json={"delete": ids})
+
+OPERATIONS: dict[str, Operation] = {
+    "rest.list": lambda ctx: ctx.client.get("/recipes"),
+    "rest.list_next_page": lambda ctx: ctx.client.get("/recipes", params={"cursor": ctx.cursor}),
+    "rest.search": lambda ctx: ctx.client.get("/recipes/search", params={"q": random.choice(WORDS)}),
+    "rest.recommendation": lambda ctx: ctx.client.get("/recipes/recommendation"),
+    "rest.export_ndjson": lambda ctx: ctx.client.get("/recipes/export", params={"format": "ndjson"}),
+    "rest.export_csv": lambda ctx: ctx.client.get("/recipes/export", params={"format": "csv"}),
+    "rest.create_delete": create_and_delete,
+    "rest.batch": batch,
+    "gql.recipes": lambda ctx: ctx.client.post("/graphql", json=gql("{ recipes { id title createdAt } }")),
+    "gql.recipes_connection": lambda ctx: ctx.client.post(
+        "/graphql", json=gql("{ recipesConnection(first: 50) { edges { node { id title } } pageInfo { endCursor } } }")
+    ),
+    "gql.recipe_by_id": lambda ctx: ctx.client.post(
+        "/graphql",
+        json=gql("query($id: Int!) { recipe(id: $id) { id title description } }", {"id": random.randint(1, 1000)}),
+    ),
+    "gql.search": lambda ctx: ctx.client.post(
+        "/graphql",
+        json=gql("query($q: String!) { searchRecipes(query: $q) { id snippet } }", {"q": random.choice(WORDS)}),
+    ),
+    "gql.recommendation": lambda ctx: ctx.client.post("/graphql", json=gql("{ recommendRecipe { recommendedId title } }")),
+    "gql.create_delete": gql_create_and_delete,
+}
+
+# Local stand-in for the Anthropic Messages API: picks the first id in the prompt after a delay
+def anthropic_stub(latency_ms: float) -> httpx.MockTransport:
+    async def handler(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(latency_ms / 1000)
+        # The catalog goes out as content blocks (for prompt caching); older prompts were a string
+        prompt = json.loads(request.content)["messages"][0]["content"]
+        if isinstance(prompt, list):
+            prompt = "".join(block["text"] for block in prompt if block.get("type") == "text")
+        match = re.search(r"\d+", prompt.split("\n", 1)[-1])
+        text = json.dumps({"recommended_id": int(match.group()) if match else 0, "title": "Stub", "reason": "Stub"})
+        return httpx.Response(200, json={"content": [{"type": "text", "text": text}]})
+    return httpx.MockTransport(handler)
+
+async def seed(session_maker: async_sessionmaker, rows: int) -> None:
+    async with session_maker() as session:
+        repo = RecipeRepo(session)
+        for start in range(0, rows, SEED_CHUNK):
+            count = min(SEED_CHUNK, rows - start)
+            creates = [(random_title(), " ".join(random.choices(WORDS, k=20))) for _ in range(count)]
+            await repo.batch(creates=creates)
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+# GraphQL reports resolver failures with a 200 and an `errors` list
+def failed(r: httpx.Response, graphql: bool) -> bool:
+    if r.status_code >= 400:
+        return True
+    if not graphql:
+        return False
+    try:
+        body = r.json()
+    except ValueError:
+        return True
+    return not isinstance(body, dict) or bool(body.get("errors"))
+
+# Drive one operation `requests` times with `concurrency` workers
+async def measure(op: Operation, ctx: Context, requests: int, concurrency: int, graphql: bool = False) -> Result:
+    latencies: list[float] = []
+    errors = 0
+    counter = itertools.count()
+
+    async def worker() -> None:
+        nonlocal errors
+        while next(counter) < requests:
+            start = time.perf_counter()
+            try:
+                r = await op(ctx)
+                if failed(r, graphql):
+                    errors += 1
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return Result(
+        requests=len(latencies),
+        errors=errors,
+        throughput=len(latencies) / elapsed if elapsed else 0.0,
+        p50_ms=percentile(latencies, 50) * 1000,
+        p95_ms=percentile(latencies, 95) * 1000,
+        p99_ms=percentile(latencies, 99) * 1000,
+    )
+
+# Regressions: lower throughput or higher p95 than the baseline, beyond the tolerance
+def compare(results: dict[str, Result], baseline: dict[str, dict], tolerance: float) -> list[str]:
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if result.throughput < base["throughput"] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {result.throughput:.1f}/s vs baseline {base['throughput']:.1f}/s")
+        if result.p95_ms > base["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {result.p95_ms:.1f} ms vs baseline {base['p95_ms']:.1f} ms")
+    return regressions
+
+async def run(args: argparse.Namespace) -> dict[str, Result]:
+    # Same seed, same catalog and the same sequence of generated inputs
+    random.seed(args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite+aiosqlite:///{Path(tmp) / 'bench.db'}"
+        engine = build_engine(url, pool_size=1)
+        read_engine = build_engine(url, read_only=True, pool_size=args.concurrency)
+        async with engine.begin() as conn:
+            await conn.run_sync(init_schema)
+
+        writer = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+        reader = async_sessionmaker(read_engine, expire_on_commit=False, class_=AsyncSession)
+
+        started = time.perf_counter()
+        await seed(writer, args.rows)
+        print(f"seeded {args.rows:,} rows in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+        async def override_session():
+            async with writer() as session:
+                yield session
+
+        async def override_read_session():
+            async with reader() as session:
+                yield session
+
+        app.dependency_overrides[get_session] = override_session
+        app.dependency_overrides[get_read_session] = override_read_session
+        # Background work (the ranking index maintainer) opens sessions outside request deps
+        default_sessions = db_session.SessionLocal, db_session.ReadSessionLocal
+        db_session.SessionLocal, db_session.ReadSessionLocal = writer, reader
+        app.state.ai_client = AnthropicAIClient(
+            "bench-key", http_client=build_http_client(transport=anthropic_stub(args.ai_latency_ms))
+        )
+
+        results: dict[str, Result] = {}
+        transport = httpx.ASGITransport(app=app)
+        try:
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+                ctx = Context(client=client)
+                ctx.cursor = (await client.get("/recipes")).headers.get("X-Next-Cursor")
+                for name in args.ops:
+                    results[name] = await measure(
+                        OPERATIONS[name], ctx, args.requests, args.concurrency, graphql=name.startswith("gql.")
+                    )
+                    r = results[name]
+                    print(
+                        f"{name:<24} {r.throughput:>9.1f} req/s  p50 {r.p50_ms:>8.2f} ms  "
+                        f"p95 {r.p95_ms:>8.2f} ms  p99 {r.p99_ms:>8.2f} ms  errors {r.errors}"
+                    )
+        finally:
+            app.dependency_overrides.clear()
+            db_session.SessionLocal, db_session.ReadSessionLocal = default_sessions
+            index_maintainer.cancel()
+            await app.state.ai_client.aclose()
+            await read_engine.dispose()
+            await engine.dispose()
+        return results
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1000, help="rows to seed (e.g. 1000, 100000, 1000000)")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--seed", type=int, default=0, help="seed for generated rows and request inputs")
+    parser.add_argument("--requests", type=int, default=200, help="requests per operation")
+    parser.add_argument("--ops", nargs="+", choices=sorted(OPERATIONS), default=list(OPERATIONS))
+    parser.add_argument("--ai-latency-ms", type=float, default=50.0, help="latency of the Anthropic stub")
+    parser.add_argument("--baseline", type=Path, help="compare against this baseline file")
+    parser.add_argument("--save-baseline", type=Path, help="write results to this baseline file")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+
+    if args.save_baseline:
+        payload = {
+            "rows": args.rows,
+            "concurrency": args.concurrency,
+            "seed": args.seed,
+            "results": {name: asdict(result) for name, result in results.items()},
+        }
+        args.save_baseline.write_text(json.dumps(payload, indent=2) + "\n")
+        print(f"baseline saved to {args.save_baseline}", file=sys.stderr)
+
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text())
+        recorded = (baseline.get("rows"), baseline.get("concurrency"), baseline.get("seed"))
+        if recorded != (args.rows, args.concurrency, args.seed):
+            print("warning: baseline was recorded with different --rows/--concurrency/--seed", file=sys.stderr)
+        regressions = compare(results, baseline["results"], args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print("no regressions against baseline", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Import and startup time of the API, each phase measured in a fresh interpreter.
+
+    python -m benchmarks.startup --repeat 5
+    python -m benchmarks.startup --save-baseline benchmarks/startup.json
+    python -m benchmarks.startup --baseline benchmarks/startup.json
+    python -m benchmarks.startup --top 15
+
+Phases: importing app.main, the lifespan against a new database (every migration runs)
+and against an up-to-date one (version check only), and the first /graphql request,
+which imports the GraphQL schema on demand.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+# Runs in the child interpreter and prints its timings as JSON
+PROBE = r"""
+import asyncio, json, sys, time
+start = time.perf_counter()
+from app.main import app
+timings = {"import_ms": (time.perf_counter() - start) * 1000}
+
+async def main():
+    start = time.perf_counter()
+    async with app.router.lifespan_context(app):
+        timings["lifespan_ms"] = (time.perf_counter() - start) * 1000
+        if "--graphql" in sys.argv:
+            import httpx
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://probe") as client:
+                start = time.perf_counter()
+                r = await client.post("/graphql", json={"query": "{ recipes(first: 1) { id } }"})
+                timings["first_graphql_ms"] = (time.perf_counter() - start) * 1000
+                r.raise_for_status()
+
+asyncio.run(main())
+print(json.dumps(timings))
+"""
+
+def probe(db_path: Path, *flags: str) -> dict[str, float]:
+    env = {**os.environ, "DATABASE_URL": f"sqlite+aiosqlite:///{db_path}", "ANTHROPIC_API_KEY": ""}
+    out = subprocess.run(
+        [sys.executable, "-c", PROBE, *flags], env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+# One boot on a new database, then one on the migrated database plus a GraphQL request
+def measure_once() -> dict[str, float]:
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / "startup.db"
+        first = probe(db_path)
+        second = probe(db_path, "--graphql")
+    return {
+        "import_ms": min(first["import_ms"], second["import_ms"]),
+        "lifespan_new_db_ms": first["lifespan_ms"],
+        "lifespan_migrated_ms": second["lifespan_ms"],
+        "first_graphql_ms": second["first_graphql_ms"],
+    }
+
+# Slowest modules by cumulative import time, from python -X importtime
+def top_imports(count: int) -> list[tuple[int, str]]:
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"], capture_output=True, text=True, check=True
+    )
+    rows = []
+    for line in out.stderr.splitlines():
+        parts = line.removeprefix("import time:").split("|")
+        if len(parts) == 3 and parts[1].strip().isdigit():
+            rows.append((int(parts[1]), parts[2].strip()))
+    return sorted(rows, reverse=True)[:count]
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5, help="boots per phase; medians are reported")
+    parser.add_argument("--top", type=int, default=0, help="also list the N slowest imports")
+    parser.add_argument("--baseline", type=Path, help="compare against this baseline file")
+    parser.add_argument("--save-baseline", type=Path, help="write results to this baseline file")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative regression")
+    args = parser.parse_args()
+
+    runs = [measure_once() for _ in range(args.repeat)]
+    results = {name: statistics.median(run[name] for run in runs) for name in runs[0]}
+    for name, value in results.items():
+        print(f"{name:<24} {value:>9.1f} ms")
+
+    if args.top:
+        print()
+        for micros, module in top_imports(args.top):
+            print(f"{micros / 1000:>9.1f} ms  {module}")
+
+    if args.save_baseline:
+        args.save_baseline.write_text(json.dumps({"results": results}, indent=2) + "\n")
+        print(f"baseline saved to {args.save_baseline}", file=sys.stderr)
+
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text())["results"]
+        regressions = [
+            f"{name}: {value:.1f} ms vs baseline {baseline[name]:.1f} ms"
+            for name, value in results.items()
+            if name in baseline and value > baseline[name] * (1 + args.tolerance)
+        ]
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print("no regressions against baseline", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
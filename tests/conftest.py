@@ -9,10 +9,14 @@ from sqlalchemy.ext.asyncio import (
 )
 
 from app.main import app
-from app.db.models import Base
-from app.db.session import get_session
-import app.api.graphql as graphql_module
+from app.db.schema import init_schema
+from app.db.session import get_read_session, get_session
 import app.db.session as db_session_module
+from app.db.catalog import catalog_state
+from app.db.snapshot import catalog_snapshot
+from app.services.cache import recommendation_cache
+from app.services.ranking import recipe_index
+from app.services.recipes import index_maintainer
 
 # Fixture to create a test database engine
 @pytest.fixture
@@ -21,7 +25,7 @@ async def test_engine(tmp_path):
     engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}", echo=False)
 
     async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(init_schema)
 
     try:
         yield engine
@@ -42,12 +46,28 @@ def test_app(session_maker, monkeypatch):
             yield session
 
     app.dependency_overrides[get_session] = override_get_session
+    app.dependency_overrides[get_read_session] = override_get_session
 
-    # Patch the session maker in the db session and graphql modules
+    # Patch the session makers in the db session module
     monkeypatch.setattr(db_session_module, "SessionLocal", session_maker)
-    monkeypatch.setattr(graphql_module, "SessionLocal", session_maker)
+    monkeypatch.setattr(db_session_module, "ReadSessionLocal", session_maker)
 
     try:
         yield app
     finally:
         app.dependency_overrides.clear()
+
+
+# Keep process-wide caches and indexes from leaking between tests
+@pytest.fixture(autouse=True)
+def clear_recommendation_state():
+    recommendation_cache.clear()
+    recipe_index.reset()
+    catalog_state.reset()
+    catalog_snapshot.reset()
+    yield
+    index_maintainer.cancel()
+    recommendation_cache.clear()
+    recipe_index.reset()
+    catalog_state.reset()
+    catalog_snapshot.reset()
@@ -0,0 +1,170 @@
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+
+import app.services.recipes as recipes_module
+from app.core.deadline import deadline_scope
+from app.core.metrics import ai_shed
+from app.services import anthropic_client as anthropic_module
+from app.services.concurrency import AdmissionLimiter
+
+# Minimal recipe stand-in with the attributes the AI client reads
+class FakeRecipe:
+    def __init__(self, id: int, title: str, description: str | None = None):
+        self.id = id
+        self.title = title
+        self.description = description
+
+# Local Messages API stub that answers only once `release` is set
+class GatedStub:
+    def __init__(self):
+        self.release = asyncio.Event()
+        self.requests = 0
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        await self.release.wait()
+        text = json.dumps({"recommended_id": 1, "title": "Pizza", "reason": "Upstream"})
+        return httpx.Response(200, json={"content": [{"type": "text", "text": text}]})
+
+    def client(self, limiter: AdmissionLimiter | None = None) -> anthropic_module.AnthropicAIClient:
+        http = anthropic_module.build_http_client(transport=httpx.MockTransport(self))
+        return anthropic_module.AnthropicAIClient("test-key", http_client=http, limiter=limiter, max_retries=0)
+
+
+@pytest.mark.anyio
+async def test_full_queue_sheds_to_the_fallback():
+    recipes = [FakeRecipe(1, "Pizza"), FakeRecipe(2, "Soup")]
+    stub = GatedStub()
+    limiter = AdmissionLimiter(max_concurrent=1, max_queue=1)
+    client = stub.client(limiter)
+    shed_before = ai_shed.value(reason="queue_full")
+    try:
+        running = asyncio.create_task(client.recommend(recipes))
+        waiting = asyncio.create_task(client.recommend(recipes))
+        while limiter.queued < 1:
+            await asyncio.sleep(0.01)
+        assert limiter.in_flight == 1
+
+        # No room left to wait: answered at once, without touching the upstream
+        rec = await client.recommend(recipes)
+        assert rec.shed and rec.reason.startswith("Fallback")
+        assert ai_shed.value(reason="queue_full") == shed_before + 1
+
+        stub.release.set()
+        assert [r.reason for r in await asyncio.gather(running, waiting)] == ["Upstream", "Upstream"]
+    finally:
+        await client.aclose()
+    assert stub.requests == 2
+    assert (limiter.in_flight, limiter.queued) == (0, 0)
+
+
+@pytest.mark.anyio
+async def test_request_budget_bounds_the_call_without_tripping_the_breaker(monkeypatch):
+    monkeypatch.setattr(anthropic_module.settings, "ai_min_budget_ms", 50.0)
+    recipes = [FakeRecipe(1, "Pizza")]
+    stub = GatedStub()
+    client = stub.client(AdmissionLimiter(max_concurrent=4, max_queue=4))
+    try:
+        # Too little budget to be worth an attempt
+        with deadline_scope(0.01):
+            rec = await client.recommend(recipes)
+        assert rec.shed and stub.requests == 0
+
+        # The upstream never answers: the call gives up when the budget runs out
+        start = time.perf_counter()
+        with deadline_scope(0.2):
+            rec = await client.recommend(recipes)
+        assert rec.shed and time.perf_counter() - start < 2
+        assert stub.requests == 1
+    finally:
+        await client.aclose()
+    assert client.breaker.failures == 0
+
+
+@pytest.mark.anyio
+async def test_deadline_header_sheds_and_the_answer_is_not_cached(test_app, monkeypatch):
+    monkeypatch.setattr(anthropic_module.settings, "ai_min_budget_ms", 50.0)
+    stub = GatedStub()
+    ai = stub.client(AdmissionLimiter(max_concurrent=4, max_queue=4))
+    monkeypatch.setattr(recipes_module, "build_ai_client", lambda: ai)
+
+    transport = httpx.ASGITransport(app=test_app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            await client.post("/recipes", json={"title": "Pizza"})
+
+            r = await client.get("/recipes/recommendation", headers={"X-Request-Deadline": "200"})
+            assert r.status_code == 200
+            assert r.json()["reason"].startswith("Fallback")
+
+            stub.release.set()
+            r = await client.get("/recipes/recommendation")
+            assert r.headers["X-Cache"] == "MISS"
+            assert r.json()["reason"] == "Upstream"
+
+            r = await client.get("/metrics")
+            assert 'ai_shed_total{reason="deadline"}' in r.text
+            assert "ai_queue_depth 0" in r.text
+    finally:
+        await ai.aclose()
+
+
+@pytest.mark.anyio
+async def test_coalesced_callers_keep_their_own_deadline(test_app, monkeypatch):
+    monkeypatch.setattr(anthropic_module.settings, "ai_min_budget_ms", 50.0)
+    stub = GatedStub()
+    ai = stub.client(AdmissionLimiter(max_concurrent=4, max_queue=4))
+    monkeypatch.setattr(recipes_module, "build_ai_client", lambda: ai)
+
+    transport = httpx.ASGITransport(app=test_app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            await client.post("/recipes", json={"title": "Pizza"})
+
+            # A patient leader is waiting on the upstream; an impatient follower is not held past its budget
+            leader = asyncio.create_task(client.get("/recipes/recommendation"))
+            while stub.requests < 1:
+                await asyncio.sleep(0.01)
+            start = time.perf_counter()
+            r = await client.get("/recipes/recommendation", headers={"X-Request-Deadline": "200"})
+            assert time.perf_counter() - start < 0.6
+            assert r.json()["reason"].startswith("Fallback")
+
+            stub.release.set()
+            assert (await leader).json()["reason"] == "Upstream"
+    finally:
+        await ai.aclose()
+    assert stub.requests == 1
+
+
+@pytest.mark.anyio
+async def test_shed_leader_does_not_hand_its_fallback_to_patient_followers(test_app, monkeypatch):
+    monkeypatch.setattr(anthropic_module.settings, "ai_min_budget_ms", 50.0)
+    stub = GatedStub()
+    ai = stub.client(AdmissionLimiter(max_concurrent=4, max_queue=4))
+    monkeypatch.setattr(recipes_module, "build_ai_client", lambda: ai)
+
+    transport = httpx.ASGITransport(app=test_app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            await client.post("/recipes", json={"title": "Pizza"})
+
+            leader = asyncio.create_task(client.get("/recipes/recommendation", headers={"X-Request-Deadline": "300"}))
+            while stub.requests < 1:
+                await asyncio.sleep(0.01)
+            follower = asyncio.create_task(client.get("/recipes/recommendation"))
+
+            # The leader runs out of budget and is shed; the follower takes over the call
+            assert (await leader).json()["reason"].startswith("Fallback")
+            while stub.requests < 2:
+                await asyncio.sleep(0.01)
+            stub.release.set()
+            r = await follower
+            assert r.json()["reason"] == "Upstream"
+            assert r.headers["X-Cache"] == "MISS"
+    finally:
+        await ai.aclose()
@@ -0,0 +1,181 @@
+import json
+import pytest
+import httpx
+
+import app.services.recipes as recipes_module
+from app.services import anthropic_client as anthropic_module
+from app.services.resilience import CircuitBreaker, OPEN
+
+# Minimal recipe stand-in with the attributes the AI client reads
+class FakeRecipe:
+    def __init__(self, id: int, title: str, description: str | None = None):
+        self.id = id
+        self.title = title
+        self.description = description
+
+# Local stub of the Anthropic Messages API, scripted with a list of responses
+class StubAnthropic:
+    def __init__(self, *responses: httpx.Response):
+        self.responses = list(responses)
+        self.requests: list[httpx.Request] = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        return self.responses.pop(0)
+
+    def client(self, **kwargs) -> anthropic_module.AnthropicAIClient:
+        http = anthropic_module.build_http_client(transport=httpx.MockTransport(self))
+        return anthropic_module.AnthropicAIClient("test-key", http_client=http, **kwargs)
+
+
+def ok(obj: dict) -> httpx.Response:
+    return httpx.Response(200, json={"content": [{"type": "text", "text": json.dumps(obj)}]})
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(anthropic_module.settings, "ai_backoff_base", 0.0)
+
+
+@pytest.mark.anyio
+async def test_retries_transient_errors_then_succeeds():
+    recipes = [FakeRecipe(1, "Pizza"), FakeRecipe(2, "Soup")]
+    stub = StubAnthropic(
+        httpx.Response(503),
+        httpx.Response(429, headers={"retry-after": "0"}),
+        ok({"recommended_id": 2, "title": "Soup", "reason": "Warm"}),
+    )
+    client = stub.client(max_retries=2)
+    try:
+        rec = await client.recommend(recipes)
+    finally:
+        await client.aclose()
+
+    assert (rec.recommended_id, rec.title, rec.reason) == (2, "Soup", "Warm")
+    assert len(stub.requests) == 3
+    assert stub.requests[0].url.path == "/v1/messages"
+    assert stub.requests[0].headers["x-api-key"] == "test-key"
+
+
+@pytest.mark.anyio
+async def test_circuit_breaker_fails_over_while_upstream_is_down():
+    recipes = [FakeRecipe(1, "Pizza")]
+    stub = StubAnthropic(*[httpx.Response(500) for _ in range(2)])
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    client = stub.client(max_retries=0, breaker=breaker)
+    try:
+        for _ in range(2):
+            rec = await client.recommend(recipes)
+            assert rec.reason.startswith("Fallback") and rec.degraded
+        assert breaker.state == OPEN
+
+        # Open breaker short-circuits to the fallback without touching the upstream
+        rec = await client.recommend(recipes)
+        assert rec.recommended_id == 1 and rec.degraded
+        assert len(stub.requests) == 2
+    finally:
+        await client.aclose()
+
+
+@pytest.mark.anyio
+async def test_fallback_during_an_outage_is_not_cached(test_app, monkeypatch):
+    stub = StubAnthropic(httpx.Response(503), ok({"recommended_id": 1, "title": "Pizza", "reason": "Back"}))
+    ai = stub.client(max_retries=0)
+    monkeypatch.setattr(recipes_module, "build_ai_client", lambda: ai)
+    transport = httpx.ASGITransport(app=test_app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            await client.post("/recipes", json={"title": "Pizza"})
+            r = await client.get("/recipes/recommendation")
+            assert r.json()["reason"].startswith("Fallback")
+
+            # The upstream is back: the next call asks it instead of replaying the fallback
+            r = await client.get("/recipes/recommendation")
+            assert (r.headers["X-Cache"], r.json()["reason"]) == ("MISS", "Back")
+            r = await client.get("/recipes/recommendation")
+            assert r.headers["X-Cache"] == "HIT"
+    finally:
+        await ai.aclose()
+
+
+@pytest.mark.anyio
+async def test_half_open_breaker_recovers_after_success():
+    recipes = [FakeRecipe(1, "Pizza")]
+    stub = StubAnthropic(httpx.Response(500), ok({"recommended_id": 1, "title": "Pizza", "reason": "Back"}))
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    client = stub.client(max_retries=0, breaker=breaker)
+    try:
+        await client.recommend(recipes)
+        rec = await client.recommend(recipes)
+    finally:
+        await client.aclose()
+
+    assert rec.reason == "Back"
+    assert breaker.opened_at is None
+
+
+@pytest.mark.anyio
+async def test_malformed_reply_fails_over_without_wedging_half_open_breaker():
+    recipes = [FakeRecipe(1, "Pizza")]
+    stub = StubAnthropic(
+        httpx.Response(500),
+        httpx.Response(200, text="<html>gateway</html>"),
+        httpx.Response(200, json=["not", "an", "object"]),
+        ok({"recommended_id": 1, "title": "Pizza", "reason": "Back"}),
+    )
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    client = stub.client(max_retries=0, breaker=breaker)
+    try:
+        await client.recommend(recipes)
+        for _ in range(2):
+            rec = await client.recommend(recipes)
+            assert rec.reason.startswith("Fallback")
+            assert breaker.opened_at is not None
+        rec = await client.recommend(recipes)
+    finally:
+        await client.aclose()
+
+    assert rec.reason == "Back"
+    assert len(stub.requests) == 4
+
+
+@pytest.mark.anyio
+async def test_prompt_is_compact_cached_and_within_budget(monkeypatch):
+    monkeypatch.setattr(anthropic_module.settings, "ai_prompt_token_budget", 120)
+    long_text = "slow cooked " * 200
+    recipes = [FakeRecipe(i, f"Dish\t{i}", long_text if i % 2 else "Short\nand sweet") for i in range(1, 7)]
+    reply = ok({"recommended_id": 3, "title": "Dish 3", "reason": "Hearty"})
+    reply = httpx.Response(200, json=reply.json() | {"usage": {"input_tokens": 20, "cache_read_input_tokens": 100}})
+    stub = StubAnthropic(reply)
+    client = stub.client()
+    cache_reads = anthropic_module.ai_input_tokens.value(kind="cache_read")
+    try:
+        rec = await client.recommend(recipes)
+    finally:
+        await client.aclose()
+    assert rec.recommended_id == 3
+
+    payload = json.loads(stub.requests[0].content)
+    assert payload["system"][0]["cache_control"] == {"type": "ephemeral"}
+    block = payload["messages"][0]["content"][0]
+    assert block["cache_control"] == {"type": "ephemeral"}
+
+    # One tab-separated line per recipe, cells flattened, long descriptions cut to fit
+    header, *rows = block["text"].removeprefix("Recipes:\n").split("\n")
+    assert header == "id\ttitle\tdescription"
+    assert [row.split("\t")[:2] for row in rows] == [[str(i), f"Dish {i}"] for i in range(1, 7)]
+    assert rows[1].endswith("Short and sweet")
+    assert rows[0].endswith("…") and len(rows[0]) < 130
+    assert anthropic_module.estimate_tokens(block["text"]) <= 120 + 3
+    assert anthropic_module.ai_input_tokens.value(kind="cache_read") == cache_reads + 100
+
+
+def test_catalog_drops_lowest_ranked_recipes_when_titles_overflow():
+    from app.services.prompt import build_catalog
+
+    recipes = [FakeRecipe(i, "x" * 40, "desc") for i in range(1, 11)]
+    catalog = build_catalog(recipes, token_budget=50, description_chars=500)
+    assert catalog.recipe_ids == [1, 2, 3, 4]
+    assert catalog.estimated_tokens <= 50
+    # A single candidate is always sent, however small the budget
+    assert build_catalog(recipes, token_budget=1, description_chars=500).recipe_ids == [1]
@@ -1,7 +1,10 @@
+import asyncio
 import pytest
 import httpx
 import app.services.recipes as recipes_module
+from app.db.models import Recipe
 from app.services import ai as ai_module
+from app.services import cache as cache_module
 
 # Fake AI client for testing purposes
 class FakeAIClient:
@@ -38,3 +41,119 @@ async def test_recommendation_is_mocked(test_app, monkeypatch):
         assert data["recommended_id"] is not None
         assert data["title"] in {"Pizza", "Soup"}
         assert data["reason"] == "Mocked AI recommendation for testing."
+
+
+# Fake AI client that counts how often it is asked
+class CountingAIClient(FakeAIClient):
+    def __init__(self):
+        self.calls = 0
+
+    async def recommend(self, recipes):
+        self.calls += 1
+        return await super().recommend(recipes)
+
+
+@pytest.mark.anyio
+async def test_recommendation_is_cached_until_catalog_changes(test_app, monkeypatch):
+    fake = CountingAIClient()
+    monkeypatch.setattr(recipes_module, "build_ai_client", lambda: fake)
+
+    transport = httpx.ASGITransport(app=test_app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        await client.post("/recipes", json={"title": "Pizza"})
+
+        r = await client.get("/recipes/recommendation")
+        assert r.headers["X-Cache"] == "MISS"
+        assert r.json()["cached"] is False
+
+        r = await client.get("/recipes/recommendation")
+        assert r.headers["X-Cache"] == "HIT"
+        assert r.json()["cached"] is True
+        assert fake.calls == 1
+
+        # A write bumps the catalog version and invalidates the cached answer
+        await client.post("/recipes", json={"title": "Soup"})
+        r = await client.get("/recipes/recommendation")
+        assert r.headers["X-Cache"] == "MISS"
+        assert r.json()["title"] == "Soup"
+        assert fake.calls == 2
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    cache = cache_module.TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_ttl_cache_expires_entries(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, "monotonic", lambda: now[0])
+    cache = cache_module.TTLCache(maxsize=2, ttl=5)
+    cache.set("a", 1)
+    assert cache.get("a") == 1
+    now[0] += 6
+    assert cache.get("a") is None
+
+
+# Fake AI client that is slow enough for callers to overlap
+class SlowAIClient(CountingAIClient):
+    async def recommend(self, recipes):
+        await asyncio.sleep(0.05)
+        return await super().recommend(recipes)
+
+
+@pytest.mark.anyio
+async def test_concurrent_recommendations_are_coalesced(test_app, monkeypatch):
+    fake = SlowAIClient()
+    monkeypatch.setattr(recipes_module, "build_ai_client", lambda: fake)
+    flight = recipes_module.recommendation_flight
+    coalesced_before = flight.coalesced
+
+    transport = httpx.ASGITransport(app=test_app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        await client.post("/recipes", json={"title": "Pizza"})
+
+        responses = await asyncio.gather(*(client.get("/recipes/recommendation") for _ in range(5)))
+
+    assert all(r.status_code == 200 for r in responses)
+    assert {r.json()["title"] for r in responses} == {"Pizza"}
+    assert fake.calls == 1
+    assert flight.coalesced - coalesced_before == 4
+
+
+# Fake AI client that remembers the candidates it was given
+class RecordingAIClient(FakeAIClient):
+    def __init__(self):
+        self.seen = []
+
+    async def recommend(self, recipes):
+        self.seen = list(recipes)
+        return await super().recommend(recipes)
+
+
+@pytest.mark.anyio
+async def test_recommendation_candidates_are_bounded_and_projected(test_app, monkeypatch):
+    fake = RecordingAIClient()
+    monkeypatch.setattr(recipes_module, "build_ai_client", lambda: fake)
+    monkeypatch.setattr(recipes_module.settings, "ranking_enabled", False)
+    monkeypatch.setattr(recipes_module.settings, "ai_candidate_count", 3)
+    monkeypatch.setattr(recipes_module.settings, "ai_description_chars", 10)
+
+    transport = httpx.ASGITransport(app=test_app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        await client.post(
+            "/recipes/batch",
+            json={"create": [{"title": f"Dish {i}", "description": "x" * 100} for i in range(10)]},
+        )
+        r = await client.get("/recipes/recommendation")
+        assert r.status_code == 200
+
+    # Newest three, as plain rows with descriptions cut in SQL
+    assert [c.title for c in fake.seen] == ["Dish 9", "Dish 8", "Dish 7"]
+    assert all(len(c.description) == 10 for c in fake.seen)
+    assert not any(isinstance(c, Recipe) for c in fake.seen)
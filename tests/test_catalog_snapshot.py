@@ -0,0 +1,154 @@
+import asyncio
+from datetime import datetime
+
+import httpx
+import pytest
+from sqlalchemy import event, text
+
+from app.core.config import settings
+from app.db.catalog import catalog_state
+from app.db.repo import RecipeRepo
+from app.db.snapshot import CatalogSnapshot, catalog_snapshot
+from app.services.recipes import SNAPSHOT_LOAD_ATTEMPTS
+
+
+@pytest.fixture
+def snapshot_enabled(monkeypatch):
+    monkeypatch.setattr(settings, "catalog_snapshot", True)
+
+
+# Record the SQL sent to the engine while the block runs
+class StatementLog:
+    def __init__(self, engine):
+        self.engine = engine.sync_engine
+        self.statements: list[str] = []
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def __enter__(self):
+        event.listen(self.engine, "before_cursor_execute", self._record)
+        return self.statements
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, "before_cursor_execute", self._record)
+
+
+async def all_pages(client: httpx.AsyncClient, limit: int) -> list[dict]:
+    items, cursor = [], None
+    while True:
+        params = {"limit": limit} | ({"cursor": cursor} if cursor else {})
+        r = await client.get("/recipes", params=params)
+        assert r.status_code == 200
+        items.extend(r.json())
+        cursor = r.headers.get("X-Next-Cursor")
+        if not cursor:
+            return items
+
+
+@pytest.mark.anyio
+async def test_snapshot_pages_match_the_database(test_app, test_engine, monkeypatch):
+    transport = httpx.ASGITransport(app=test_app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        await client.post("/recipes/batch", json={"create": [{"title": f"R{i}", "description": f"d{i}"} for i in range(7)]})
+        await client.post("/recipes", json={"title": "Single"})
+        expected = await all_pages(client, limit=3)
+
+        monkeypatch.setattr(settings, "catalog_snapshot", True)
+        assert await all_pages(client, limit=3) == expected
+        assert catalog_snapshot.loaded and len(catalog_snapshot) == 8
+
+        # Once loaded, a page costs only the catalog version lookup
+        with StatementLog(test_engine) as statements:
+            r = await client.get("/recipes", params={"limit": 3})
+        assert r.status_code == 200
+        assert len(statements) == 1 and "FROM catalog_meta" in statements[0]
+
+        # GraphQL lookups read the snapshot too
+        r = await client.post("/graphql", json={"query": "{ recipe(id: 1) { id title createdAt } }"})
+        assert r.json()["data"]["recipe"]["title"] == "R0"
+
+
+@pytest.mark.anyio
+async def test_local_writes_update_the_snapshot_in_place(test_app, test_engine, snapshot_enabled):
+    transport = httpx.ASGITransport(app=test_app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        await client.post("/recipes", json={"title": "Pho"})
+        await client.get("/recipes")
+        assert catalog_snapshot.loaded
+
+        r = await client.post("/recipes", json={"title": "Laksa"})
+        await client.delete(f"/recipes/{r.json()['id'] - 1}")
+        await client.post("/recipes/batch", json={"create": [{"title": "Ramen"}]})
+
+        with StatementLog(test_engine) as statements:
+            r = await client.get("/recipes")
+        assert [x["title"] for x in r.json()] == ["Ramen", "Laksa"]
+        assert not any("FROM recipes" in s for s in statements)
+
+
+@pytest.mark.anyio
+async def test_writes_from_another_worker_reload_the_snapshot(test_app, session_maker, snapshot_enabled):
+    transport = httpx.ASGITransport(app=test_app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        await client.post("/recipes", json={"title": "Paella"})
+        assert [x["title"] for x in (await client.get("/recipes")).json()] == ["Paella"]
+
+        # Another worker commits a write and bumps the shared marker; this process never saw it
+        async with session_maker() as session:
+            await session.execute(text("DELETE FROM recipes"))
+            await session.execute(text("INSERT INTO recipes (title) VALUES ('Gazpacho')"))
+            await session.execute(text("UPDATE catalog_meta SET version = version + 1"))
+            await session.commit()
+
+        r = await client.get("/recipes")
+        assert [x["title"] for x in r.json()] == ["Gazpacho"]
+        # Legacy-format timestamps from raw inserts come out like any other row
+        assert datetime.fromisoformat(r.json()[0]["created_at"])
+
+
+def test_out_of_order_write_unloads_the_snapshot():
+    snapshot = CatalogSnapshot()
+    snapshot.load([(1, "A", None, "2024-01-01 00:00:00.000000")], "e", 1)
+    snapshot.apply("e", 2, created=[(2, "B", "b", datetime(2024, 1, 2))])
+    assert [r.title for r in snapshot.page(10)] == ["B", "A"]
+    assert snapshot.get_many([2, 9, 1], description_chars=0)[0].description == ""
+
+    # Version 3 never arrived here, so version 4 cannot be applied on top
+    snapshot.apply("e", 4, deleted=[1])
+    assert not snapshot.loaded
+
+
+@pytest.mark.anyio
+async def test_reads_use_the_database_while_writes_keep_racing_the_load(
+    test_app, session_maker, snapshot_enabled, monkeypatch
+):
+    transport = httpx.ASGITransport(app=test_app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        await client.post("/recipes", json={"title": "Paella"})
+
+        # Another worker commits a write during every copy of the catalog
+        stream_all = RecipeRepo.stream_all
+        loads = 0
+
+        async def racing_stream_all(self, *args, **kwargs):
+            nonlocal loads
+            loads += 1
+            async for batch in stream_all(self, *args, **kwargs):
+                yield batch
+            async with session_maker() as session:
+                await session.execute(text(f"INSERT INTO recipes (title) VALUES ('Racer {loads}')"))
+                await session.execute(text("UPDATE catalog_meta SET version = version + 1"))
+                await session.commit()
+
+        monkeypatch.setattr(RecipeRepo, "stream_all", racing_stream_all)
+        r = await asyncio.wait_for(client.get("/recipes"), timeout=5)
+        assert r.status_code == 200
+        assert loads == SNAPSHOT_LOAD_ATTEMPTS
+        assert not catalog_snapshot.current(catalog_state.epoch, catalog_state.version)
+        assert {x["title"] for x in r.json()} == {"Paella", "Racer 1", "Racer 2", "Racer 3"}
+
+        # Once writes stop, the next read loads the snapshot
+        monkeypatch.setattr(RecipeRepo, "stream_all", stream_all)
+        r = await client.get("/recipes")
+        assert catalog_snapshot.loaded and len(r.json()) == loads + 1
@@ -0,0 +1,122 @@
+import time
+from datetime import timedelta
+
+import pytest
+import httpx
+from email.utils import format_datetime, parsedate_to_datetime
+from sqlalchemy import event, text
+
+
+import app.api.caching as caching_module
+import app.services.recipes as recipes_module
+from app.services.ai import FallbackAIClient
+
+
+# Let the wall clock move past the second of the last write
+def next_second(monkeypatch):
+    later = caching_module.current_second() + timedelta(seconds=1)
+    monkeypatch.setattr(caching_module, "current_second", lambda: later)
+
+
+@pytest.mark.anyio
+async def test_list_honours_if_none_match(test_app, test_engine, monkeypatch):
+    transport = httpx.ASGITransport(app=test_app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        await client.post("/recipes", json={"title": "Pho"})
+        next_second(monkeypatch)
+
+        r = await client.get("/recipes")
+        etag = r.headers["ETag"]
+        assert r.headers["Last-Modified"]
+
+        # A matching validator is answered from the catalog marker alone, without querying recipes
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(test_engine.sync_engine, "before_cursor_execute", record)
+        try:
+            r = await client.get("/recipes", headers={"If-None-Match": etag})
+        finally:
+            event.remove(test_engine.sync_engine, "before_cursor_execute", record)
+        assert r.status_code == 304
+        assert r.content == b""
+        assert r.headers["ETag"] == etag
+        assert len(statements) == 1 and "FROM catalog_meta" in statements[0]
+
+        # Any write changes the validator
+        await client.post("/recipes", json={"title": "Banh mi"})
+        r = await client.get("/recipes", headers={"If-None-Match": etag})
+        assert r.status_code == 200
+        assert r.headers["ETag"] != etag
+        assert len(r.json()) == 2
+
+
+@pytest.mark.anyio
+async def test_search_and_recommendation_honour_if_modified_since(test_app, monkeypatch):
+    monkeypatch.setattr(recipes_module, "build_ai_client", lambda: FallbackAIClient())
+    transport = httpx.ASGITransport(app=test_app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        await client.post("/recipes", json={"title": "Laksa"})
+        next_second(monkeypatch)
+
+        for path, params in [("/recipes/search", {"q": "laksa"}), ("/recipes/recommendation", {})]:
+            r = await client.get(path, params=params)
+            assert r.status_code == 200
+            last_modified = r.headers["Last-Modified"]
+
+            r = await client.get(path, params=params, headers={"If-Modified-Since": last_modified})
+            assert r.status_code == 304
+
+            r = await client.get(path, params=params, headers={"If-Modified-Since": "Thu, 01 Jan 1970 00:00:00 GMT"})
+            assert r.status_code == 200
+
+
+@pytest.mark.anyio
+async def test_last_modified_is_the_write_time_and_waits_for_its_second_to_end(test_app, monkeypatch):
+    transport = httpx.ASGITransport(app=test_app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        for i in range(20):
+            await client.post("/recipes", json={"title": f"Taco {i}"})
+        written = caching_module.catalog_state.last_modified
+        assert written.timestamp() <= time.time()
+
+        # Another write could still land in this second: only the ETag is a validator yet
+        r = await client.get("/recipes")
+        assert "Last-Modified" not in r.headers and r.headers["ETag"]
+        r = await client.get("/recipes", headers={"If-Modified-Since": format_datetime(written, usegmt=True)})
+        assert r.status_code == 200
+
+        next_second(monkeypatch)
+        r = await client.get("/recipes")
+        assert parsedate_to_datetime(r.headers["Last-Modified"]) == written
+        r = await client.get("/recipes", headers={"If-Modified-Since": r.headers["Last-Modified"]})
+        assert r.status_code == 304
+
+
+@pytest.mark.anyio
+async def test_writes_from_another_worker_invalidate_validators(test_app, session_maker, monkeypatch):
+    monkeypatch.setattr(recipes_module, "build_ai_client", lambda: FallbackAIClient())
+    transport = httpx.ASGITransport(app=test_app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        await client.post("/recipes", json={"title": "Paella"})
+        r = await client.get("/recipes/recommendation")
+        etag = r.headers["ETag"]
+        assert r.json()["title"] == "Paella"
+
+        # Another worker commits a write and bumps the shared marker; this process never saw it
+        async with session_maker() as session:
+            await session.execute(text("DELETE FROM recipes"))
+            await session.execute(text("INSERT INTO recipes (title) VALUES ('Gazpacho')"))
+            await session.execute(text("UPDATE catalog_meta SET version = version + 1"))
+            await session.commit()
+
+        r = await client.get("/recipes/recommendation", headers={"If-None-Match": etag})
+        assert r.status_code == 200
+        assert r.headers["X-Cache"] == "MISS"
+        assert r.json()["title"] == "Gazpacho"
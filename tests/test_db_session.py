@@ -0,0 +1,35 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from app.db.schema import init_schema
+from app.db.session import build_engine, is_memory_sqlite
+
+
+@pytest.mark.anyio
+async def test_engine_profile_applies_pragmas(tmp_path):
+    url = f"sqlite+aiosqlite:///{tmp_path / 'profile.db'}"
+    writer = build_engine(url, pool_size=1)
+    reader = build_engine(url, read_only=True, pool_size=2)
+    try:
+        async with writer.begin() as conn:
+            await conn.run_sync(init_schema)
+            assert (await conn.execute(text("PRAGMA journal_mode"))).scalar() == "wal"
+            assert (await conn.execute(text("PRAGMA synchronous"))).scalar() == 1  # NORMAL
+            assert (await conn.execute(text("PRAGMA busy_timeout"))).scalar() == 5000
+            await conn.execute(text("INSERT INTO recipes (title, created_at) VALUES ('Tea', CURRENT_TIMESTAMP)"))
+
+        async with reader.connect() as conn:
+            assert (await conn.execute(text("SELECT count(*) FROM recipes"))).scalar() == 1
+            assert (await conn.execute(text("PRAGMA query_only"))).scalar() == 1
+            with pytest.raises(OperationalError):
+                await conn.execute(text("DELETE FROM recipes"))
+    finally:
+        await reader.dispose()
+        await writer.dispose()
+
+
+def test_memory_databases_are_detected():
+    assert is_memory_sqlite("sqlite+aiosqlite://")
+    assert is_memory_sqlite("sqlite+aiosqlite:///:memory:")
+    assert not is_memory_sqlite("sqlite+aiosqlite:///./recipes.db")
@@ -1,5 +1,7 @@
+import asyncio
 import pytest
 import httpx
+from sqlalchemy import event
 import app.services.recipes as recipes_module
 from app.services import ai as ai_module
 
@@ -142,3 +144,165 @@ async def test_graphql_recommendation_is_mocked(test_app, monkeypatch):
         assert rec["recommendedId"] is not None
         assert rec["title"] in {"Pizza", "Soup"}
         assert rec["reason"] == "Mocked AI recommendation for GraphQL testing."
+
+
+@pytest.mark.anyio
+async def test_graphql_recipes_connection(test_app):
+    transport = httpx.ASGITransport(app=test_app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        for title in ["Ramen", "Curry", "Paella"]:
+            await client.post("/recipes", json={"title": title})
+
+        q = """
+        query Page($after: String) {
+          recipesConnection(first: 2, after: $after) {
+            edges { cursor node { title } }
+            pageInfo { hasNextPage endCursor }
+          }
+        }
+        """
+        r = await client.post("/graphql", json=gql(q, {"after": None}))
+        body = r.json()
+        assert "errors" not in body
+        conn = body["data"]["recipesConnection"]
+        assert [e["node"]["title"] for e in conn["edges"]] == ["Paella", "Curry"]
+        assert conn["pageInfo"]["hasNextPage"] is True
+
+        r = await client.post("/graphql", json=gql(q, {"after": conn["pageInfo"]["endCursor"]}))
+        conn = r.json()["data"]["recipesConnection"]
+        assert [e["node"]["title"] for e in conn["edges"]] == ["Ramen"]
+        assert conn["pageInfo"]["hasNextPage"] is False
+
+
+@pytest.mark.anyio
+async def test_graphql_batch_mutations(test_app):
+    transport = httpx.ASGITransport(app=test_app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        q = """
+        mutation {
+          createRecipes(recipes: [{title: "Gyoza"}, {title: "Bao", description: "Steamed"}]) {
+            id
+            title
+          }
+        }
+        """
+        r = await client.post("/graphql", json=gql(q))
+        body = r.json()
+        assert "errors" not in body
+        created = body["data"]["createRecipes"]
+        assert [c["title"] for c in created] == ["Gyoza", "Bao"]
+
+        q = """
+        mutation DeleteMany($ids: [Int!]!) {
+          deleteRecipes(recipeIds: $ids) { id deleted }
+        }
+        """
+        ids = [created[0]["id"], 12345]
+        r = await client.post("/graphql", json=gql(q, {"ids": ids}))
+        body = r.json()
+        assert "errors" not in body
+        assert body["data"]["deleteRecipes"] == [
+            {"id": ids[0], "deleted": True},
+            {"id": 12345, "deleted": False},
+        ]
+
+
+# Record SELECT statements issued against the test database
+@pytest.fixture
+def selects(test_engine):
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append(statement)
+
+    event.listen(test_engine.sync_engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(test_engine.sync_engine, "before_cursor_execute", record)
+
+
+@pytest.mark.anyio
+async def test_graphql_recipes_selects_only_requested_columns(test_app, selects):
+    transport = httpx.ASGITransport(app=test_app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        await client.post("/recipes", json={"title": "Risotto", "description": "Creamy rice"})
+        selects.clear()
+
+        r = await client.post("/graphql", json=gql("{ recipes { id title } }"))
+        assert r.json()["data"]["recipes"] == [{"id": 1, "title": "Risotto"}]
+        assert selects and not any("description" in s for s in selects)
+
+        q = "{ recipesConnection { edges { node { ...Desc } } } } fragment Desc on RecipeGQL { description }"
+        r = await client.post("/graphql", json=gql(q))
+        assert r.json()["data"]["recipesConnection"]["edges"][0]["node"]["description"] == "Creamy rice"
+
+
+@pytest.mark.anyio
+async def test_graphql_recipe_lookups_are_batched(test_app, selects, monkeypatch):
+    monkeypatch.setattr(recipes_module, "build_ai_client", lambda: FakeAIClient())
+    transport = httpx.ASGITransport(app=test_app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        for title in ["Miso", "Udon", "Soba"]:
+            await client.post("/recipes", json={"title": title})
+        selects.clear()
+
+        q = """
+        {
+          a: recipe(id: 1) { title }
+          b: recipe(id: 3) { title }
+          missing: recipe(id: 99) { title }
+          recipes(first: 1) { id }
+          recommendRecipe { title }
+        }
+        """
+        r = await client.post("/graphql", json=gql(q))
+        body = r.json()
+        assert "errors" not in body
+        assert body["data"]["a"] == {"title": "Miso"}
+        assert body["data"]["b"] == {"title": "Soba"}
+        assert body["data"]["missing"] is None
+
+        # The recommendation loads its own candidates; the two recipe(id) lookups share one query
+        lookups = [s for s in selects if "recipes.id IN" in s and "description" not in s]
+        assert len(lookups) == 1
+
+
+@pytest.mark.anyio
+async def test_graphql_recommendation_does_not_block_siblings(test_app, monkeypatch):
+    listed = asyncio.Event()
+
+    # Answers only once a sibling resolver has finished, or gives up
+    class SlowAIClient(FakeAIClient):
+        async def recommend(self, recipes):
+            try:
+                await asyncio.wait_for(listed.wait(), timeout=1.0)
+                reason = "overlapped"
+            except asyncio.TimeoutError:
+                reason = "serialized"
+            rec = await super().recommend(recipes)
+            return ai_module.AIRecommendation(rec.recommended_id, rec.title, reason)
+
+    list_recipes = recipes_module.RecipeService.list_recipes
+
+    async def list_and_signal(self, *args, **kwargs):
+        page = await list_recipes(self, *args, **kwargs)
+        listed.set()
+        return page
+
+    monkeypatch.setattr(recipes_module, "build_ai_client", lambda: SlowAIClient())
+    monkeypatch.setattr(recipes_module.RecipeService, "list_recipes", list_and_signal)
+    transport = httpx.ASGITransport(app=test_app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        await client.post("/recipes", json={"title": "Ramen"})
+        r = await client.post("/graphql", json=gql("{ recommendRecipe { reason } recipes { title } }"))
+
+    body = r.json()
+    assert body["data"]["recommendRecipe"]["reason"] == "overlapped"
+    assert body["data"]["recipes"] == [{"title": "Ramen"}]
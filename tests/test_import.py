@@ -0,0 +1,111 @@
+import json
+
+import httpx
+import pytest
+
+from app.api.imports import ImportFormatError, csv_records
+from app.core.config import settings
+
+
+async def chunked(data: bytes, size: int):
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+
+@pytest.mark.anyio
+async def test_ndjson_import_reports_bad_lines(test_app, monkeypatch):
+    # Several transactions, with the body arriving in small pieces
+    monkeypatch.setattr(settings, "import_chunk_size", 2)
+    lines = [
+        json.dumps({"title": "Pho", "description": "Beef broth"}),
+        json.dumps({"title": ""}),
+        "{not json",
+        "",
+        json.dumps(["a list"]),
+        json.dumps({"title": "Laksa"}),
+        json.dumps({"title": "Ramen", "id": 99, "created_at": "2020-01-01T00:00:00"}),
+    ]
+    body = "\n".join(lines).encode()
+
+    transport = httpx.ASGITransport(app=test_app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        r = await client.post("/recipes/import", content=chunked(body, 7))
+        assert r.status_code == 200
+        result = r.json()
+        assert (result["imported"], result["rejected"]) == (3, 3)
+        assert [e["line"] for e in result["errors"]] == [2, 3, 5]
+        assert result["errors"][0]["error"].startswith("title:")
+        assert result["errors"][1]["error"] == "Invalid JSON"
+        assert result["rows_per_second"] > 0
+
+        r = await client.get("/recipes")
+        assert [x["title"] for x in r.json()] == ["Ramen", "Laksa", "Pho"]
+        # Imported rows are searchable like any other
+        r = await client.get("/recipes/search", params={"q": "broth"})
+        assert [x["title"] for x in r.json()] == ["Pho"]
+
+
+@pytest.mark.anyio
+async def test_csv_export_round_trips_through_import(test_app, monkeypatch):
+    monkeypatch.setattr(settings, "import_max_errors", 1)
+    transport = httpx.ASGITransport(app=test_app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        await client.post("/recipes", json={"title": "Plain"})
+        await client.post("/recipes", json={"title": 'Quoted, "with" commas', "description": "two\nlines"})
+        exported = (await client.get("/recipes/export", params={"format": "csv"})).content
+
+        # Broken records are counted, but only the first is listed
+        body = exported + b"only-one-field\n,\n"
+        r = await client.post("/recipes/import", params={"format": "csv"}, content=chunked(body, 5))
+        result = r.json()
+        assert (result["imported"], result["rejected"]) == (2, 2)
+        assert result["errors"] == [{"line": 5, "error": "Expected 4 fields, got 1"}]
+
+        r = await client.get("/recipes")
+        recipes = r.json()
+        assert len(recipes) == 4
+        by_title = {x["title"]: x["description"] for x in recipes}
+        assert by_title['Quoted, "with" commas'] == "two\nlines"
+        assert by_title["Plain"] is None
+
+        r = await client.post("/recipes/import", params={"format": "csv"}, content=b"name,description\nx,y\n")
+        assert r.status_code == 400
+
+
+@pytest.mark.anyio
+async def test_csv_records_span_lines_and_chunks():
+    body = 'title,description\n"Multi\nline",x\nSoup,"a ""quoted"" word"\n'.encode()
+    records = [r async for r in csv_records(chunked(body, 3))]
+    assert records == [
+        (2, {"title": "Multi\nline", "description": "x"}),
+        (4, {"title": "Soup", "description": 'a "quoted" word'}),
+    ]
+
+
+@pytest.mark.anyio
+async def test_csv_quote_inside_an_unquoted_field_does_not_hold_back_the_rest():
+    rows = "".join(f'{n}" pizza,thin crust\n' for n in range(2000))
+    body = f"title,description\n{rows}".encode()
+    arrived = 0
+
+    async def counting_chunks():
+        nonlocal arrived
+        async for chunk in chunked(body, 64):
+            arrived += len(chunk)
+            yield chunk
+
+    # Each record comes out as soon as the chunk ending its line has arrived
+    line_ends = [i + 1 for i, byte in enumerate(body) if byte == ord("\n")]
+    records = 0
+    async for line_no, record in csv_records(counting_chunks()):
+        assert record == {"title": f'{line_no - 2}" pizza', "description": "thin crust"}
+        assert arrived < line_ends[line_no - 1] + 64
+        records += 1
+    assert records == 2000
+
+
+@pytest.mark.anyio
+async def test_csv_unterminated_quote_is_a_format_error():
+    body = b'title,description\n"runaway,' + b"x" * 200_000
+    with pytest.raises(ImportFormatError):
+        [r async for r in csv_records(chunked(body, 4096))]
@@ -0,0 +1,85 @@
+import json
+import re
+import pytest
+import httpx
+
+from app.core.instrumentation import instrument_engine
+from app.core.metrics import Histogram, Registry, ai_calls
+from app.services import anthropic_client as anthropic_module
+
+
+def sample(text: str, name: str, **labels) -> float:
+    for line in text.splitlines():
+        if line.startswith(name + "{") or line.startswith(name + " "):
+            if all(f'{k}="{v}"' in line for k, v in labels.items()):
+                return float(line.rsplit(" ", 1)[1])
+    raise AssertionError(f"{name} {labels} not found")
+
+
+@pytest.mark.anyio
+async def test_metrics_endpoint_reports_routes_and_sql(test_app, test_engine):
+    instrument_engine(test_engine, "test")
+    transport = httpx.ASGITransport(app=test_app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        await client.post("/recipes", json={"title": "Tagine"})
+        await client.get("/recipes")
+        await client.delete("/recipes/999")
+
+        r = await client.get("/metrics")
+        assert r.status_code == 200
+        assert r.headers["content-type"].startswith("text/plain")
+        text = r.text
+
+    # Route templates, not raw paths
+    assert sample(text, "http_request_duration_seconds_count", route="/recipes", method="GET", status=200) >= 1
+    assert sample(text, "http_request_duration_seconds_count", route="/recipes/{recipe_id}", status=404) >= 1
+    assert "/recipes/999" not in text
+
+    # SQL statements are timed per engine and attributed to the request
+    assert sample(text, "db_statement_duration_seconds_count", engine="test", statement="SELECT") >= 1
+    assert sample(text, "http_request_db_statements_sum", route="/recipes") >= 1
+    assert "# TYPE recommendation_singleflight_coalesced_total counter" in text
+    assert "# TYPE recommendation_cache_hits_total counter" in text
+
+
+@pytest.mark.anyio
+async def test_ai_call_outcomes_are_counted():
+    def handler(request: httpx.Request) -> httpx.Response:
+        text = "not json" if b"Broken" in request.content else json.dumps(
+            {"recommended_id": 1, "title": "Ok", "reason": "Fine"}
+        )
+        return httpx.Response(200, json={"content": [{"type": "text", "text": text}]})
+
+    http = anthropic_module.build_http_client(transport=httpx.MockTransport(handler))
+    client = anthropic_module.AnthropicAIClient("key", http_client=http)
+
+    class R:
+        def __init__(self, title):
+            self.id, self.title, self.description = 1, title, None
+
+    before_ok = ai_calls.value(outcome="success")
+    before_parse = ai_calls.value(outcome="parse_fallback")
+    try:
+        await client.recommend([R("Ok")])
+        await client.recommend([R("Broken")])
+    finally:
+        await client.aclose()
+
+    assert ai_calls.value(outcome="success") == before_ok + 1
+    assert ai_calls.value(outcome="parse_fallback") == before_parse + 1
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = Registry()
+    h = registry.register(Histogram("latency_seconds", "Latency.", buckets=(0.1, 1.0)))
+    h.observe(0.05, route="/a")
+    h.observe(0.5, route="/a")
+    h.observe(5.0, route="/a")
+
+    text = registry.render()
+    assert '# TYPE latency_seconds histogram' in text
+    assert 'latency_seconds_bucket{route="/a",le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{route="/a",le="1"} 2' in text
+    assert 'latency_seconds_bucket{route="/a",le="+Inf"} 3' in text
+    assert re.search(r'latency_seconds_count\{route="/a"\} 3', text)
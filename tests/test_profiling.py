@@ -0,0 +1,113 @@
+import pstats
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+import app.api.profiles as profiles_module
+from app.core.config import settings
+from app.core.profiling import ProfileStore, ProfilingMiddleware
+
+
+TOKEN = "s3cret"
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "profiling_token", TOKEN)
+    store = ProfileStore(str(tmp_path / "profiles"), max_profiles=2)
+    monkeypatch.setattr(profiles_module, "profile_store", store)
+    return store
+
+
+@pytest.fixture
+def admin(store):
+    admin = FastAPI()
+    admin.include_router(profiles_module.router)
+    return httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=admin), base_url="http://test", headers={"X-Profile-Token": TOKEN}
+    )
+
+
+@pytest.mark.anyio
+async def test_profiled_request_is_kept_in_a_ring_buffer(test_app, store, admin):
+    transport = httpx.ASGITransport(app=ProfilingMiddleware(test_app, store=store))
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        await client.post("/recipes", json={"title": "Soup"})
+        assert "X-Profile-Id" not in (await client.get("/recipes")).headers
+
+        ids = []
+        for limit in (1, 2, 3):
+            r = await client.get("/recipes", params={"limit": limit}, headers={"X-Profile": TOKEN})
+            assert r.status_code == 200
+            ids.append(r.headers["X-Profile-Id"])
+
+    async with admin:
+        # Only the newest two are kept
+        r = await admin.get("/admin/profiles")
+        assert [p["id"] for p in r.json()] == ids[:0:-1]
+        assert r.json()[0] | {"ms": 0} == {
+            "id": ids[2], "started_at": r.json()[0]["started_at"], "method": "GET", "path": "/recipes",
+            "query": "limit=3", "operation": None, "status": 200, "ms": 0,
+        }
+        assert (await admin.get(f"/admin/profiles/{ids[0]}")).status_code == 404
+
+        trace = (await admin.get(f"/admin/profiles/{ids[2]}")).json()
+        assert trace["totals"]["sql"]["count"] >= 1
+        assert any(s["kind"] == "sql" and "FROM recipes" in s["name"] for s in trace["spans"])
+        # The dependency chain shows up in the cProfile summary
+        for function in ("(conditional_get)", "(list_recipes)", "(list_page)"):
+            assert function in trace["functions"]
+
+        r = await admin.get(f"/admin/profiles/{ids[2]}/pstats")
+        assert r.headers["content-type"] == "application/octet-stream"
+        path = store.directory / "downloaded.prof"
+        path.write_bytes(r.content)
+        assert pstats.Stats(str(path)).total_calls > 0
+
+        assert (await admin.get("/admin/profiles/..%2Fsecrets")).status_code == 404
+
+
+@pytest.mark.anyio
+async def test_graphql_profile_has_resolver_timings(test_app, store, admin, monkeypatch):
+    from app.api.graphql import ResolverTimingExtension, schema
+    monkeypatch.setattr(schema, "extensions", (ResolverTimingExtension,))
+
+    transport = httpx.ASGITransport(app=ProfilingMiddleware(test_app, store=store))
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        for title in ("Soup", "Stew"):
+            await client.post("/recipes", json={"title": title})
+        r = await client.post(
+            "/graphql", json={"query": "query Picker { recipes { id title } }"}, headers={"X-Profile": TOKEN}
+        )
+        assert len(r.json()["data"]["recipes"]) == 2
+        profile_id = r.headers["X-Profile-Id"]
+
+    async with admin:
+        trace = (await admin.get(f"/admin/profiles/{profile_id}")).json()
+    assert trace["operation"] == "Picker"
+    resolvers = {r["field"]: r for r in trace["resolvers"]}
+    assert resolvers["Query.recipes"]["count"] == 1
+    assert resolvers["RecipeGQL.title"]["count"] == 2
+
+
+@pytest.mark.anyio
+async def test_profiling_token_and_sampling(test_app, store, admin, monkeypatch):
+    transport = httpx.ASGITransport(app=ProfilingMiddleware(test_app, store=store))
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        assert "X-Profile-Id" not in (await client.get("/recipes", headers={"X-Profile": "1"})).headers
+        assert "X-Profile-Id" in (await client.get("/recipes", headers={"X-Profile": TOKEN})).headers
+
+        monkeypatch.setattr(settings, "profiling_sample_rate", 1.0)
+        assert "X-Profile-Id" in (await client.get("/recipes")).headers
+
+        # Without a token nobody can ask for a profile, and the admin endpoints refuse everyone
+        monkeypatch.setattr(settings, "profiling_sample_rate", 0.0)
+        monkeypatch.setattr(settings, "profiling_token", None)
+        assert "X-Profile-Id" not in (await client.get("/recipes", headers={"X-Profile": "1"})).headers
+
+    async with admin:
+        assert (await admin.get("/admin/profiles")).status_code == 403
+        monkeypatch.setattr(settings, "profiling_token", TOKEN)
+        assert (await admin.get("/admin/profiles", headers={"X-Profile-Token": "wrong"})).status_code == 403
+        assert len((await admin.get("/admin/profiles")).json()) == 2
@@ -0,0 +1,118 @@
+import pytest
+import httpx
+from sqlalchemy import text
+
+import app.services.recipes as recipes_module
+from app.services.ai import FallbackAIClient
+from app.services.ranking import RecipeIndex, recipe_index, tokenize
+from app.services.recipes import index_maintainer
+
+
+def test_top_k_prefers_recipes_representative_of_the_catalog():
+    index = RecipeIndex(dim=512)
+    index.load([
+        (1, "Tomato pasta", "Pasta with tomato sauce and basil"),
+        (2, "Creamy tomato pasta", "Pasta, tomato sauce, cream"),
+        (3, "Pasta al pomodoro", "Tomato sauce pasta"),
+        (4, "Chocolate mousse", "Dark chocolate dessert"),
+    ])
+
+    assert index.top_k(1)[0] in {1, 2, 3}
+    assert index.top_k(1)[0] != 4
+
+
+def test_top_k_diversifies_candidates():
+    index = RecipeIndex(dim=512)
+    index.load([
+        (1, "Tomato pasta", "tomato pasta"),
+        (2, "Tomato pasta bake", "tomato pasta"),
+        (3, "Tomato pasta salad", "tomato pasta"),
+        (4, "Chocolate cake", "chocolate"),
+    ])
+
+    # With full diversity weight the second pick must move away from the pasta cluster
+    picks = index.top_k(2, diversity=0.9)
+    assert 4 in picks
+
+
+def test_index_updates_incrementally():
+    index = RecipeIndex(dim=64)
+    index.load([(1, "Soup", None), (2, "Salad", None)])
+    index.add(3, "Stew", None)
+    index.remove(1)
+
+    assert len(index) == 2
+    assert sorted(index.top_k(10)) == [2, 3]
+
+    index.remove(3)
+    index.remove(2)
+    assert index.top_k(5) == []
+
+
+def test_incremental_scores_match_a_full_reweight():
+    index = RecipeIndex(dim=128)
+    index.load([(i, f"Dish {i}", "tomato basil" if i % 2 else "chocolate cream") for i in range(1, 200)])
+    index.top_k(5)
+    for i in range(200, 220):
+        index.add(i, "Tomato soup", "tomato basil garlic")
+    index.remove(3)
+    incremental = index.top_k(5, diversity=0.0)
+
+    # Below the reweight threshold the idf snapshot is kept; norms and centroid are current
+    assert index._drift == 21
+    index._reweight()
+    assert index.top_k(5, diversity=0.0) == incremental
+
+
+def test_tokenize_keeps_non_ascii_words_whole():
+    assert tokenize("Crème brûlée & Smørrebrød") == ["crème", "brûlée", "smørrebrød"]
+
+
+@pytest.mark.anyio
+async def test_offline_recommendation_tracks_writes(test_app, monkeypatch):
+    monkeypatch.setattr(recipes_module, "build_ai_client", lambda: FallbackAIClient())
+
+    transport = httpx.ASGITransport(app=test_app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        r = await client.post("/recipes", json={"title": "Lentil soup", "description": "Lentils, carrots"})
+        soup_id = r.json()["id"]
+
+        # The index is built in the background; the newest recipes stand in meanwhile
+        r = await client.get("/recipes/recommendation")
+        assert r.json()["recommended_id"] == soup_id
+        await index_maintainer.wait()
+        assert recipe_index.loaded
+
+        # Writes after the first load go straight into the index
+        r = await client.post("/recipes", json={"title": "Pancakes"})
+        pancakes_id = r.json()["id"]
+        assert len(recipe_index) == 2
+
+        await client.delete(f"/recipes/{soup_id}")
+        r = await client.get("/recipes/recommendation")
+        assert r.json()["recommended_id"] == pancakes_id
+        assert len(recipe_index) == 1
+
+
+@pytest.mark.anyio
+async def test_index_catches_up_with_another_workers_writes(test_app, session_maker, monkeypatch):
+    monkeypatch.setattr(recipes_module, "build_ai_client", lambda: FallbackAIClient())
+
+    transport = httpx.ASGITransport(app=test_app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        ids = [(await client.post("/recipes", json={"title": t})).json()["id"] for t in ("Soup", "Stew", "Salad")]
+        await client.get("/recipes/recommendation")
+        await index_maintainer.wait()
+        assert len(recipe_index) == 3
+
+        # Another worker adds one recipe and deletes another; this process never saw it
+        async with session_maker() as session:
+            await session.execute(text("INSERT INTO recipes (title) VALUES ('Curry')"))
+            await session.execute(text("DELETE FROM recipes WHERE id = :id"), {"id": ids[0]})
+            await session.execute(text("UPDATE catalog_meta SET version = version + 1"))
+            await session.commit()
+        monkeypatch.setattr(recipe_index, "reset", lambda: pytest.fail("the index was rebuilt"))
+
+        await client.get("/recipes/recommendation")
+        await index_maintainer.wait()
+        assert sorted(recipe_index.ids()) == [*ids[1:], ids[-1] + 1]
@@ -0,0 +1,133 @@
+import asyncio
+from contextlib import asynccontextmanager
+import pytest
+import httpx
+
+from app.services import ai as ai_module
+from app.services.refresher import RecommendationRefresher
+
+# AI client that answers only while `gate` is open and counts its calls; while `down`
+# it answers with a degraded fallback, as the real client does during an outage
+class GatedAIClient:
+    def __init__(self):
+        self.gate = asyncio.Event()
+        self.gate.set()
+        self.down = False
+        self.calls = 0
+
+    async def recommend(self, recipes):
+        self.calls += 1
+        await self.gate.wait()
+        if self.down:
+            return ai_module.AIRecommendation(0, "Fallback", "Upstream down", degraded=True)
+        pick = recipes[0]
+        return ai_module.AIRecommendation(pick.id, pick.title, f"Picked from {len(recipes)}")
+
+    async def aclose(self):
+        pass
+
+
+async def wait_until(predicate, timeout: float = 2.0) -> None:
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        assert asyncio.get_running_loop().time() < deadline, "condition not reached"
+        await asyncio.sleep(0.01)
+
+# Run a refresher installed on the app, as the lifespan would
+@asynccontextmanager
+async def running_refresher(app, session_maker, ai, debounce: float = 0.02):
+    refresher = RecommendationRefresher(session_maker, ai=ai, debounce=debounce, max_delay=1.0, poll_interval=0)
+    app.state.ai_client = ai
+    app.state.recommendation_refresher = refresher
+    refresher.start()
+    try:
+        yield refresher
+    finally:
+        await refresher.stop()
+        app.state.recommendation_refresher = None
+        app.state.ai_client = None
+
+
+@pytest.mark.anyio
+async def test_requests_get_precomputed_result_flagged_stale_during_refresh(test_app, session_maker):
+    ai = GatedAIClient()
+    transport = httpx.ASGITransport(app=test_app)
+
+    async with running_refresher(test_app, session_maker, ai) as refresher, \
+            httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        await client.post("/recipes", json={"title": "Risotto"})
+        await wait_until(lambda: refresher.latest is not None and not refresher.stale)
+
+        r = await client.get("/recipes/recommendation")
+        assert r.json()["title"] == "Risotto"
+        assert r.json()["stale"] is False
+        assert "ETag" in r.headers
+
+        # The next refresh hangs on the AI call; requests still answer at once
+        ai.gate.clear()
+        await client.post("/recipes", json={"title": "Gnocchi"})
+        r = await asyncio.wait_for(client.get("/recipes/recommendation"), timeout=1.0)
+        assert r.status_code == 200
+        assert r.json()["stale"] is True
+        assert r.json()["title"] == "Risotto"
+        assert r.headers["X-Cache"] == "STALE"
+        assert "ETag" not in r.headers
+
+        r = await client.post("/graphql", json={"query": "{ recommendRecipe { title stale } }"})
+        assert r.json()["data"]["recommendRecipe"] == {"title": "Risotto", "stale": True}
+
+        ai.gate.set()
+        await wait_until(lambda: not refresher.stale)
+        r = await client.get("/recipes/recommendation")
+        assert r.json()["stale"] is False
+        assert r.json()["reason"] == "Picked from 2"
+
+
+@pytest.mark.anyio
+async def test_refresher_debounces_bursts_of_writes(test_app, session_maker):
+    ai = GatedAIClient()
+    transport = httpx.ASGITransport(app=test_app)
+
+    async with running_refresher(test_app, session_maker, ai, debounce=0.2) as refresher, \
+            httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        for i in range(10):
+            await client.post("/recipes", json={"title": f"Dish {i}"})
+        await wait_until(lambda: refresher.latest is not None and not refresher.stale)
+
+    # The initial refresh is folded into the burst: one AI call covers all ten writes
+    assert ai.calls == 1
+    assert refresher.latest.reason == "Picked from 10"
+
+
+@pytest.mark.anyio
+async def test_degraded_answers_keep_the_previous_result_and_are_retried(test_app, session_maker):
+    ai = GatedAIClient()
+    transport = httpx.ASGITransport(app=test_app)
+
+    refresher = RecommendationRefresher(
+        session_maker, ai=ai, debounce=0.02, max_delay=1.0, poll_interval=0, retry_base=0.05, retry_max=0.2
+    )
+    test_app.state.ai_client = ai
+    test_app.state.recommendation_refresher = refresher
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        await client.post("/recipes", json={"title": "Risotto"})
+        refresher.start()
+        try:
+            await wait_until(lambda: refresher.latest is not None and not refresher.stale)
+
+            # During the outage the fallback is never adopted; retries back off
+            ai.down = True
+            await client.post("/recipes", json={"title": "Gnocchi"})
+            await wait_until(lambda: refresher.failures >= 3)
+            assert refresher.latest.title == "Risotto"
+            assert refresher.stale
+
+            # Without any further catalog change, a retry picks up the recovery
+            ai.down = False
+            await wait_until(lambda: not refresher.stale)
+            assert refresher.latest.reason == "Picked from 2"
+            assert refresher.failures == 0
+        finally:
+            await refresher.stop()
+            test_app.state.recommendation_refresher = None
+            test_app.state.ai_client = None
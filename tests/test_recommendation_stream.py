@@ -0,0 +1,177 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+import app.services.recipes as recipes_module
+from app.api.graphql import schema
+from app.services import anthropic_client as anthropic_module
+
+# Minimal recipe stand-in with the attributes the AI client reads
+class FakeRecipe:
+    def __init__(self, id: int, title: str, description: str | None = None):
+        self.id = id
+        self.title = title
+        self.description = description
+
+def sse(event: str, data: dict) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n".encode()
+
+def text_delta(text: str) -> bytes:
+    return sse("content_block_delta", {"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": text}})
+
+# Local stub of the streaming Messages API; the reason is held back until `release`
+# is set, so a test can prove the pick was delivered before the rest was generated
+class StreamingStub:
+    def __init__(self, pick: str = "2", reason: tuple[str, ...] = ("Warm ", "and quick."), fail_after_pick: bool = False):
+        self.pick = pick
+        self.reason = reason
+        self.fail_after_pick = fail_after_pick
+        self.release = asyncio.Event()
+        self.requests: list[httpx.Request] = []
+
+    async def body(self):
+        yield sse("message_start", {"type": "message_start", "message": {}})
+        yield text_delta(self.pick + "\n")
+        await self.release.wait()
+        if self.fail_after_pick:
+            yield sse("error", {"type": "error", "error": {"type": "overloaded_error"}})
+            return
+        for part in self.reason:
+            yield text_delta(part)
+        yield sse("message_stop", {"type": "message_stop"})
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        return httpx.Response(200, headers={"content-type": "text/event-stream"}, content=self.body())
+
+    def client(self, **kwargs) -> anthropic_module.AnthropicAIClient:
+        http = anthropic_module.build_http_client(transport=httpx.MockTransport(self))
+        return anthropic_module.AnthropicAIClient("test-key", http_client=http, **kwargs)
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(anthropic_module.settings, "ai_backoff_base", 0.0)
+
+
+@pytest.mark.anyio
+async def test_pick_is_sent_before_the_reason_is_generated():
+    recipes = [FakeRecipe(1, "Pizza"), FakeRecipe(2, "Soup")]
+    stub = StreamingStub()
+    client = stub.client()
+    try:
+        events = client.stream_recommend(recipes)
+        # The stub will not write the reason until the pick has reached us
+        first = await asyncio.wait_for(anext(events), timeout=5)
+        assert (first.event, first.data["recommended_id"], first.data["title"]) == ("recommendation", 2, "Soup")
+        stub.release.set()
+        rest = [e async for e in events]
+    finally:
+        await client.aclose()
+
+    assert [e.event for e in rest] == ["reason", "reason", "done"]
+    assert "".join(e.data["text"] for e in rest[:-1]) == "Warm and quick."
+    assert rest[-1].data["reason"] == "Warm and quick."
+    assert json.loads(stub.requests[0].content)["stream"] is True
+
+
+@pytest.mark.anyio
+async def test_stream_falls_back_before_the_pick_and_reports_errors_after_it():
+    recipes = [FakeRecipe(1, "Pizza"), FakeRecipe(2, "Soup")]
+
+    # The upstream is down: the fallback pick is streamed instead
+    client = anthropic_module.AnthropicAIClient(
+        "test-key",
+        http_client=anthropic_module.build_http_client(transport=httpx.MockTransport(lambda r: httpx.Response(500))),
+        max_retries=0,
+    )
+    try:
+        events = [e async for e in client.stream_recommend(recipes)]
+    finally:
+        await client.aclose()
+    assert [e.event for e in events] == ["recommendation", "reason", "done"]
+    assert events[0].data["recommended_id"] == 1
+    assert events[-1].data["reason"].startswith("Fallback")
+
+    # The stream breaks after the pick: the client is told, and nothing claims to be done
+    stub = StreamingStub(fail_after_pick=True)
+    stub.release.set()
+    client = stub.client()
+    try:
+        events = [e async for e in client.stream_recommend(recipes)]
+    finally:
+        await client.aclose()
+    assert [e.event for e in events] == ["recommendation", "error"]
+    assert client.breaker.state == "closed"
+
+
+def parse_sse(body: str) -> list[tuple[str, dict]]:
+    frames = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        frames.append((lines["event"], json.loads(lines["data"])))
+    return frames
+
+
+@pytest.mark.anyio
+async def test_stream_endpoint_serves_events_and_caches_the_result(test_app, monkeypatch):
+    stub = StreamingStub()
+    stub.release.set()
+    ai = stub.client()
+    monkeypatch.setattr(recipes_module, "build_ai_client", lambda: ai)
+
+    transport = httpx.ASGITransport(app=test_app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            await client.post("/recipes", json={"title": "Pizza"})
+            await client.post("/recipes", json={"title": "Soup"})
+
+            r = await client.get("/recipes/recommendation/stream")
+            assert r.status_code == 200
+            assert r.headers["content-type"].startswith("text/event-stream")
+            assert r.headers["cache-control"] == "no-cache"
+            frames = parse_sse(r.text)
+            assert [e for e, _ in frames] == ["recommendation", "reason", "reason", "done"]
+            assert frames[0][1] == {"recommended_id": 2, "title": "Soup", "cached": False, "stale": False}
+
+            # The streamed answer is the cached one for this catalog version
+            r = await client.get("/recipes/recommendation")
+            assert r.headers["X-Cache"] == "HIT"
+            assert r.json()["reason"] == "Warm and quick."
+
+            r = await client.get("/recipes/recommendation/stream")
+            frames = parse_sse(r.text)
+            assert frames[0][1]["cached"] is True
+            assert [e for e, _ in frames] == ["recommendation", "reason", "done"]
+    finally:
+        await ai.aclose()
+    assert len(stub.requests) == 1
+
+
+@pytest.mark.anyio
+async def test_recommendation_subscription(test_app, session_maker, monkeypatch):
+    from app.api.graphql import GraphQLContext
+    from app.db.repo import RecipeRepo
+    from app.services.recipes import RecipeService
+
+    stub = StreamingStub(pick="1", reason=("Cheesy.",))
+    stub.release.set()
+    ai = stub.client()
+    try:
+        async with session_maker() as session:
+            service = RecipeService(RecipeRepo(session), ai=ai)
+            await service.repo.create("Pizza", None)
+            result = await schema.subscribe(
+                "subscription { recommendationStream { event recommendedId title text reason } }",
+                context_value=GraphQLContext(service),
+            )
+            events = [r.data["recommendationStream"] async for r in result]
+    finally:
+        await ai.aclose()
+
+    assert [e["event"] for e in events] == ["recommendation", "reason", "done"]
+    assert events[0]["title"] == "Pizza"
+    assert events[1]["text"] == "Cheesy."
+    assert events[2]["reason"] == "Cheesy."
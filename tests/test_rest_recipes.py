@@ -1,5 +1,16 @@
+import csv
+import io
+import json
 import pytest
 import httpx
+from datetime import datetime
+from pydantic import TypeAdapter
+from sqlalchemy import event, text
+
+from app.db.models import Recipe
+from app.db.repo import RecipeRepo
+from app.db.schema import init_schema
+from app.domain.schemas import RecipeOut
 
 # Test creating and listing recipes via REST API
 @pytest.mark.anyio
@@ -41,3 +52,179 @@ async def test_delete_recipe(test_app):
         # Delete again, 404
         r = await client.delete(f"/recipes/{recipe_id}")
         assert r.status_code == 404
+
+# Test keyset pagination via REST API
+@pytest.mark.anyio
+async def test_list_recipes_paginates_with_cursor(test_app):
+    transport = httpx.ASGITransport(app=test_app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        for i in range(5):
+            await client.post("/recipes", json={"title": f"Recipe {i}"})
+
+        # Walk the pages until the cursor runs out
+        seen = []
+        cursor = None
+        while True:
+            params = {"limit": 2}
+            if cursor:
+                params["cursor"] = cursor
+            r = await client.get("/recipes", params=params)
+            assert r.status_code == 200
+            seen.extend(item["title"] for item in r.json())
+            cursor = r.headers.get("X-Next-Cursor")
+            if not cursor:
+                break
+
+        assert seen == [f"Recipe {i}" for i in reversed(range(5))]
+
+        # Garbage cursor, 400
+        r = await client.get("/recipes", params={"cursor": "not-a-cursor"})
+        assert r.status_code == 400
+
+# Rows stored without fractional seconds (older databases, raw inserts using the server
+# default) page correctly alongside ORM-written rows
+@pytest.mark.anyio
+async def test_list_recipes_paginates_legacy_timestamps(test_app, test_engine):
+    # A database from before created_at normalization and schema versioning
+    async with test_engine.begin() as conn:
+        await conn.execute(text("DROP TRIGGER recipes_created_at_ai"))
+        await conn.execute(text("DROP TABLE schema_version"))
+        for i in range(5):
+            await conn.execute(
+                text("INSERT INTO recipes (title, created_at) VALUES (:title, :created_at)"),
+                {"title": f"Legacy {i}", "created_at": f"2024-01-01 10:00:0{i}"},
+            )
+        await conn.run_sync(init_schema)
+        await conn.execute(text("INSERT INTO recipes (title) VALUES ('Raw')"))
+
+    transport = httpx.ASGITransport(app=test_app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        await client.post("/recipes", json={"title": "Fresh"})
+
+        seen = []
+        cursor = None
+        for _ in range(10):
+            params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+            r = await client.get("/recipes", params=params)
+            seen.extend(item["title"] for item in r.json())
+            cursor = r.headers.get("X-Next-Cursor")
+            if not cursor:
+                break
+
+        # Rewriting the raw row's timestamp left the full-text index intact
+        r = await client.get("/recipes/search", params={"q": "raw"})
+        assert [hit["title"] for hit in r.json()] == ["Raw"]
+
+    assert sorted(seen[:2]) == ["Fresh", "Raw"]
+    assert seen[2:] == [f"Legacy {i}" for i in reversed(range(5))]
+
+# Test streaming export as NDJSON and CSV
+@pytest.mark.anyio
+async def test_export_recipes(test_app):
+    transport = httpx.ASGITransport(app=test_app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        await client.post("/recipes", json={"title": "Pie", "description": "Apple, cinnamon"})
+        await client.post("/recipes", json={"title": "Stew"})
+
+        r = await client.get("/recipes/export", params={"batch_size": 1})
+        assert r.status_code == 200
+        assert r.headers["content-type"].startswith("application/x-ndjson")
+        lines = [json.loads(line) for line in r.text.splitlines()]
+        assert [line["title"] for line in lines] == ["Stew", "Pie"]
+        assert lines == (await client.get("/recipes")).json()
+
+        r = await client.get("/recipes/export", params={"format": "csv"})
+        assert r.status_code == 200
+        rows = list(csv.DictReader(io.StringIO(r.text)))
+        assert [row["title"] for row in rows] == ["Stew", "Pie"]
+        assert rows[1]["description"] == "Apple, cinnamon"
+
+# Test batch creates and deletes in one request
+@pytest.mark.anyio
+async def test_batch_recipes(test_app):
+    transport = httpx.ASGITransport(app=test_app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        r = await client.post("/recipes", json={"title": "Old"})
+        old_id = r.json()["id"]
+
+        r = await client.post(
+            "/recipes/batch",
+            json={
+                "create": [{"title": "A"}, {"title": "B", "description": "bee"}],
+                "delete": [old_id, 9999],
+            },
+        )
+        assert r.status_code == 200
+        body = r.json()
+        assert [c["title"] for c in body["created"]] == ["A", "B"]
+        assert all(c["id"] > 0 and c["created_at"] for c in body["created"])
+        assert body["deleted"] == [{"id": old_id, "deleted": True}, {"id": 9999, "deleted": False}]
+
+        titles = [item["title"] for item in (await client.get("/recipes")).json()]
+        assert sorted(titles) == ["A", "B"]
+
+        # One invalid item rejects the whole batch
+        r = await client.post("/recipes/batch", json={"create": [{"title": "C"}, {"title": ""}]})
+        assert r.status_code == 422
+        assert len((await client.get("/recipes")).json()) == 2
+
+# Test that the fast list path is byte-compatible with RecipeOut serialization
+@pytest.mark.anyio
+async def test_list_recipes_fast_path_matches_recipe_out(test_app, session_maker):
+    async with session_maker() as session:
+        session.add_all([
+            Recipe(title="Crème brûlée", description='"quoted"   \x01 ☃'),
+            Recipe(title="Whole second", created_at=datetime(2024, 1, 2, 3, 4, 5)),
+            Recipe(title="No description", description=None),
+        ])
+        await session.commit()
+        adapter = TypeAdapter(list[RecipeOut])
+        expected = adapter.dump_json(adapter.validate_python(await RecipeRepo(session).list_page(10)))
+
+    transport = httpx.ASGITransport(app=test_app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        r = await client.get("/recipes")
+        assert r.headers["content-type"] == "application/json"
+        assert r.content == expected
+
+# Test that ?fields= narrows both the payload and the SELECT
+@pytest.mark.anyio
+async def test_sparse_fieldsets(test_app, test_engine):
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT") and "recipes" in statement:
+            statements.append(statement)
+
+    transport = httpx.ASGITransport(app=test_app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        for title in ("Tomato soup", "Tomato salad", "Bread"):
+            await client.post("/recipes", json={"title": title, "description": "A long description"})
+
+        event.listen(test_engine.sync_engine, "before_cursor_execute", record)
+        try:
+            r = await client.get("/recipes", params={"fields": "title,id", "limit": 2})
+            assert r.json() == [{"id": 3, "title": "Bread"}, {"id": 2, "title": "Tomato salad"}]
+            # Paging still works without created_at in the payload
+            r = await client.get(r.headers["Link"].split(">")[0].lstrip("<"))
+            assert r.json() == [{"id": 1, "title": "Tomato soup"}]
+
+            r = await client.get("/recipes/search", params={"q": "tomato", "fields": "title,score", "limit": 1})
+            assert r.headers["X-Next-Offset"] == "1"
+            [hit] = r.json()
+            assert set(hit) == {"title", "score"} and hit["title"].startswith("Tomato")
+        finally:
+            event.remove(test_engine.sync_engine, "before_cursor_execute", record)
+        assert statements and not any("description" in s or "snippet(" in s for s in statements)
+
+        r = await client.get("/recipes/search", params={"q": "bread", "fields": "snippet,created_at"})
+        [hit] = r.json()
+        assert hit["snippet"] == "<mark>Bread</mark>"
+        assert hit["created_at"] == (await client.get("/recipes")).json()[0]["created_at"]
+
+        for fields in ("id,calories", " , "):
+            assert (await client.get("/recipes", params={"fields": fields})).status_code == 400
+        assert (await client.get("/recipes", params={"fields": "snippet"})).status_code == 400
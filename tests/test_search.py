@@ -0,0 +1,88 @@
+import pytest
+import httpx
+
+
+def gql(query: str, variables: dict | None = None) -> dict:
+    payload = {"query": query}
+    if variables is not None:
+        payload["variables"] = variables
+    return payload
+
+
+async def seed(client: httpx.AsyncClient) -> dict[str, int]:
+    recipes = [
+        {"title": "Tomato soup", "description": "Roasted tomatoes and basil"},
+        {"title": "Basil pesto pasta", "description": "Fresh basil, pine nuts, parmesan"},
+        {"title": "Chocolate cake", "description": "Rich and moist"},
+    ]
+    ids = {}
+    for recipe in recipes:
+        r = await client.post("/recipes", json=recipe)
+        ids[recipe["title"]] = r.json()["id"]
+    return ids
+
+# Test full-text search via REST API
+@pytest.mark.anyio
+async def test_search_ranks_prefix_matches(test_app):
+    transport = httpx.ASGITransport(app=test_app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        await seed(client)
+
+        # Prefix match; a title hit outranks a description hit
+        r = await client.get("/recipes/search", params={"q": "bas"})
+        assert r.status_code == 200
+        hits = r.json()
+        assert [h["title"] for h in hits] == ["Basil pesto pasta", "Tomato soup"]
+        assert "<mark>Basil</mark>" in hits[0]["snippet"]
+        assert hits[0]["score"] >= hits[1]["score"]
+
+        # All words must match
+        r = await client.get("/recipes/search", params={"q": "tomato basil"})
+        assert [h["title"] for h in r.json()] == ["Tomato soup"]
+
+        # Pagination
+        r = await client.get("/recipes/search", params={"q": "basil", "limit": 1})
+        assert len(r.json()) == 1
+        assert r.headers["X-Next-Offset"] == "1"
+        r = await client.get("/recipes/search", params={"q": "basil", "limit": 1, "offset": 1})
+        assert len(r.json()) == 1
+        assert "X-Next-Offset" not in r.headers
+
+        # FTS syntax characters are treated as plain text
+        r = await client.get("/recipes/search", params={"q": '"cake" OR *'})
+        assert r.status_code == 200
+
+
+# Test that the index follows deletes
+@pytest.mark.anyio
+async def test_search_index_follows_deletes(test_app):
+    transport = httpx.ASGITransport(app=test_app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        ids = await seed(client)
+        await client.delete(f"/recipes/{ids['Chocolate cake']}")
+
+        r = await client.get("/recipes/search", params={"q": "chocolate"})
+        assert r.json() == []
+
+
+# Test full-text search via GraphQL
+@pytest.mark.anyio
+async def test_graphql_search_recipes(test_app):
+    transport = httpx.ASGITransport(app=test_app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        await seed(client)
+
+        q = """
+        query Search($q: String!) {
+          searchRecipes(query: $q, first: 5) { id title snippet score }
+        }
+        """
+        r = await client.post("/graphql", json=gql(q, {"q": "choc"}))
+        body = r.json()
+        assert "errors" not in body
+        hits = body["data"]["searchRecipes"]
+        assert [h["title"] for h in hits] == ["Chocolate cake"]
+        assert "<mark>" in hits[0]["snippet"]
@@ -0,0 +1,37 @@
+import subprocess
+import sys
+import pytest
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.db.schema import SCHEMA_VERSION, init_schema
+
+
+@pytest.mark.anyio
+async def test_init_schema_migrates_once(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'schema.db'}")
+    try:
+        async with engine.begin() as conn:
+            assert await conn.run_sync(init_schema) == list(range(1, SCHEMA_VERSION + 1))
+
+        # Already at the latest version: only the version check runs, no DDL
+        statements = []
+        event.listen(
+            engine.sync_engine, "before_cursor_execute",
+            lambda conn, cursor, statement, *args: statements.append(statement),
+        )
+        async with engine.begin() as conn:
+            assert await conn.run_sync(init_schema) == []
+            assert (await conn.execute(text("SELECT version FROM schema_version"))).scalar() == SCHEMA_VERSION
+        assert not any("CREATE" in s or "UPDATE" in s for s in statements)
+    finally:
+        await engine.dispose()
+
+
+def test_importing_app_skips_graphql_ai_and_numpy():
+    code = (
+        "import sys, app.main; "
+        "print(sorted(m for m in ('strawberry', 'httpx', 'numpy') if m in sys.modules))"
+    )
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == "[]"
@@ -0,0 +1,94 @@
+import asyncio
+from contextlib import asynccontextmanager
+import pytest
+import httpx
+
+from app.db.catalog import catalog_state
+from app.db.writer import WriteBatcher, WriterClosed
+
+# Run a write batcher installed on the app, as the lifespan would; started inside the
+# test so its task lives on the test's event loop
+@asynccontextmanager
+async def running_batcher(app, session_maker):
+    writer = WriteBatcher(session_maker, max_ops=64, max_delay=0.05)
+    writer.start()
+    app.state.write_batcher = writer
+    try:
+        yield writer
+    finally:
+        await writer.stop()
+        app.state.write_batcher = None
+
+# Concurrent creates are group-committed and each caller still gets its own row
+@pytest.mark.anyio
+async def test_concurrent_creates_share_commits(test_app, session_maker):
+    transport = httpx.ASGITransport(app=test_app)
+    version = catalog_state.version
+
+    async with running_batcher(test_app, session_maker) as batcher, \
+            httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        responses = await asyncio.gather(*(
+            client.post("/recipes", json={"title": f"Dish {i}", "description": f"desc {i}"})
+            for i in range(20)
+        ))
+        assert all(r.status_code == 201 for r in responses)
+        assert [r.json()["title"] for r in responses] == [f"Dish {i}" for i in range(20)]
+        assert len({r.json()["id"] for r in responses}) == 20
+        assert all(r.json()["created_at"] for r in responses)
+
+        r = await client.get("/recipes")
+        assert len(r.json()) == 20
+
+    assert batcher.ops_written == 20
+    assert batcher.flushes < 20
+    assert catalog_state.version > version
+
+# Deletes report per caller; a repeated delete of the same id only succeeds once
+@pytest.mark.anyio
+async def test_batched_deletes(test_app, session_maker):
+    transport = httpx.ASGITransport(app=test_app)
+
+    async with running_batcher(test_app, session_maker), \
+            httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        r = await client.post("/recipes", json={"title": "Soup", "description": None})
+        recipe_id = r.json()["id"]
+
+        statuses = await asyncio.gather(
+            client.delete(f"/recipes/{recipe_id}"),
+            client.delete(f"/recipes/{recipe_id}"),
+            client.delete("/recipes/999999"),
+        )
+        assert sorted(r.status_code for r in statuses) == [204, 404, 404]
+
+# A failing write is retried alone so the rest of its group still commits
+@pytest.mark.anyio
+async def test_failed_op_does_not_poison_group(session_maker):
+    writer = WriteBatcher(session_maker, max_ops=8, max_delay=0.05)
+    writer.start()
+    try:
+        results = await asyncio.gather(
+            writer.create("Good", None),
+            writer.create(None, None),  # violates NOT NULL on title
+            writer.create("Also good", "x"),
+            return_exceptions=True,
+        )
+    finally:
+        await writer.stop()
+
+    assert results[0].title == "Good"
+    assert isinstance(results[1], Exception)
+    assert results[2].title == "Also good"
+
+# Shutdown flushes every queued write and refuses new ones
+@pytest.mark.anyio
+async def test_stop_flushes_queued_writes(session_maker):
+    writer = WriteBatcher(session_maker, max_ops=8, max_delay=10.0)
+    writer.start()
+    pending = [asyncio.ensure_future(writer.create(f"Late {i}", None)) for i in range(3)]
+    await asyncio.sleep(0)
+    await writer.stop()
+
+    rows = await asyncio.gather(*pending)
+    assert [row.title for row in rows] == ["Late 0", "Late 1", "Late 2"]
+    with pytest.raises(WriterClosed):
+        await writer.create("Too late", None)